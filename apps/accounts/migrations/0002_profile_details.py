@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='bio',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='location',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_pics/'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='role',
+            field=models.CharField(choices=[('CUSTOMER', 'Customer'), ('FARMER', 'Farmer')], default='CUSTOMER', max_length=20),
+        ),
+    ]
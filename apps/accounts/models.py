@@ -8,10 +8,18 @@ class Profile(models.Model):
     role = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer'), ('FARMER', 'Farmer')], default='CUSTOMER')
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # widths of the resized variants of profile_picture (see apps.marketplace.images)
+    profile_picture_widths = models.JSONField(default=list, blank=True, editable=False)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_profile_picture = instance.__dict__.get("profile_picture")
+        return instance
+
 
 
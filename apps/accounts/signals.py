@@ -0,0 +1,15 @@
+# apps/accounts/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.marketplace.signals import image_saved
+
+from .models import Profile
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or "profile_picture" in update_fields:
+        image_saved(instance, "profile_picture", "profile_picture_widths")
@@ -12,6 +12,7 @@ from apps.accounts.forms import RegistrationForm
 from apps.accounts.models import Profile
 from django.contrib.auth.models import User
 
+from apps.marketplace.cart import Cart
 from apps.marketplace.models import Product
 
 
@@ -77,15 +78,7 @@ def customer_dashboard(request):
     profile = getattr(request.user, "profile", None)
 
     # Cart summary
-    cart = request.session.get("cart", {})
-    cart_items, cart_total = [], 0
-    if cart:
-        ids = [int(k) for k in cart.keys()]
-        for p in Product.objects.filter(pk__in=ids):
-            qty = int(cart[str(p.pk)])
-            line = float(p.price) * qty
-            cart_total += line
-            cart_items.append({"product": p, "qty": qty, "line_total": line})
+    cart = Cart(request.session).summary()
 
     # Suggestions
     suggestions = Product.objects.order_by("-id")[:6]
@@ -100,8 +93,8 @@ def customer_dashboard(request):
         "accounts/customer_dashboard.html",
         {
             "profile": profile,
-            "cart_items": cart_items,
-            "cart_total": cart_total,
+            "cart_items": cart["lines"],
+            "cart_total": cart["total"],
             "suggestions": suggestions,
             "my_products": my_products,
         },
@@ -0,0 +1,392 @@
+# apps/diagnostics/benchmark.py
+"""
+Route benchmark over a seeded database (see seed.py).
+
+Every named route in the marketplace, farmers and accounts urlconfs has an
+entry in ROUTES with a traffic weight, the kind of client that calls it and
+how to build its arguments. run() draws a weighted, seeded request mix,
+sends it through Django's test client in-process (full middleware stack,
+no network) and records latency and SQL per request. The whole run happens
+inside a transaction that is rolled back, so writes made by the mix (carts,
+reviews, new products...) never accumulate and runs stay comparable. Caches
+that may describe rolled-back rows are invalidated afterwards.
+"""
+import io
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.accounts import urls as accounts_urls
+from apps.farmers import directory
+from apps.farmers import urls as farmers_urls
+from apps.marketplace import catalog_cache, engagement, wishlist
+from apps.marketplace import urls as marketplace_urls
+from apps.marketplace.models import PriceAlert, Product, Review, Wishlist
+
+from . import seed
+from .profiler import RequestProfile
+
+URLCONFS = (marketplace_urls, farmers_urls, accounts_urls)
+
+ANON, CUSTOMER, FARMER, FRESH = "anon", "customer", "farmer", "fresh"
+
+
+class Route:
+    """
+    One benchmarked route. ``args``/``data``/``query`` are callables taking
+    (ctx, rng). FRESH clients are new and logged out for every request
+    (login/logout/register must not disturb the shared sessions).
+    """
+
+    def __init__(self, name, weight, client=ANON, method="get", args=None, data=None, query=None,
+                 content_type=None):
+        self.name = name
+        self.weight = weight
+        self.client = client
+        self.method = method
+        self.args = args
+        self.data = data
+        self.query = query
+        self.content_type = content_type
+        # results are reported per label, so GET and POST on one URL stay apart
+        self.label = name if method == "get" else f"{name} {method.upper()}"
+
+
+def _product(ctx, rng):
+    return [rng.choice(ctx.product_ids)]
+
+
+def _own_product(ctx, rng):
+    return [rng.choice(ctx.farmer_product_ids)]
+
+
+def _search(ctx, rng):
+    return {"q": rng.choice(seed.CROPS)} if rng.random() < 0.3 else {}
+
+
+def _cart_line(ctx, rng):
+    lines = list(ctx.clients[CUSTOMER].session.get("cart", {})) if CUSTOMER in ctx.clients else []
+    return [rng.choice(lines)] if lines else _product(ctx, rng)
+
+
+def _review_batch(ctx, rng):
+    return [{"product": pk, "rating": rng.randint(1, 5), "comment": "Kiosk review"}
+            for pk in rng.sample(ctx.product_ids, 25)]
+
+
+def _alert_form(ctx, rng):
+    return {"crop": rng.choice(seed.CROPS), "direction": "below", "threshold": f"{rng.randint(10, 500)}.00"}
+
+
+def _own_alert(ctx, rng):
+    alert = PriceAlert.objects.filter(user=ctx.customer).order_by("pk").first()
+    if alert is None:
+        alert = PriceAlert.objects.create(user=ctx.customer, crop=rng.choice(seed.CROPS), threshold=100)
+    return [alert.pk]
+
+
+def _delete_target(ctx, rng):
+    pk = ctx.farmer_product_ids.pop()
+    ctx.product_ids = [p for p in ctx.product_ids if p != pk]
+    return [pk]
+
+
+def _product_form(ctx, rng):
+    crop = rng.choice(seed.CROPS)
+    return {"title": f"Bench {crop}", "price": f"{rng.randint(10, 900)}.00",
+            "description": f"Benchmark {crop}", "active": "on"}
+
+
+def _import_file(ctx, rng):
+    rows = "\n".join(f"Imported {rng.choice(seed.CROPS)},{rng.randint(10, 500)}.00,bench,1" for _ in range(20))
+    upload = SimpleUploadedFile("bench.csv", f"title,price,description,active\n{rows}\n".encode(), "text/csv")
+    return {"file": upload}
+
+
+ROUTES = [
+    # marketplace HTML
+    Route("marketplace:home", 18, query=_search),
+    Route("marketplace:product_detail", 16, args=_product),
+    Route("marketplace:market_prices", 2, query=lambda c, r: {"order": r.choice(("listings", "price"))}),
+    Route("marketplace:view_cart", 3, CUSTOMER),
+    Route("marketplace:add_to_cart", 3, CUSTOMER, "post", args=_product, data=lambda c, r: {"qty": r.randint(1, 3)}),
+    Route("marketplace:remove_from_cart", 1, CUSTOMER, "post", args=_product),
+    Route("marketplace:clear_cart", 0.3, CUSTOMER, "post"),
+    Route("marketplace:add_review", 0.8, CUSTOMER, "post", args=_product,
+          data=lambda c, r: {"rating": r.randint(1, 5), "comment": "Bench review"}),
+    Route("marketplace:add_to_wishlist", 1, CUSTOMER, "post", args=_product),
+    Route("marketplace:wishlist_view", 2, CUSTOMER),
+    Route("marketplace:remove_from_wishlist", 0.8, CUSTOMER, "post", args=_product),
+    # marketplace API
+    Route("marketplace:home_api", 4, CUSTOMER, query=_search),
+    Route("marketplace:product_detail_api", 7, CUSTOMER, args=_product),
+    Route("marketplace:cart_api", 1, CUSTOMER),
+    Route("marketplace:add_to_cart_api", 1, CUSTOMER, "post", args=_product, data=lambda c, r: {"qty": 1}),
+    Route("marketplace:cart_item_api", 0.5, CUSTOMER, "put", args=_cart_line,
+          data=lambda c, r: {"qty": r.randint(0, 4)}, content_type="application/json"),
+    Route("marketplace:add_review_api", 0.3, CUSTOMER, "post", args=_product,
+          data=lambda c, r: {"rating": r.randint(1, 5), "comment": "Bench API review"}),
+    Route("marketplace:review_batch_api", 0.2, CUSTOMER, "post", data=_review_batch, content_type="application/json"),
+    Route("marketplace:product_search_api", 4, CUSTOMER, query=lambda c, r: {"q": r.choice(seed.CROPS)}),
+    Route("marketplace:product_list_api", 5, CUSTOMER),
+    Route("marketplace:product_price_history_api", 2, CUSTOMER, args=_product),
+    Route("marketplace:price_analytics_api", 1, CUSTOMER, query=lambda c, r: {"q": r.choice(seed.CROPS)}),
+    Route("marketplace:price_board_api", 2, CUSTOMER, query=lambda c, r: {"crop": r.choice(seed.CROPS)}),
+    Route("marketplace:crop_suggest_api", 1, FARMER, query=lambda c, r: {"q": r.choice(seed.CROPS)[:-1]}),
+    Route("marketplace:price_alert_list_api", 1, CUSTOMER),
+    Route("marketplace:price_alert_list_api", 0.3, CUSTOMER, "post", data=_alert_form),
+    Route("marketplace:price_alert_detail_api", 0.2, CUSTOMER, "patch", args=_own_alert,
+          data=lambda c, r: {"active": True}, content_type="application/json"),
+    Route("marketplace:catalog_export_api", 0.1, CUSTOMER),
+    Route("marketplace:product_import_api", 0.1, FARMER, "post", data=_import_file),
+    Route("marketplace:home_async_api", 1, CUSTOMER),
+    Route("marketplace:product_list_async_api", 1, CUSTOMER),
+    Route("marketplace:product_search_async_api", 1, CUSTOMER, query=lambda c, r: {"q": r.choice(seed.CROPS)}),
+    Route("marketplace:product_detail_async_api", 2, CUSTOMER, args=_product),
+    # served by WSGI here, so a snapshot and close rather than an endless stream
+    Route("marketplace:price_stream", 1, query=lambda c, r: {
+        "product": ",".join(str(pk) for pk in r.sample(c.product_ids, 10))}),
+    # farmers
+    Route("farmers:all_farmers", 4),
+    Route("farmers:farmer_profile", 3, args=lambda c, r: [r.choice(c.farmer_ids)]),
+    Route("farmers:dashboard", 2, FARMER),
+    Route("farmers:product_create", 0.4, FARMER, "post", data=_product_form),
+    Route("farmers:product_import", 0.1, FARMER, "post", data=_import_file),
+    Route("farmers:product_edit", 0.5, FARMER, args=_own_product),
+    Route("farmers:product_update", 0.3, FARMER, "post", args=_own_product, data=_product_form),
+    Route("farmers:product_delete", 0.1, FARMER, "post", args=_delete_target),
+    # accounts
+    Route("accounts:login", 1, FRESH, "post", data=lambda c, r: {"username": c.customer.username,
+                                                                  "password": seed.PASSWORD}),
+    Route("accounts:logout", 0.5, FRESH),
+    Route("accounts:register", 0.5, FRESH),
+    Route("accounts:customer_dashboard", 2, CUSTOMER),
+]
+
+
+def url_names():
+    names = set()
+    for urlconf in URLCONFS:
+        names.update(f"{urlconf.app_name}:{p.name}" for p in urlconf.urlpatterns if p.name)
+    return names
+
+
+def coverage_gaps():
+    """
+    Named routes missing from ROUTES (should be empty), and stale ROUTES entries.
+    """
+    benchmarked = {r.name for r in ROUTES}
+    return sorted(url_names() - benchmarked), sorted(benchmarked - url_names())
+
+
+class Context:
+    def __init__(self, prefix):
+        self.customer = User.objects.filter(username__startswith=f"{prefix}customer").order_by("pk").first()
+        farmers = User.objects.filter(username__startswith=f"{prefix}farmer", products__isnull=False)
+        self.farmer = farmers.order_by("pk").first()
+        if not self.customer or not self.farmer:
+            raise LookupError("No seeded data found; run `manage.py seed_marketplace` first.")
+        self.product_ids = list(Product.objects.active().order_by("pk").values_list("pk", flat=True))
+        self.farmer_ids = list(
+            User.objects.filter(username__startswith=f"{prefix}farmer").order_by("pk").values_list("pk", flat=True)
+        )
+        self.farmer_product_ids = list(
+            Product.objects.filter(owner=self.farmer).order_by("pk").values_list("pk", flat=True)
+        )
+        self.clients = {}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _client(kind, ctx):
+    clients = ctx.clients
+    if kind == FRESH:
+        return Client(raise_request_exception=False)
+    if kind not in clients:
+        client = Client(raise_request_exception=False)
+        if kind == CUSTOMER:
+            client.force_login(ctx.customer)
+        elif kind == FARMER:
+            client.force_login(ctx.farmer)
+        clients[kind] = client
+    return clients[kind]
+
+
+def _send(route, ctx, rng):
+    client = _client(route.client, ctx)
+    url = reverse(route.name, args=route.args(ctx, rng) if route.args else None)
+    if route.query:
+        query = route.query(ctx, rng)
+        if query:
+            url += "?" + "&".join(f"{k}={v}" for k, v in query.items())
+    data = route.data(ctx, rng) if route.data else {}
+
+    profile = RequestProfile()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(profile))
+        started = time.perf_counter()
+        response = getattr(client, route.method)(url, data, **(
+            {"content_type": route.content_type} if route.content_type else {}))
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed * 1000, profile
+
+
+def _dataset():
+    return {
+        "users": User.objects.count(),
+        "products": Product.objects.count(),
+        "reviews": Review.objects.count(),
+        "wishlists": Wishlist.objects.count(),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class _Rollback(Exception):
+    pass
+
+
+def run(requests=2000, warmup=200, random_seed=1, prefix=seed.PREFIX, only=None):
+    """
+    Run the weighted mix and return the result document (JSON-serialisable).
+    """
+    routes = [r for r in ROUTES if not only or r.name in only]
+    rng = random.Random(random_seed)
+    samples = {r.label: {"ms": [], "queries": [], "db_ms": [], "status": {}} for r in routes}
+    result = {}
+
+    # the engagement flusher would write the run's counters for real, so it stays off
+    try:
+        with override_settings(ENGAGEMENT_FLUSH_SECONDS=0), transaction.atomic():
+            ctx = Context(prefix)
+            dataset = _dataset()
+            plan = rng.choices(routes, weights=[r.weight for r in routes], k=warmup + requests)
+            started = None
+            for i, route in enumerate(plan):
+                if i == warmup:
+                    started = time.perf_counter()
+                if route.name == "farmers:product_delete" and len(ctx.farmer_product_ids) < 2:
+                    continue
+                status, ms, profile = _send(route, ctx, rng)
+                if i < warmup:
+                    continue
+                sample = samples[route.label]
+                sample["ms"].append(ms)
+                sample["queries"].append(profile.count)
+                sample["db_ms"].append(profile.total_ms)
+                sample["status"][str(status)] = sample["status"].get(str(status), 0) + 1
+            elapsed = time.perf_counter() - (started or time.perf_counter())
+            result = _summarise(samples, elapsed, dataset, requests, warmup, random_seed)
+            raise _Rollback
+    except _Rollback:
+        # drop cache entries and unflushed counters that describe the rolled-back writes
+        engagement.counters.drain()
+        wishlist.invalidate(ctx.customer.pk)
+        catalog_cache.bump()
+        directory.invalidate_letter_index()
+    return result
+
+
+def _summarise(samples, elapsed, dataset, requests, warmup, random_seed):
+    routes = {}
+    for name, sample in samples.items():
+        if not sample["ms"]:
+            continue
+        ms = sorted(sample["ms"])
+        n = len(ms)
+        routes[name] = {
+            "requests": n,
+            "status": sample["status"],
+            "errors": sum(c for s, c in sample["status"].items() if s.startswith("5")),
+            "mean_ms": sum(ms) / n,
+            "p50_ms": _percentile(ms, .50),
+            "p90_ms": _percentile(ms, .90),
+            "p95_ms": _percentile(ms, .95),
+            "p99_ms": _percentile(ms, .99),
+            "max_ms": ms[-1],
+            "mean_queries": sum(sample["queries"]) / n,
+            "max_queries": max(sample["queries"]),
+            "mean_db_ms": sum(sample["db_ms"]) / n,
+        }
+    all_ms = sorted(m for s in samples.values() for m in s["ms"])
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "seed": random_seed,
+            "requests": requests,
+            "warmup": warmup,
+            "dataset": dataset,
+        },
+        "totals": {
+            "requests": len(all_ms),
+            "elapsed_s": elapsed,
+            "throughput_rps": len(all_ms) / elapsed if elapsed else None,
+            "p50_ms": _percentile(all_ms, .50),
+            "p95_ms": _percentile(all_ms, .95),
+            "p99_ms": _percentile(all_ms, .99),
+            "errors": sum(r["errors"] for r in routes.values()),
+        },
+        "routes": routes,
+    }
+
+
+def format_table(result, baseline=None):
+    """
+    Plain-text report; with a baseline result, p50/p95/queries show the change.
+    """
+    out = io.StringIO()
+
+    def delta(new, old):
+        if old in (None, 0) or new is None:
+            return ""
+        return f" ({(new - old) / old * 100:+.0f}%)"
+
+    out.write(f"{'route':<50} {'n':>5} {'p50 ms':>15} {'p95 ms':>15} {'p99 ms':>8} "
+              f"{'queries':>14} {'5xx':>4}\n")
+    for name, r in sorted(result["routes"].items(), key=lambda kv: -kv[1]["requests"]):
+        old = (baseline or {}).get("routes", {}).get(name, {})
+        out.write(
+            f"{name:<50} {r['requests']:>5} "
+            f"{r['p50_ms']:>7.2f}{delta(r['p50_ms'], old.get('p50_ms')):>8} "
+            f"{r['p95_ms']:>7.2f}{delta(r['p95_ms'], old.get('p95_ms')):>8} "
+            f"{r['p99_ms']:>8.2f} "
+            f"{r['mean_queries']:>6.1f}{delta(r['mean_queries'], old.get('mean_queries')):>8} "
+            f"{r['errors']:>4}\n"
+        )
+    t = result["totals"]
+    old = (baseline or {}).get("totals", {})
+    out.write(
+        f"\n{t['requests']} requests in {t['elapsed_s']:.2f}s = {t['throughput_rps']:.1f} req/s"
+        f"{delta(t['throughput_rps'], old.get('throughput_rps'))}; "
+        f"p50 {t['p50_ms']:.2f} ms, p95 {t['p95_ms']:.2f} ms, p99 {t['p99_ms']:.2f} ms; "
+        f"{t['errors']} server errors\n"
+    )
+    return out.getvalue()
@@ -0,0 +1,56 @@
+# apps/diagnostics/management/commands/bench_routes.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.diagnostics import benchmark, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted, seeded mix of every marketplace/farmers/accounts route "
+        "in-process against data from `seed_marketplace`, and report per-route "
+        "latency percentiles, query counts and throughput. All writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--warmup", type=int, default=200, help="Requests sent before measuring.")
+        parser.add_argument("--seed", type=int, default=1, help="Seed of the request mix.")
+        parser.add_argument("--prefix", default=seed.PREFIX, help="Username prefix of seeded users.")
+        parser.add_argument("--only", nargs="+", metavar="ROUTE", help="Restrict the mix to these route names.")
+        parser.add_argument("--output", help="Write the result as JSON to this file.")
+        parser.add_argument("--compare", metavar="BASELINE", help="A previous --output file to diff against.")
+
+    def handle(self, *args, **options):
+        missing, stale = benchmark.coverage_gaps()
+        for name in missing:
+            self.stderr.write(self.style.WARNING(f"Route {name} is not in the benchmark mix."))
+        for name in stale:
+            self.stderr.write(self.style.WARNING(f"Benchmark route {name} no longer exists."))
+        if options["only"]:
+            unknown = set(options["only"]) - {r.name for r in benchmark.ROUTES}
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                baseline = json.load(fh)
+
+        try:
+            result = benchmark.run(
+                requests=options["requests"],
+                warmup=options["warmup"],
+                random_seed=options["seed"],
+                prefix=options["prefix"],
+                only=options["only"],
+            )
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(benchmark.format_table(result, baseline))
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(result, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
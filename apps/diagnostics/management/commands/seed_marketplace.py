@@ -0,0 +1,52 @@
+# apps/diagnostics/management/commands/seed_marketplace.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.diagnostics import seed
+
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible synthetic dataset (farmers with profiles, customers, "
+        "products, reviews, wishlists) for benchmarking. Refuses to write to a "
+        "remote database unless --allow-remote is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--farmers", type=int, default=50)
+        parser.add_argument("--customers", type=int, default=200)
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--reviews-per-product", type=float, default=3)
+        parser.add_argument("--wishlist-size", type=int, default=5)
+        parser.add_argument("--days", type=int, default=365, help="Spread product creation over this many days.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default=seed.PREFIX, help="Username prefix of seeded users.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded data first.")
+        parser.add_argument("--allow-remote", action="store_true")
+
+    def handle(self, *args, **options):
+        host = connection.settings_dict.get("HOST") or ""
+        if host not in LOCAL_HOSTS and not options["allow_remote"]:
+            raise CommandError(
+                f"Database host {host!r} is not local. Seed an offline database "
+                "(e.g. a SQLite settings override) or pass --allow-remote."
+            )
+
+        if options["clear"]:
+            deleted = seed.clear(options["prefix"])
+            self.stdout.write(f"Removed {deleted} previously seeded rows.")
+
+        counts = seed.seed(
+            farmers=options["farmers"],
+            customers=options["customers"],
+            products=options["products"],
+            reviews_per_product=options["reviews_per_product"],
+            wishlist_size=options["wishlist_size"],
+            days=options["days"],
+            random_seed=options["seed"],
+            prefix=options["prefix"],
+        )
+        summary = ", ".join(f"{n} {name}" for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary}. Password for every seeded user: {seed.PASSWORD}"))
@@ -0,0 +1,108 @@
+# apps/diagnostics/middleware.py
+import logging
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .profiler import RequestProfile, store
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = "<unresolved>"
+
+# the stats page itself is not profiled
+EXCLUDED_VIEWS = {"diagnostics:query_profile"}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name or match.route
+
+
+def budget_for(name):
+    """
+    (max_queries, max_db_ms) for a URL name from settings.QUERY_BUDGETS; either may be None.
+    A plain int budget limits the query count only.
+    """
+    budget = getattr(settings, "QUERY_BUDGETS", {}).get(name)
+    if budget is None:
+        return None, None
+    if isinstance(budget, int):
+        return budget, None
+    return budget.get("queries"), budget.get("db_ms")
+
+
+class QueryProfilerMiddleware:
+    """
+    Records query count, DB time, duplicated statements and the slowest
+    statements of every request, aggregated per URL name in profiler.store.
+    Requests over their QUERY_BUDGETS entry are logged, or raise
+    QueryBudgetExceeded when QUERY_BUDGET_ACTION is "raise" (used by tests).
+
+    Only queries run before the response is returned are seen: the body of a
+    StreamingHttpResponse is consumed later and is not counted.
+
+    Works in both stacks, so async views are not pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        with self._wrapped(profile):
+            response = self.get_response(request)
+        return self._check(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        with self._wrapped(profile):
+            response = await self.get_response(request)
+        return self._check(request, response, profile)
+
+    @staticmethod
+    def _wrapped(profile):
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(profile))
+        return stack
+
+    def _check(self, request, response, profile):
+        name = view_name(request)
+        if name in EXCLUDED_VIEWS:
+            return response
+
+        max_queries, max_ms = budget_for(name)
+        problems = []
+        if max_queries is not None and profile.count > max_queries:
+            problems.append(f"{profile.count} queries (budget {max_queries})")
+        if max_ms is not None and profile.total_ms > max_ms:
+            problems.append(f"{profile.total_ms:.1f} ms in the database (budget {max_ms} ms)")
+        store.add(name, profile, request.path, over_budget=bool(problems))
+
+        if problems:
+            duplicates = "; ".join(f"{n}× {fp[:120]}" for fp, n in profile.duplicates().items())
+            message = f"{name} ({request.path}) over query budget: {', '.join(problems)}"
+            if duplicates:
+                message += f". Repeated: {duplicates}"
+            if getattr(settings, "QUERY_BUDGET_ACTION", "log") == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,173 @@
+# apps/diagnostics/profiler.py
+"""
+Per-request SQL profiling and the per-process stats it feeds.
+
+RequestProfile is installed as a database execute_wrapper for the duration
+of one request and records every statement's time and fingerprint (SQL with
+literals and IN-lists collapsed, so an N+1 loop shows up as one fingerprint
+executed N times). ProfileStore folds finished requests into fixed-bucket
+histograms per URL name; everything is bounded, so it can stay on in
+production. Stats live in process memory and are per worker.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+
+# upper bounds of the histogram buckets; the last bucket is open-ended
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TIME_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+SLOWEST_PER_REQUEST = 3
+SLOWEST_PER_VIEW = 10
+DUPLICATES_PER_VIEW = 20
+
+_IN_LIST = re.compile(r"\bIN \((?:[^()]*)\)", re.IGNORECASE)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w\"])\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class RequestProfile:
+    """
+    Database execute_wrapper collecting one request's statements.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints = Counter()
+        self.slowest = []  # min-heap of (ms, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, (time.perf_counter() - started) * 1000)
+
+    def record(self, sql, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.fingerprints[fingerprint(sql)] += 1
+        if len(self.slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(self.slowest, (ms, sql))
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (ms, sql))
+
+    def duplicates(self):
+        return {fp: n for fp, n in self.fingerprints.items() if n > 1}
+
+
+def _bucket(bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds)
+
+
+def _percentile(histogram, bounds, q):
+    """
+    Upper bound of the bucket holding the q-th quantile (None for the open bucket).
+    """
+    total = sum(histogram)
+    if not total:
+        return 0
+    seen = 0
+    for i, n in enumerate(histogram):
+        seen += n
+        if seen >= q * total:
+            return bounds[i] if i < len(bounds) else None
+    return None
+
+
+class ViewStats:
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.over_budget = 0
+        self.total_queries = 0
+        self.total_ms = 0.0
+        self.max_queries = 0
+        self.max_ms = 0.0
+        self.query_histogram = [0] * (len(QUERY_BUCKETS) + 1)
+        self.time_histogram = [0] * (len(TIME_BUCKETS_MS) + 1)
+        # fingerprint -> number of requests in which it ran more than once
+        self.duplicates = Counter()
+        self.slowest = []  # min-heap of (ms, sql, path)
+
+    def add(self, profile, path, over_budget=False):
+        self.requests += 1
+        self.over_budget += over_budget
+        self.total_queries += profile.count
+        self.total_ms += profile.total_ms
+        self.max_queries = max(self.max_queries, profile.count)
+        self.max_ms = max(self.max_ms, profile.total_ms)
+        self.query_histogram[_bucket(QUERY_BUCKETS, profile.count)] += 1
+        self.time_histogram[_bucket(TIME_BUCKETS_MS, profile.total_ms)] += 1
+
+        self.duplicates.update(profile.duplicates().keys())
+        if len(self.duplicates) > DUPLICATES_PER_VIEW * 2:
+            self.duplicates = Counter(dict(self.duplicates.most_common(DUPLICATES_PER_VIEW)))
+
+        for ms, sql in profile.slowest:
+            entry = (ms, sql, path)
+            if len(self.slowest) < SLOWEST_PER_VIEW:
+                heapq.heappush(self.slowest, entry)
+            elif ms > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "mean_queries": self.total_queries / self.requests,
+            "p50_queries": _percentile(self.query_histogram, QUERY_BUCKETS, 0.50),
+            "p95_queries": _percentile(self.query_histogram, QUERY_BUCKETS, 0.95),
+            "max_queries": self.max_queries,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.requests,
+            "p95_ms": _percentile(self.time_histogram, TIME_BUCKETS_MS, 0.95),
+            "max_ms": self.max_ms,
+            "query_histogram": list(zip(_labels(QUERY_BUCKETS), self.query_histogram)),
+            "duplicates": self.duplicates.most_common(DUPLICATES_PER_VIEW),
+            "slowest": sorted(self.slowest, reverse=True),
+        }
+
+
+def _labels(bounds):
+    return [f"≤{b}" for b in bounds] + [f">{bounds[-1]}"]
+
+
+class ProfileStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, name, profile, path, over_budget=False):
+        with self._lock:
+            stats = self._views.get(name)
+            if stats is None:
+                stats = self._views[name] = ViewStats(name)
+            stats.add(profile, path, over_budget)
+
+    def summaries(self):
+        with self._lock:
+            # most total DB time first
+            return sorted((s.summary() for s in self._views.values()), key=lambda s: -s["total_ms"])
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+store = ProfileStore()
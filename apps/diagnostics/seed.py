@@ -0,0 +1,143 @@
+# apps/diagnostics/seed.py
+"""
+Deterministic synthetic marketplace data for benchmarks.
+
+Everything is derived from one random seed, so the same arguments give the
+same farmers, products, reviews and wishlists on every run. Rows are written
+with bulk_create; the bookkeeping that signals would normally do (search
+index, crop, first price observation, price board, rating aggregates, caches) is done in bulk
+afterwards. Seeded users share the username prefix, so they can be removed
+again with clear().
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import Profile
+from apps.farmers import directory
+from apps.marketplace import catalog_cache, crops, price_board, prices, search
+from apps.marketplace.models import Product, Review, Wishlist
+
+PREFIX = "seed_"
+PASSWORD = "seed-password"
+
+CROPS = [
+    "rice", "wheat", "lentil", "potato", "onion", "garlic", "ginger", "tomato", "brinjal", "okra",
+    "cabbage", "cauliflower", "spinach", "pumpkin", "cucumber", "chili", "turmeric", "mustard", "jute",
+    "mango", "banana", "jackfruit", "guava", "papaya", "lychee", "pineapple", "coconut", "honey", "tea",
+]
+QUALIFIERS = ["fresh", "organic", "premium", "local", "hill", "river", "aromatic", "red", "green", "sweet"]
+UNITS = ["1 kg", "5 kg", "500 g", "dozen", "bundle", "25 kg sack"]
+COMMENTS = ["Very fresh.", "Good value.", "Arrived late but fine.", "Excellent quality!", "Smaller than expected."]
+DISTRICTS = ["Bogura", "Rajshahi", "Dinajpur", "Jessore", "Sylhet", "Khulna", "Rangpur", "Mymensingh"]
+
+
+@contextmanager
+def _explicit_timestamps(model, field_name):
+    # let bulk_create keep the spread-out timestamps instead of stamping "now"
+    field = model._meta.get_field(field_name)
+    saved = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = saved
+
+
+def _users(role, count, prefix, password):
+    return [
+        User(username=f"{prefix}{role}{i:05d}", email=f"{prefix}{role}{i:05d}@example.com", password=password)
+        for i in range(count)
+    ]
+
+
+def clear(prefix=PREFIX):
+    """
+    Delete every seeded user; their profiles, products, reviews and wishlists cascade.
+    """
+    deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+    catalog_cache.bump()
+    directory.invalidate_letter_index()
+    return deleted
+
+
+def seed(farmers=50, customers=200, products=2000, reviews_per_product=3, wishlist_size=5,
+         days=365, random_seed=42, prefix=PREFIX, batch_size=1000):
+    """
+    Insert the dataset and return the row counts created.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    password = make_password(PASSWORD)  # hashed once, shared by every seeded user
+
+    with transaction.atomic():
+        User.objects.bulk_create(_users("farmer", farmers, prefix, password), batch_size=batch_size)
+        User.objects.bulk_create(_users("customer", customers, prefix, password), batch_size=batch_size)
+        farmer_ids = list(User.objects.filter(username__startswith=f"{prefix}farmer").order_by("pk")
+                          .values_list("pk", flat=True))
+        customer_ids = list(User.objects.filter(username__startswith=f"{prefix}customer").order_by("pk")
+                            .values_list("pk", flat=True))
+
+        Profile.objects.bulk_create(
+            [Profile(user_id=pk, role="FARMER", location=rng.choice(DISTRICTS),
+                     bio=f"Growing {rng.choice(CROPS)} since {rng.randint(1990, 2020)}.") for pk in farmer_ids]
+            + [Profile(user_id=pk, role="CUSTOMER") for pk in customer_ids],
+            batch_size=batch_size,
+        )
+
+        rows = []
+        for _ in range(products):
+            crop = rng.choice(CROPS)
+            created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            rows.append(Product(
+                owner_id=rng.choice(farmer_ids),
+                title=f"{rng.choice(QUALIFIERS).title()} {crop} ({rng.choice(UNITS)})",
+                description=f"{rng.choice(QUALIFIERS).title()} {crop} from {rng.choice(DISTRICTS)}.",
+                price=Decimal(rng.randint(1000, 200000)) / 100,
+                active=rng.random() > 0.05,
+                created_at=created_at,
+            ))
+        crops.classify_products(rows)
+        with _explicit_timestamps(Product, "created_at"):
+            Product.objects.bulk_create(rows, batch_size=batch_size)
+        created = list(Product.objects.filter(owner_id__in=farmer_ids).order_by("pk"))
+        product_ids = [p.pk for p in created]
+
+        reviews = []
+        for product in created:
+            n = min(len(customer_ids), max(0, round(rng.gauss(reviews_per_product, reviews_per_product / 2))))
+            for user_id in rng.sample(customer_ids, n):
+                reviews.append(Review(product_id=product.pk, user_id=user_id, rating=rng.choices(
+                    [1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 8])[0], comment=rng.choice(COMMENTS)))
+        Review.objects.bulk_create(reviews, batch_size=batch_size)
+
+        wishlists = [
+            Wishlist(user_id=user_id, product_id=product_id)
+            for user_id in customer_ids
+            for product_id in rng.sample(product_ids, min(wishlist_size, len(product_ids)))
+        ]
+        Wishlist.objects.bulk_create(wishlists, batch_size=batch_size)
+
+        # what the post_save signals would have done row by row
+        search.index_new_products(created, batch_size=batch_size)
+        prices.record_initial_prices(created, batch_size=batch_size)
+        price_board.add_products(created)
+        call_command("rebuild_rating_aggregates", stdout=io.StringIO())
+        catalog_cache.bump()
+        directory.invalidate_letter_index()
+
+    return {
+        "farmers": len(farmer_ids),
+        "customers": len(customer_ids),
+        "products": len(created),
+        "reviews": len(reviews),
+        "wishlists": len(wishlists),
+    }
@@ -0,0 +1,107 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.marketplace import engagement
+from apps.marketplace.models import Product
+
+from . import benchmark, seed
+from .middleware import QueryBudgetExceeded, QueryProfilerMiddleware
+from .profiler import RequestProfile, fingerprint, store
+
+
+class QueryProfilerTests(TestCase):
+    def setUp(self):
+        store.reset()
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        Product.objects.create(owner=self.farmer, title="Okra", price="60.00")
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        a = fingerprint('SELECT "t"."id" FROM "t" WHERE "t"."id" IN (%s, %s, %s) AND "t"."x" = 5 LIMIT 21')
+        b = fingerprint('SELECT "t"."id" FROM "t" WHERE "t"."id" IN (%s) AND "t"."x" = 7 LIMIT 21')
+        self.assertEqual(a, b)
+
+    def test_repeated_statements_are_reported(self):
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            for product in Product.objects.all():
+                User.objects.get(pk=product.owner_id)
+                User.objects.get(pk=product.owner_id)
+        self.assertEqual(profile.count, 3)
+        self.assertEqual(list(profile.duplicates().values()), [2])
+
+    def test_requests_aggregate_per_url_name(self):
+        self.client.get(reverse("marketplace:home"))
+        self.client.get(reverse("marketplace:home"))
+        self.client.get(reverse("marketplace:product_detail", args=[Product.objects.get().pk]))
+        summaries = {s["name"]: s for s in store.summaries()}
+        self.assertEqual(summaries["marketplace:home"]["requests"], 2)
+        self.assertEqual(summaries["marketplace:product_detail"]["requests"], 1)
+        self.assertGreater(summaries["marketplace:product_detail"]["max_queries"], 0)
+
+    @override_settings(QUERY_BUDGETS={"marketplace:product_detail": 1}, QUERY_BUDGET_ACTION="raise")
+    def test_budget_overrun_fails_the_request(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("marketplace:product_detail", args=[Product.objects.get().pk]))
+
+    @override_settings(QUERY_BUDGETS={"marketplace:product_detail": {"queries": 1}}, QUERY_BUDGET_ACTION="log")
+    def test_budget_overrun_is_logged_and_counted(self):
+        with self.assertLogs("apps.diagnostics.middleware", "WARNING"):
+            self.client.get(reverse("marketplace:product_detail", args=[Product.objects.get().pk]))
+        self.assertEqual(store.summaries()[0]["over_budget"], 1)
+
+    def test_async_views_are_profiled_in_place(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryProfilerMiddleware(view)))
+        self.client.get(f"/api/async/products/{Product.objects.get().pk}/")
+        summaries = {s["name"]: s for s in store.summaries()}
+        self.assertGreater(summaries["marketplace:product_detail_async_api"]["max_queries"], 0)
+
+    def test_stats_page_is_staff_only(self):
+        url = reverse("diagnostics:query_profile")
+        self.client.force_login(self.farmer)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user("ops", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse("marketplace:home"))
+        response = self.client.get(url)
+        self.assertContains(response, "marketplace:home")
+        self.assertNotContains(response, "diagnostics:query_profile")
+        self.client.post(url)
+        self.assertEqual(store.summaries(), [])
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_is_reproducible_and_clearable(self):
+        counts = seed.seed(farmers=3, customers=5, products=40, random_seed=7, prefix="a_")
+        self.assertEqual(counts["products"], 40)
+        titles = list(Product.objects.filter(owner__username__startswith="a_").order_by("pk")
+                      .values_list("title", flat=True))
+        seed.seed(farmers=3, customers=5, products=40, random_seed=7, prefix="b_")
+        self.assertEqual(titles, list(Product.objects.filter(owner__username__startswith="b_").order_by("pk")
+                                      .values_list("title", flat=True)))
+        seed.clear("a_")
+        self.assertFalse(User.objects.filter(username__startswith="a_").exists())
+
+    def test_every_route_is_in_the_mix(self):
+        self.assertEqual(benchmark.coverage_gaps(), ([], []))
+
+    def test_run_reports_routes_and_rolls_back(self):
+        seed.seed(farmers=3, customers=5, products=40)
+        products = Product.objects.count()
+        result = benchmark.run(requests=150, warmup=10)
+        self.assertEqual(result["totals"]["requests"], 150)
+        self.assertEqual(result["totals"]["errors"], 0)
+        self.assertIn("marketplace:home", result["routes"])
+        self.assertEqual(Product.objects.count(), products)
+        # the run's page views are dropped with its writes, not flushed later
+        self.assertEqual(len(engagement.counters), 0)
+        self.assertIn("req/s", benchmark.format_table(result, baseline=result))
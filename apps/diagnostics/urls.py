@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+app_name = "diagnostics"
+
+urlpatterns = [
+    path("queries/", views.query_profile, name="query_profile"),
+]
@@ -0,0 +1,28 @@
+# apps/diagnostics/views.py
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_http_methods
+
+from .middleware import budget_for
+from .profiler import store
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def query_profile(request):
+    """
+    Per-URL-name SQL stats collected by QueryProfilerMiddleware in this process.
+    POST clears them.
+    """
+    if request.method == "POST":
+        store.reset()
+        return redirect("diagnostics:query_profile")
+
+    views = store.summaries()
+    for view in views:
+        view["budget_queries"], view["budget_ms"] = budget_for(view["name"])
+    return render(request, "diagnostics/query_profile.html", {
+        "views": views,
+        "enabled": getattr(settings, "QUERY_PROFILER_ENABLED", False),
+    })
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class FarmersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.farmers"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (invalidates the directory letter index)
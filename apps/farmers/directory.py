@@ -0,0 +1,96 @@
+# apps/farmers/directory.py
+"""
+Farmer directory queries.
+
+The listing is one annotated query (profile joined, product and review
+totals aggregated per farmer) paged by username keyset, so a page costs
+the same at "A" and at "Z". The A–Z bar counts come from a cached
+letter -> counts map that signals.py drops whenever farmers or products change.
+"""
+import string
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Substr, Upper
+
+from config.replicas import PRIMARY
+
+PAGE_SIZE = 24
+
+LETTER_INDEX_KEY = "farmers:letter-index"
+LETTER_INDEX_TIMEOUT = 60 * 60
+
+# bucket for usernames that do not start with A–Z
+OTHER = "#"
+
+
+def farmers():
+    return User.objects.filter(profile__role="FARMER")
+
+
+def letter_index():
+    """
+    {"A": {"farmers": n, "products": m}, ..., "#": {...}} for every letter,
+    computed with one GROUP BY query and cached until invalidated.
+    """
+    index = cache.get(LETTER_INDEX_KEY)
+    if index is not None:
+        return index
+
+    index = {letter: {"farmers": 0, "products": 0} for letter in [*string.ascii_uppercase, OTHER]}
+    # cached for everyone until the next invalidation, so never from a lagging replica
+    rows = (
+        farmers()
+        .using(PRIMARY)
+        .annotate(initial=Upper(Substr("username", 1, 1)))
+        .values("initial")
+        .annotate(
+            n_farmers=Count("id", distinct=True),
+            n_products=Count("products", filter=Q(products__active=True)),
+        )
+        .order_by()
+    )
+    for row in rows:
+        bucket = index.get(row["initial"]) or index[OTHER]
+        bucket["farmers"] += row["n_farmers"]
+        bucket["products"] += row["n_products"]
+
+    cache.set(LETTER_INDEX_KEY, index, LETTER_INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_letter_index():
+    cache.delete(LETTER_INDEX_KEY)
+
+
+def farmer_page(letter="", search="", after="", page_size=PAGE_SIZE):
+    """
+    One page of farmers ordered by username, starting after the ``after`` cursor.
+    Returns (farmers, next_cursor); next_cursor is None on the last page.
+    """
+    qs = (
+        farmers()
+        .select_related("profile")
+        .annotate(
+            product_count=Count("products", filter=Q(products__active=True)),
+            review_count=Coalesce(Sum("products__rating_count", filter=Q(products__active=True)), 0),
+            rating_sum=Coalesce(Sum("products__rating_sum", filter=Q(products__active=True)), 0),
+        )
+        .order_by("username")
+    )
+    if letter == OTHER:
+        qs = qs.exclude(Q(*[("username__istartswith", c) for c in string.ascii_uppercase], _connector=Q.OR))
+    elif letter:
+        qs = qs.filter(username__istartswith=letter)
+    if search:
+        qs = qs.filter(username__icontains=search)
+    if after:
+        qs = qs.filter(username__gt=after)
+
+    rows = list(qs[:page_size + 1])
+    next_cursor = rows[page_size - 1].username if len(rows) > page_size else None
+    rows = rows[:page_size]
+    for farmer in rows:
+        farmer.rating_avg = round(farmer.rating_sum / farmer.review_count, 2) if farmer.review_count else 0
+    return rows, next_cursor
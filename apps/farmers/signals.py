@@ -0,0 +1,24 @@
+# apps/farmers/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import Profile
+from apps.marketplace.models import Product
+
+from .directory import invalidate_letter_index
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def directory_changed(sender, **kwargs):
+    invalidate_letter_index()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # a renamed farmer can move to another letter; last_login updates cannot
+    if not created and (update_fields is None or "username" in update_fields):
+        invalidate_letter_index()
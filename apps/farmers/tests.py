@@ -1,3 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from apps.accounts.models import Profile
+from apps.marketplace.models import Product
+
+from . import directory
+
+
+class ProductImportViewTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        Profile.objects.create(user=self.farmer, role="FARMER")
+        self.client.force_login(self.farmer)
+
+    def test_upload_reports_created_and_skipped_rows(self):
+        upload = SimpleUploadedFile("crops.csv", b"title,price\nLentil,120\nPeas,-\n")
+        response = self.client.post(reverse("farmers:product_import"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"]["created"], 1)
+        self.assertContains(response, "Skipped: 1")
+        self.assertTrue(Product.objects.filter(owner=self.farmer, title="Lentil").exists())
+
+
+class FarmerDirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmers = []
+        for name in ("alice", "anwar", "bashir", "chitra", "9acres"):
+            user = User.objects.create_user(name, password="pw")
+            Profile.objects.create(user=user, role="FARMER")
+            Product.objects.create(owner=user, title=f"{name} rice", price="50.00")
+            self.farmers.append(user)
+        Profile.objects.create(user=User.objects.create_user("buyer", password="pw"), role="CUSTOMER")
+
+    def test_page_query_count_does_not_grow_with_farmers(self):
+        url = reverse("farmers:all_farmers")
+        self.client.get(url)  # warm the letter index
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for i in range(10):
+            user = User.objects.create_user(f"dana{i}", password="pw")
+            Profile.objects.create(user=user, role="FARMER")
+            Product.objects.create(owner=user, title="Jute", price="5.00")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(response.context["farmers"][0].product_count, 1)
+
+    def test_letter_index_is_cached_and_invalidated(self):
+        index = directory.letter_index()
+        self.assertEqual(index["A"], {"farmers": 2, "products": 2})
+        self.assertEqual(index["#"], {"farmers": 1, "products": 1})
+        with self.assertNumQueries(0):
+            directory.letter_index()
+
+        Product.objects.create(owner=self.farmers[2], title="Dal", price="80.00")
+        self.assertEqual(directory.letter_index()["B"], {"farmers": 1, "products": 2})
+
+    def test_keyset_pages(self):
+        page, cursor = directory.farmer_page(page_size=2)
+        self.assertEqual([f.username for f in page], ["9acres", "alice"])
+        page, cursor = directory.farmer_page(after=cursor, page_size=2)
+        self.assertEqual([f.username for f in page], ["anwar", "bashir"])
+        page, cursor = directory.farmer_page(after=cursor, page_size=2)
+        self.assertEqual(([f.username for f in page], cursor), (["chitra"], None))
+        page, _ = directory.farmer_page(letter="#")
+        self.assertEqual([f.username for f in page], ["9acres"])
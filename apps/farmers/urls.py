@@ -8,6 +8,7 @@ urlpatterns = [
     path("profile/<int:farmer_id>/", views.farmer_profile, name="farmer_profile"),
     path("dashboard/", views.dashboard, name="dashboard"),
     path("create-product/", views.product_create, name="product_create"),  
+    path("import-products/", views.product_import, name="product_import"),
     path("product/edit/<int:pk>/", views.product_update, name="product_edit"),  # Updated this line
     path("product/delete/<int:pk>/", views.product_delete, name="product_delete"),  
     # Updated this line
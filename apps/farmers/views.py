@@ -5,10 +5,16 @@ from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
+from apps.marketplace import bulk_import, engagement
+from . import directory
 from apps.marketplace.models import Product
+from apps.marketplace.pagination import keyset_page
 from apps.marketplace.forms import ProductForm
 from django.contrib.auth.models import User
 
+DASHBOARD_PAGE_SIZE = 24
+
+
 def is_farmer(user) -> bool:
     """
     Returns True if the user has a profile with role == 'FARMER'.
@@ -39,10 +45,23 @@ def farmer_required(view_func):
 @farmer_required
 def dashboard(request):
     """
-    Farmer dashboard: list their products with edit/delete links.
+    Farmer dashboard: list their products with edit/delete links and each
+    product's views, cart adds and wishlist adds per day.
     """
-    products = Product.objects.filter(owner=request.user).order_by("-id")
-    return render(request, "farmers/dashboard.html", {"products": products})
+    try:
+        products, next_cursor = keyset_page(
+            Product.objects.filter(owner=request.user), request.GET.get("after"), DASHBOARD_PAGE_SIZE
+        )
+    except ValueError:
+        return redirect("farmers:dashboard")
+    series = engagement.daily_series([p.pk for p in products])
+    for p in products:
+        p.engagement = series[p.pk]
+    return render(request, "farmers/dashboard.html", {
+        "products": products,
+        "next_cursor": next_cursor,
+        "series_days": engagement.SERIES_DAYS,
+    })
 
 
 @farmer_required
@@ -60,6 +79,26 @@ def product_create(request):
         return redirect("farmers:dashboard")
     return render(request, "farmers/product_form.html", {"form": form, "mode": "create"})
 
+@farmer_required
+@require_http_methods(["GET", "POST"])
+def product_import(request):
+    """
+    Bulk-create products from an uploaded CSV or JSON file.
+    """
+    result = None
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            messages.error(request, "Choose a CSV or JSON file to upload.")
+        else:
+            fmt = bulk_import.detect_format(upload.name)
+            result = bulk_import.import_products(upload.file, request.user, fmt)
+            if result["created"]:
+                messages.success(request, f"Imported {result['created']} products.")
+            if result["error_count"]:
+                messages.error(request, f"{result['error_count']} rows were skipped.")
+    return render(request, "farmers/product_import.html", {"result": result})
+
 @farmer_required
 @require_http_methods(["GET", "POST"])
 def product_update(request, pk):
@@ -117,25 +156,16 @@ def product_edit(request, pk):
 
 
 def all_farmers(request):
-    letter = request.GET.get("letter", "").upper()
-    search_query = request.GET.get("search", "")
-    farmers = User.objects.filter(profile__role="FARMER")
-
-    # Handle alphabet filter
-    if letter:
-        farmers = farmers.filter(username__istartswith=letter)
-
-    # Handle search query
-    if search_query:
-        farmers = farmers.filter(username__icontains=search_query)
-
-    # Add all farmers' data
-    farmer_data = []
-    for farmer in farmers:
-        products = Product.objects.filter(owner=farmer)
-        farmer_data.append({
-            "farmer": farmer,
-            "products": products
-        })
-    
-    return render(request, "farmers/all_farmers.html", {"farmer_data": farmer_data})
+    letter = request.GET.get("letter", "").upper()[:1]
+    search_query = request.GET.get("search", "").strip()
+    after = request.GET.get("after", "")
+
+    farmers, next_cursor = directory.farmer_page(letter, search_query, after)
+
+    return render(request, "farmers/all_farmers.html", {
+        "farmers": farmers,
+        "next_cursor": next_cursor,
+        "letter_index": directory.letter_index(),
+        "letter": letter,
+        "search_query": search_query,
+    })
@@ -1,14 +1,58 @@
 from django.contrib import admin
-from .models import Product, Review
+from .models import Crop, CropPrice, PriceAlert, Product, ProductEngagement, Review
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("title", "price", "owner", "active", "created_at")
-    list_filter = ("active",)
+    list_display = ("title", "price", "owner", "crop", "active", "rating_count", "created_at")
+    list_filter = ("active", "crop_confirmed", "crop")
     search_fields = ("title", "owner__username")
+    readonly_fields = ("rating_sum", "rating_count", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5")
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ("product", "user", "rating", "created_at")
     list_filter = ("rating",)
     search_fields = ("product__title", "user__username")
+
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+    list_display = ("user", "product", "crop", "direction", "threshold", "active", "triggered_at")
+    list_filter = ("active", "direction")
+    search_fields = ("user__username", "crop", "product__title")
+    raw_id_fields = ("user", "product", "triggered_product")
+
+
+@admin.register(Crop)
+class CropAdmin(admin.ModelAdmin):
+    # after adding names, run `manage.py classify_crops --all` to re-match existing listings
+    list_display = ("name", "local_name", "slug")
+    search_fields = ("name", "local_name", "slug")
+    prepopulated_fields = {"slug": ("name",)}
+
+
+@admin.register(CropPrice)
+class CropPriceAdmin(admin.ModelAdmin):
+    # maintained by apps.marketplace.price_board; fix drift with `manage.py rebuild_price_board`
+    list_display = ("crop", "listings", "min_price", "median_price", "max_price", "mean_price", "updated_at")
+    search_fields = ("crop__name", "crop__local_name")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProductEngagement)
+class ProductEngagementAdmin(admin.ModelAdmin):
+    # written in batches by apps.marketplace.engagement
+    list_display = ("product", "day", "views", "cart_adds", "wishlist_adds")
+    list_filter = ("day",)
+    raw_id_fields = ("product",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,174 @@
+# apps/marketplace/alerts.py
+"""
+Price alerts: "tell me when this product / any <crop> listing drops below
+(or rises above) a price".
+
+Alerts are evaluated when a price moves (signals.product_saved, so the
+farmer edit form, the API PUT/PATCH and the admin all count). A move from
+``old`` to ``new`` can only cross thresholds between the two prices: a drop
+crosses "below" alerts with new <= threshold < old, a rise crosses "above"
+alerts with old < threshold <= new. The partial indexes on
+(product|crop, direction, threshold) over active alerts keep thresholds
+sorted per target, so matching is a range scan (logarithmic seek plus the
+matches), independent of how many alerts exist. A newly listed product has
+no old price and matches every alert its price satisfies, as does a
+listing put back on sale or moved to another crop. Likewise a new
+or re-armed alert is checked against the current prices
+(evaluate_alert()), so an alert set below today's price fires at once
+instead of waiting for a move that may never cross it.
+
+Crop alerts name a catalog crop by its slug and match the listings
+classified as that crop (Product.crop, see crops.py), so "Cherry tomatoes"
+and "টমেটো" both reach a "tomato" alert.
+
+Triggered alerts are switched off and stamped with the price and product
+that triggered them; buyers see them through the alerts API and re-arm them
+by setting active again. Products created with bulk_create (bulk import)
+are evaluated a batch at a time by evaluate_listed(): per crop, the
+cheapest and the dearest new listing decide every alert, so a batch costs
+one read of the candidate alerts and one UPDATE per triggering listing.
+"""
+import logging
+
+from django.utils import timezone
+
+from . import crops
+from .models import PriceAlert, Product
+
+logger = logging.getLogger(__name__)
+
+_to_price = PriceAlert._meta.get_field("threshold").to_python
+
+# crops per query in evaluate_listed(); stays under SQL Server's 2100 parameters
+CROP_BATCH_SIZE = 1000
+
+
+def normalize_crop(text):
+    """
+    The catalog crop slug an alert's crop is stored as ("Tomatoes" -> "tomato").
+    """
+    slug = crops.resolve(text)
+    if slug is None:
+        raise ValueError("Name one crop from the catalog, e.g. 'tomato'.")
+    return slug
+
+
+def _crossed(queryset, old_price, new_price):
+    if old_price is None:
+        return queryset.filter(direction=PriceAlert.BELOW, threshold__gte=new_price) | queryset.filter(
+            direction=PriceAlert.ABOVE, threshold__lte=new_price
+        )
+    if new_price < old_price:
+        return queryset.filter(direction=PriceAlert.BELOW, threshold__gte=new_price, threshold__lt=old_price)
+    if new_price > old_price:
+        return queryset.filter(direction=PriceAlert.ABOVE, threshold__gt=old_price, threshold__lte=new_price)
+    return queryset.none()
+
+
+def matching(product, old_price, new_price):
+    """
+    Active alerts crossed by ``product`` moving from ``old_price`` (None: newly
+    listed) to ``new_price``, as a queryset of (pk, user_id) rows.
+    """
+    old_price = None if old_price is None else _to_price(old_price)
+    new_price = _to_price(new_price)
+    active = PriceAlert.objects.filter(active=True).order_by()
+    by_product = _crossed(active.filter(product_id=product.pk), old_price, new_price)
+    crop = crops.slug(product.crop_id)
+    if crop is None:
+        return by_product.values_list("pk", "user_id")
+    by_crop = _crossed(active.filter(crop=crop), old_price, new_price)
+    return by_product.values_list("pk", "user_id").union(by_crop.values_list("pk", "user_id"))
+
+
+def evaluate(product, old_price, now=None):
+    """
+    Trigger the alerts crossed by ``product``'s price change; returns how many fired.
+    """
+    if not product.active:
+        return 0
+    new_price = _to_price(product.price)
+    hits = list(matching(product, old_price, new_price))
+    if not hits:
+        return 0
+    PriceAlert.objects.filter(pk__in=[pk for pk, _ in hits], active=True).update(
+        active=False,
+        triggered_at=now or timezone.now(),
+        triggered_price=new_price,
+        triggered_product=product,
+    )
+    logger.info("Price of p#%s moved %s -> %s: %d alert(s) triggered", product.pk, old_price, new_price, len(hits))
+    return len(hits)
+
+
+def evaluate_listed(products, now=None):
+    """
+    Trigger the crop alerts satisfied by newly listed ``products`` (saved
+    with bulk_create, so without post_save); returns how many fired. New
+    products have no product alerts yet.
+    """
+    cheapest, dearest = {}, {}
+    for product in products:
+        crop = crops.slug(product.crop_id)
+        if not product.active or crop is None:
+            continue
+        if crop not in cheapest or product.price < cheapest[crop].price:
+            cheapest[crop] = product
+        if crop not in dearest or product.price > dearest[crop].price:
+            dearest[crop] = product
+    hits = {}  # triggering product -> alert pks
+    listed = list(cheapest)
+    for start in range(0, len(listed), CROP_BATCH_SIZE):
+        candidates = PriceAlert.objects.filter(active=True, crop__in=listed[start:start + CROP_BATCH_SIZE]).order_by()
+        for pk, crop, direction, threshold in candidates.values_list("pk", "crop", "direction", "threshold"):
+            if direction == PriceAlert.BELOW and _to_price(cheapest[crop].price) <= threshold:
+                hits.setdefault(cheapest[crop], []).append(pk)
+            elif direction == PriceAlert.ABOVE and _to_price(dearest[crop].price) >= threshold:
+                hits.setdefault(dearest[crop], []).append(pk)
+    now = now or timezone.now()
+    fired = 0
+    for product, pks in hits.items():
+        fired += PriceAlert.objects.filter(pk__in=pks, active=True).update(
+            active=False, triggered_at=now, triggered_price=_to_price(product.price), triggered_product=product,
+        )
+    if fired:
+        logger.info("%d new listing(s) triggered %d alert(s)", len(hits), fired)
+    return fired
+
+
+def _trigger(alert, product, now=None):
+    fields = {
+        "active": False,
+        "triggered_at": now or timezone.now(),
+        "triggered_price": _to_price(product.price),
+        "triggered_product": product,
+    }
+    if not PriceAlert.objects.filter(pk=alert.pk, active=True).update(**fields):
+        return False
+    for name, value in fields.items():
+        setattr(alert, name, value)
+    return True
+
+
+def evaluate_alert(alert, now=None):
+    """
+    Trigger a newly saved or re-armed ``alert`` if a current price already
+    satisfies it; returns whether it fired.
+    """
+    if not alert.active:
+        return False
+    listings = Product.objects.active().only("pk", "price")
+    if alert.product_id:
+        listings = listings.filter(pk=alert.product_id)
+    else:
+        listings = listings.filter(crop__slug=alert.crop)
+    if alert.direction == PriceAlert.BELOW:
+        product = listings.filter(price__lte=alert.threshold).order_by("price", "pk").first()
+    else:
+        product = listings.filter(price__gte=alert.threshold).order_by("-price", "pk").first()
+    if product is None:
+        return False
+    fired = _trigger(alert, product, now)
+    if fired:
+        logger.info("Alert #%s already met by p#%s at %s", alert.pk, product.pk, product.price)
+    return fired
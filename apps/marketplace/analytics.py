@@ -0,0 +1,191 @@
+# apps/marketplace/analytics.py
+"""
+Vectorized price analytics over PriceRollup series.
+
+All requested series are loaded with one query into a single
+(series x periods) NumPy matrix aligned on a shared date axis, and every
+statistic is computed for all series at once with array operations.
+"""
+import numpy as np
+
+from .models import PriceRollup
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def load_close_matrix(product_ids, resolution=PriceRollup.DAY, start=None, end=None):
+    """
+    Return (product_ids, periods, closes) where ``closes`` is a float matrix
+    with one row per product and NaN where a product has no rollup.
+    """
+    qs = PriceRollup.objects.filter(product_id__in=product_ids, resolution=resolution)
+    if start:
+        qs = qs.filter(period_start__gte=start)
+    if end:
+        qs = qs.filter(period_start__lte=end)
+    rows = list(qs.order_by().values_list("product_id", "period_start", "close"))
+
+    product_ids = sorted(set(product_ids))
+    if not rows:
+        return product_ids, [], np.full((len(product_ids), 0), np.nan)
+
+    pids, days, closes = zip(*rows)
+    periods = sorted(set(days))
+    row_of = {pid: i for i, pid in enumerate(product_ids)}
+    col_of = {day: j for j, day in enumerate(periods)}
+
+    matrix = np.full((len(product_ids), len(periods)), np.nan)
+    matrix[[row_of[p] for p in pids], [col_of[d] for d in days]] = np.asarray(closes, dtype=float)
+    return product_ids, periods, matrix
+
+
+def forward_fill(matrix):
+    """
+    Carry the last known price forward along each row (leading NaNs stay NaN).
+    """
+    if matrix.size == 0:
+        return matrix
+    valid = ~np.isnan(matrix)
+    idx = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], idx]
+    # rows still NaN before their first observation
+    filled[np.cumsum(valid, axis=1) == 0] = np.nan
+    return filled
+
+
+def _rolling_sum(values, window):
+    """
+    Sum over the trailing ``window`` columns; NaN until a full window exists.
+    """
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] < window:
+        return out
+    missing = np.isnan(values)
+    pad = np.zeros((values.shape[0], 1))
+    csum = np.concatenate([pad, np.cumsum(np.where(missing, 0.0, values), axis=1)], axis=1)
+    cmiss = np.concatenate([pad, np.cumsum(missing, axis=1)], axis=1)
+    sums = csum[:, window:] - csum[:, :-window]
+    # any missing value inside the window makes the whole window undefined
+    sums[(cmiss[:, window:] - cmiss[:, :-window]) > 0] = np.nan
+    out[:, window - 1:] = sums
+    return out
+
+
+def moving_average(matrix, window):
+    return _rolling_sum(matrix, window) / window
+
+
+def pct_change(matrix):
+    out = np.full(matrix.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:, 1:] = (matrix[:, 1:] / matrix[:, :-1] - 1.0) * 100.0
+    return out
+
+
+def rolling_volatility(matrix, window):
+    """
+    Rolling standard deviation of log returns over ``window`` periods.
+    """
+    returns = np.full(matrix.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[:, 1:] = np.diff(np.log(matrix), axis=1)
+    s1 = _rolling_sum(returns, window)
+    s2 = _rolling_sum(returns * returns, window)
+    mean = s1 / window
+    var = np.maximum(s2 / window - mean * mean, 0.0)
+    return np.sqrt(var * window / max(window - 1, 1))
+
+
+def summarize(matrix):
+    """
+    Per-row first/last/min/max, total change and percentiles, ignoring NaNs.
+    """
+    n_rows = matrix.shape[0]
+    summary = {
+        "first": np.full(n_rows, np.nan),
+        "last": np.full(n_rows, np.nan),
+        "min": np.full(n_rows, np.nan),
+        "max": np.full(n_rows, np.nan),
+        "change_pct": np.full(n_rows, np.nan),
+        "percentiles": np.full((n_rows, len(PERCENTILES)), np.nan),
+    }
+    valid = ~np.isnan(matrix)
+    has_data = valid.any(axis=1)
+    if not has_data.any():
+        return summary
+
+    rows = np.arange(n_rows)
+    first_idx = valid.argmax(axis=1)
+    last_idx = matrix.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+    summary["first"][has_data] = matrix[rows, first_idx][has_data]
+    summary["last"][has_data] = matrix[rows, last_idx][has_data]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary["change_pct"] = (summary["last"] / summary["first"] - 1.0) * 100.0
+
+    # np.sort puts NaN last, so each row's valid prices are its first n columns;
+    # this avoids np.nanpercentile, which loops over rows internally
+    data = np.sort(matrix[has_data], axis=1)
+    rows = np.arange(data.shape[0])
+    last = valid[has_data].sum(axis=1) - 1
+    summary["min"][has_data] = data[:, 0]
+    summary["max"][has_data] = data[rows, last]
+    for k, p in enumerate(PERCENTILES):
+        # linear interpolation, same as numpy's default method
+        pos = last * (p / 100.0)
+        lo = np.floor(pos).astype(int)
+        hi = np.ceil(pos).astype(int)
+        summary["percentiles"][has_data, k] = data[rows, lo] + (data[rows, hi] - data[rows, lo]) * (pos - lo)
+    return summary
+
+
+def compute(matrix, window=7):
+    """
+    Run every statistic over a (series x periods) close matrix.
+    """
+    filled = forward_fill(matrix)
+    return {
+        "close": filled,
+        "moving_average": moving_average(filled, window),
+        "volatility": rolling_volatility(filled, window),
+        "pct_change": pct_change(filled),
+        "summary": summarize(filled),
+    }
+
+
+def _clean(values, digits=4):
+    # JSON has no NaN/inf: emit null instead
+    return [None if not np.isfinite(v) else round(float(v), digits) for v in values]
+
+
+def price_analytics(product_ids, resolution=PriceRollup.DAY, start=None, end=None, window=7):
+    """
+    JSON-ready analytics for many products at once.
+    """
+    product_ids, periods, matrix = load_close_matrix(product_ids, resolution, start, end)
+    result = compute(matrix, window)
+    summary = result["summary"]
+
+    series = []
+    for i, pid in enumerate(product_ids):
+        series.append({
+            "product": pid,
+            "close": _clean(result["close"][i]),
+            "moving_average": _clean(result["moving_average"][i]),
+            "volatility": _clean(result["volatility"][i], 6),
+            "pct_change": _clean(result["pct_change"][i]),
+            "summary": {
+                "first": _clean([summary["first"][i]])[0],
+                "last": _clean([summary["last"][i]])[0],
+                "min": _clean([summary["min"][i]])[0],
+                "max": _clean([summary["max"][i]])[0],
+                "change_pct": _clean([summary["change_pct"][i]])[0],
+                "percentiles": dict(zip((f"p{p}" for p in PERCENTILES), _clean(summary["percentiles"][i]))),
+            },
+        })
+    return {
+        "resolution": resolution,
+        "window": window,
+        "periods": [d.isoformat() for d in periods],
+        "series": series,
+    }
@@ -0,0 +1,195 @@
+# apps/marketplace/bulk_import.py
+"""
+Bulk product import from CSV or JSON files.
+
+Rows are parsed as a stream (csv.DictReader, or JSON objects decoded one at
+a time), validated with ProductForm, and inserted with bulk_create in
+batches of BATCH_SIZE, each in its own transaction. bulk_create sends no
+post_save, so each batch does the signal handlers' work once for all its
+rows: search postings, price history, the price board, price alerts, ticker
+events and the farmer directory counts, all keyed on the new primary keys
+(read back by content where the database cannot return them, e.g. MySQL).
+Memory stays bounded by the batch size however large the file is; a JSON
+object larger than MAX_JSON_OBJECT_SIZE stops the import (a malformed one
+would otherwise be buffered to the end of the file).
+"""
+import csv
+import io
+import json
+from collections import defaultdict, deque
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max
+
+from apps.farmers.directory import invalidate_letter_index
+
+from . import alerts, catalog_cache, crops, price_board, prices, search, ticker
+from .forms import ProductForm
+from .models import Product
+
+FORMATS = ("csv", "json")
+
+BATCH_SIZE = 1000
+
+# keep the error report bounded on very dirty files; error_count has the total
+MAX_REPORTED_ERRORS = 1000
+
+FIELDS = ("title", "price", "description", "active")
+
+FALSE_VALUES = {"0", "false", "no", "n", "off"}
+
+_JSON_READ_SIZE = 64 * 1024
+# characters; an unfinished object this long is taken to be malformed
+MAX_JSON_OBJECT_SIZE = 1024 * 1024
+
+
+def detect_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return "json"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def _iter_csv(fh):
+    for row in csv.DictReader(fh):
+        yield {k.strip().lower(): v for k, v in row.items() if k}
+
+
+def _iter_json(fh):
+    """
+    Decode a JSON array of objects, or JSON Lines, one object at a time.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    while True:
+        # skip whitespace, the array brackets and separating commas
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos >= len(buf) or (not eof and len(buf) - pos < _JSON_READ_SIZE):
+            if eof:
+                if pos < len(buf):
+                    raise ValueError(f"Trailing data in JSON near: {buf[pos:pos + 40]!r}")
+                return
+            chunk = fh.read(_JSON_READ_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            if len(buf) - pos > MAX_JSON_OBJECT_SIZE:
+                raise ValueError(f"JSON object longer than {MAX_JSON_OBJECT_SIZE} characters near: {buf[pos:pos + 40]!r}")
+            # object spans the buffer boundary: read more and retry
+            chunk = fh.read(_JSON_READ_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        pos = end
+        yield obj
+
+
+def iter_rows(fileobj, fmt):
+    """
+    Yield raw row dicts from a binary file object.
+    """
+    fh = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        return _iter_csv(fh)
+    if fmt == "json":
+        return _iter_json(fh)
+    raise ValueError(f"Unknown import format: {fmt!r}")
+
+
+def _form_data(row):
+    data = {f: row.get(f) for f in FIELDS if row.get(f) is not None}
+    active = str(data.get("active", "")).strip().lower()
+    # a missing/blank column means "active", unlike an unchecked HTML checkbox
+    data["active"] = active not in FALSE_VALUES
+    return data
+
+
+def _form_errors(form):
+    return {field: [str(e) for e in errors] for field, errors in form.errors.items()}
+
+
+def _with_keys(batch, after_pk):
+    """
+    Give ``batch`` the primary keys bulk_create could not return (MySQL):
+    the owner's rows inserted after ``after_pk``, matched to the batch by
+    content, so a product the farmer adds meanwhile is not mistaken for one.
+    """
+    waiting = defaultdict(deque)
+    for product in batch:
+        waiting[product.title, product.price, product.description, product.active].append(product)
+    rows = Product.objects.filter(owner_id=batch[0].owner_id, pk__gt=after_pk).order_by("pk").values_list(
+        "pk", "title", "price", "description", "active"
+    )
+    for pk, *key in rows.iterator():
+        products = waiting.get(tuple(key))
+        if products:
+            products.popleft().pk = pk
+    if any(product.pk is None for product in batch):
+        raise DatabaseError("Could not read back the primary keys of imported products.")
+    return batch
+
+
+def _insert(batch):
+    crops.classify_products(batch)
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            created = Product.objects.bulk_create(batch)
+        else:
+            after_pk = Product.objects.aggregate(last=Max("pk"))["last"] or 0
+            created = _with_keys(Product.objects.bulk_create(batch), after_pk)
+        # bulk_create sends no post_save, so do the signal work in bulk here
+        search.index_new_products(created)
+        prices.record_initial_prices(created)
+        price_board.add_products(created)
+        alerts.evaluate_listed(created)
+        ticker.publish_products(created)
+        catalog_cache.bump()
+        invalidate_letter_index()
+    return len(created)
+
+
+def import_products(fileobj, owner, fmt="csv", batch_size=BATCH_SIZE):
+    """
+    Import products owned by ``owner`` from ``fileobj`` (binary).
+    Returns {"rows", "created", "error_count", "errors": [{"row", "errors"}]}.
+    Row numbers are 1-based data rows (the CSV header is not counted).
+    """
+    result = {"rows": 0, "created": 0, "error_count": 0, "errors": []}
+    batch = []
+
+    def report(row_number, errors):
+        result["error_count"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": row_number, "errors": errors})
+
+    try:
+        for row_number, row in enumerate(iter_rows(fileobj, fmt), start=1):
+            result["rows"] = row_number
+            if not isinstance(row, dict):
+                report(row_number, {"__all__": ["Row must be an object."]})
+                continue
+            form = ProductForm(data=_form_data(row))
+            if not form.is_valid():
+                report(row_number, _form_errors(form))
+                continue
+            product = form.save(commit=False)
+            product.owner = owner
+            batch.append(product)
+            if len(batch) >= batch_size:
+                result["created"] += _insert(batch)
+                batch = []
+    except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+        # malformed file: keep what was imported so far and report where it stopped
+        report(result["rows"] + 1, {"__all__": [f"Could not parse file: {exc}"]})
+
+    if batch:
+        result["created"] += _insert(batch)
+    return result
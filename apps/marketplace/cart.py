@@ -0,0 +1,120 @@
+# apps/marketplace/cart.py
+"""
+Session cart: storage, validation and pricing in one place.
+
+The session keeps ``{"<product id>": qty}`` under ``SESSION_KEY``. Every
+reader goes through Cart.summary(), which loads all lines with one query,
+prices them in Decimal, and drops entries whose product was deleted or
+deactivated so the stored cart never drifts from what is shown.
+"""
+from decimal import Decimal
+
+from .models import Product
+
+SESSION_KEY = "cart"
+
+MAX_QTY = 999
+
+
+class CartError(ValueError):
+    """
+    A cart change that is not allowed (inactive product, own product, bad qty).
+    """
+
+
+def parse_qty(value, default=1):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Cart:
+    def __init__(self, session):
+        self.session = session
+        self._items = {}
+        stored = session.get(SESSION_KEY) or {}
+        # a cart that is not a dict (e.g. a list from an older session format)
+        # has nothing readable: start empty; it differs from what _save()
+        # writes, so the comparison below overwrites it
+        raw = stored if isinstance(stored, dict) else {}
+        for key, qty in raw.items():
+            pk, qty = parse_qty(key, None), parse_qty(qty, 0)
+            if pk is not None and qty > 0:
+                self._items[pk] = min(qty, MAX_QTY)
+        if stored != {str(pk): qty for pk, qty in self._items.items()}:
+            # malformed entries from older sessions are dropped on first touch
+            self._save()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, pk):
+        return int(pk) in self._items
+
+    def quantity(self, pk):
+        return self._items.get(int(pk), 0)
+
+    def _save(self):
+        self.session[SESSION_KEY] = {str(pk): qty for pk, qty in self._items.items()}
+        self.session.modified = True
+
+    def add(self, product, qty=1, user=None):
+        """
+        Add ``qty`` of ``product``; returns the new quantity in the cart.
+        """
+        if not product.active:
+            raise CartError("This product is no longer available.")
+        if user is not None and product.owner_id == user.pk:
+            raise CartError("You cannot add your own product to the cart.")
+        if qty < 1:
+            raise CartError("Quantity must be at least 1.")
+        self._items[product.pk] = min(self._items.get(product.pk, 0) + qty, MAX_QTY)
+        self._save()
+        return self._items[product.pk]
+
+    def set_quantity(self, pk, qty):
+        """
+        Replace the quantity of a line already in the cart; 0 removes it.
+        """
+        pk = int(pk)
+        if pk not in self._items:
+            raise CartError("This product is not in your cart.")
+        if qty < 0:
+            raise CartError("Quantity cannot be negative.")
+        if qty == 0:
+            return self.remove(pk)
+        self._items[pk] = min(qty, MAX_QTY)
+        self._save()
+        return True
+
+    def remove(self, pk):
+        if self._items.pop(int(pk), None) is None:
+            return False
+        self._save()
+        return True
+
+    def clear(self):
+        self._items = {}
+        self._save()
+
+    def summary(self):
+        """
+        {"lines": [{"product", "qty", "line_total"}], "total", "count"} with one query.
+        Lines keep the order products were added in.
+        """
+        lines, total, count = [], Decimal("0.00"), 0
+        if self._items:
+            products = Product.objects.active().order_by().in_bulk(list(self._items))
+            stale = [pk for pk in self._items if pk not in products]
+            for pk in stale:
+                del self._items[pk]
+            if stale:
+                self._save()
+            for pk, qty in self._items.items():
+                product = products[pk]
+                line_total = product.price * qty
+                total += line_total
+                count += qty
+                lines.append({"product": product, "qty": qty, "line_total": line_total})
+        return {"lines": lines, "total": total, "count": count}
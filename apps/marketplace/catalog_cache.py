@@ -0,0 +1,73 @@
+# apps/marketplace/catalog_cache.py
+"""
+Versioned cache for the home page "latest products" shelf.
+
+Everything cached here is keyed on a catalog version number kept in the
+cache itself. Product and Review signals bump the version, which makes every
+older entry unreachable at once; stale entries are never deleted one by one
+and simply age out (TIMEOUT) or get culled by the cache backend.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from config.replicas import PRIMARY
+
+from .models import Product
+from .pagination import keyset_page
+
+VERSION_KEY = "catalog:version"
+
+SHELF_SIZE = 12
+
+# lifetime of the shelf queryset result and of each rendered card fragment
+SHELF_TIMEOUT = 10 * 60
+
+
+def _fresh_version():
+    # time-based, so a version key lost to eviction never restarts at an old value
+    return time.time_ns() // 1000
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, _fresh_version(), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), None)
+
+
+def bump():
+    """
+    Invalidate everything keyed on the current version. Bumped again after
+    commit so a reader that refilled the cache mid-transaction is not kept.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def latest_products(catalog_version=None):
+    """
+    (products, next_cursor) for the newest SHELF_SIZE active products (owner
+    joined), cached per version. Older pages are read with
+    pagination.keyset_page directly.
+    """
+    key = f"catalog:latest:{catalog_version or version()}"
+    shelf = cache.get(key)
+    if shelf is None:
+        # shared by every reader of this version, so never from a lagging replica
+        shelf = keyset_page(shelf_queryset().using(PRIMARY), page_size=SHELF_SIZE)
+        cache.set(key, shelf, SHELF_TIMEOUT)
+    return shelf
+
+
+def shelf_queryset():
+    return Product.objects.active().select_related("owner")
@@ -0,0 +1,71 @@
+# apps/marketplace/conditional.py
+"""
+ETag / Last-Modified validators for product pages and the product API.
+
+A product's version is read with one aggregate query: its own updated_at,
+the newest Review.updated_at and the stored rating aggregates (which also
+change when a review is deleted). The result is memoised on the request,
+because django.views.decorators.http.condition asks for the ETag and the
+Last-Modified date separately.
+"""
+import hashlib
+
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .models import Product
+
+
+def product_state(request, pk):
+    """
+    (updated_at, last_review_at, rating_sum, rating_count) of an active product, or None.
+    """
+    memo = request.__dict__.setdefault("_product_state", {})
+    if pk not in memo:
+        memo[pk] = (
+            Product.objects.filter(pk=pk, active=True)
+            .annotate(last_review_at=Max("reviews__updated_at"))
+            .values_list("updated_at", "last_review_at", "rating_sum", "rating_count")
+            .first()
+        )
+    return memo[pk]
+
+
+def last_modified_for(state):
+    updated_at, last_review_at = state[0], state[1]
+    return max(updated_at, last_review_at) if last_review_at else updated_at
+
+
+def _digest(*parts):
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def etag_for(pk, state):
+    return _digest(pk, *state)
+
+
+def product_last_modified(request, pk, *args, **kwargs):
+    state = product_state(request, pk)
+    return last_modified_for(state) if state else None
+
+
+def product_etag(request, pk, *args, **kwargs):
+    state = product_state(request, pk)
+    return etag_for(pk, state) if state else None
+
+
+def product_page_etag(request, pk, *args, **kwargs):
+    """
+    The HTML page also shows the viewer's login state and cart badge, so its
+    ETag varies with them (and it gets no Last-Modified, which cannot).
+    """
+    state = product_state(request, pk)
+    if state is None:
+        return None
+    cart = sorted(request.session.get("cart", {}).items())
+    return _digest(pk, *state, request.user.pk, cart)
+
+
+# decorators for views taking the product ``pk``
+product_page_condition = condition(etag_func=product_page_etag)
+product_api_condition = condition(etag_func=product_etag, last_modified_func=product_last_modified)
@@ -0,0 +1,230 @@
+# apps/marketplace/crops.py
+"""
+Crop catalog matching: free-text listing titles ("Tomato", "tomatoes fresh",
+"টমেটো") to canonical Crop rows.
+
+Every crop name, local name and alias is normalized like a search term
+(NFKC, case-folded, English plurals folded) and indexed by its character
+trigrams in an in-memory inverted index (trigram -> names). A title is cut
+into candidate phrases, each word and each pair of adjacent words, leaving
+out numbers and pack sizes. A phrase equal to a name scores 1. Otherwise
+the names sharing its trigrams are scored by the Dice coefficient
+2|A & B| / (|A| + |B|), so misspellings ("tomatto", "chilli") still match
+while unrelated words share too few trigrams.
+
+The catalog is small (hundreds of names), so each process builds the index
+once and keeps it until a Crop is saved or deleted anywhere: crop changes
+bump a version number in the cache, as catalog_cache does. Matching a title
+then costs no queries, which is what lets the classify_crops command work
+through a large backlog quickly.
+
+Price alerts and the live ticker's crop topics are keyed on the crop's
+slug: slug() and resolve() turn a crop id or an exact crop name into one
+without a query.
+
+Titles are matched when a product is saved (signals.product_classify, which
+covers the farmer form, the product APIs and the admin) and on bulk_create
+paths through classify_products(). A crop the farmer picked is confirmed
+and never replaced.
+"""
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from config.replicas import PRIMARY
+
+from . import search
+from .models import Crop
+
+# Dice score a title phrase needs to be assigned a crop automatically
+MIN_SCORE = 0.7
+# looser cut-off for suggestions a farmer picks from
+SUGGEST_MIN_SCORE = 0.4
+MAX_SUGGESTIONS = 5
+
+# title words that are pack sizes, not crops ("Fresh tomato (5 kg)"); numbers are skipped too
+UNIT_TERMS = frozenset("kg g gm gram kilo litre liter l ml dozen bundle sack bag piece pc pcs pack box".split())
+
+VERSION_KEY = "crops:version"
+
+Match = namedtuple("Match", "crop_id score name")
+
+
+def title_words(text):
+    """
+    Normalized words of ``text`` that can name a crop.
+    """
+    return [term for term in search.tokenize(text) if term not in UNIT_TERMS and not term.isdigit()]
+
+
+def phrases(words):
+    """
+    (position, phrase) for every word and pair of adjacent words.
+    """
+    for position, word in enumerate(words):
+        yield position, word
+        if position + 1 < len(words):
+            yield position, f"{word} {words[position + 1]}"
+
+
+def trigrams(phrase):
+    padded = f"  {phrase} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class CropIndex:
+    """
+    Trigram index over every name of every crop.
+    """
+
+    def __init__(self, names, version=None, slugs=None):
+        self.version = version
+        self.slugs = dict(slugs or {})  # crop id -> slug
+        self.by_slug = {slug: crop_id for crop_id, slug in self.slugs.items()}
+        self.entries = []  # (crop_id, phrase, word count, trigram count)
+        self.exact = {}  # phrase -> entry
+        self.postings = {}  # trigram -> [entry]
+        for crop_id, text in names:
+            phrase = " ".join(title_words(text))
+            if not phrase or phrase in self.exact:
+                continue
+            entry = len(self.entries)
+            grams = trigrams(phrase)
+            self.entries.append((crop_id, phrase, phrase.count(" ") + 1, len(grams)))
+            self.exact[phrase] = entry
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(entry)
+
+    @classmethod
+    def from_catalog(cls, version=None):
+        catalog = list(Crop.objects.using(PRIMARY))
+        names = ((crop.pk, name) for crop in catalog for name in crop.names() if name)
+        return cls(names, version, {crop.pk: crop.slug for crop in catalog})
+
+    def _scored(self, phrase):
+        entry = self.exact.get(phrase)
+        if entry is not None:
+            return {entry: 1.0}
+        grams = trigrams(phrase)
+        shared = {}
+        for gram in grams:
+            for entry in self.postings.get(gram, ()):
+                shared[entry] = shared.get(entry, 0) + 1
+        return {entry: 2 * n / (len(grams) + self.entries[entry][3]) for entry, n in shared.items()}
+
+    def match(self, title, min_score=SUGGEST_MIN_SCORE, limit=MAX_SUGGESTIONS):
+        """
+        The best ``limit`` crops for ``title``, best first, as Match tuples.
+        Ties go to longer names ("sweet potato" over "potato"), then to the
+        earlier phrase in the title.
+        """
+        best = {}
+        for position, phrase in phrases(title_words(title)):
+            for entry, score in self._scored(phrase).items():
+                if score < min_score:
+                    continue
+                crop_id, name, words, _ = self.entries[entry]
+                key = (round(score, 4), words, -position)
+                if crop_id not in best or key > best[crop_id][0]:
+                    best[crop_id] = (key, Match(crop_id, round(score, 4), name))
+        ranked = sorted(best.values(), key=lambda item: item[0], reverse=True)
+        return [match for _, match in ranked[:limit]]
+
+    def classify(self, title):
+        """
+        The crop id ``title`` is about, or None when nothing scores MIN_SCORE.
+        """
+        matches = self.match(title, MIN_SCORE, limit=1)
+        return matches[0].crop_id if matches else None
+
+    def resolve(self, text):
+        """
+        The crop id ``text`` names exactly (slug, name, local name or alias,
+        in any case or plural), or None.
+        """
+        crop_id = self.by_slug.get(str(text).strip().lower())
+        if crop_id is not None:
+            return crop_id
+        entry = self.exact.get(" ".join(title_words(text)))
+        return None if entry is None else self.entries[entry][0]
+
+
+_index = None
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def invalidate():
+    """
+    Make every process rebuild its index (called when the catalog changes).
+    """
+    global _index
+    _index = None
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def index():
+    """
+    This process's CropIndex, rebuilt when the catalog version moved.
+    """
+    global _index
+    current = version()
+    if _index is None or _index.version != current:
+        _index = CropIndex.from_catalog(current)
+    return _index
+
+
+def classify(title):
+    return index().classify(title)
+
+
+def slug(crop_id):
+    """
+    The slug of crop ``crop_id`` ("tomato"), or None; costs no query once the index is built.
+    """
+    return None if crop_id is None else index().slugs.get(crop_id)
+
+
+def resolve(text):
+    """
+    The slug of the crop ``text`` names exactly ("Tomatoes", "টমেটো" -> "tomato"), or None.
+    """
+    crop_index = index()
+    return crop_index.slugs.get(crop_index.resolve(text))
+
+
+def suggest(text, limit=MAX_SUGGESTIONS):
+    """
+    [(Crop, score, matched name)] for ``text``, best first.
+    """
+    matches = index().match(text, SUGGEST_MIN_SCORE, limit)
+    crops = Crop.objects.in_bulk([m.crop_id for m in matches])
+    return [(crops[m.crop_id], m.score, m.name) for m in matches if m.crop_id in crops]
+
+
+def classify_products(products):
+    """
+    Set ``crop`` on unsaved products from their titles (bulk_create paths,
+    which skip the pre_save signal). Confirmed crops are kept.
+    """
+    crop_index = index()
+    for product in products:
+        if not product.crop_confirmed:
+            product.crop_id = crop_index.classify(product.title)
+    return products
@@ -0,0 +1,244 @@
+# apps/marketplace/engagement.py
+"""
+Write-behind engagement counters: product page views, cart adds and
+wishlist adds, per product and day, for the farmer dashboard.
+
+record() only bumps a counter in this process's memory, so counting a hit
+costs no query. The counts reach the database in batches: flush() folds
+everything pending into ProductEngagement (one row per product and day)
+with a fixed number of statements per BATCH_SIZE product-days, however many
+hits they hold:
+
+* rows that exist get F() increments in one bulk UPDATE, so workers flushing
+  the same product add up instead of overwriting each other;
+* missing rows are inserted in one bulk INSERT; if another worker inserted
+  one of them first, the batch is rolled back and retried as an update.
+
+Each process runs one daemon flusher thread (started by the first record()),
+which flushes every settings.ENGAGEMENT_FLUSH_SECONDS, or as soon as
+MAX_PENDING product-days are waiting; an exiting worker flushes what it
+still holds. Requests never wait for a flush, and a crash loses at most one
+flush interval of one process's counts. A flush that fails puts its counts
+back, to go out with the next one.
+
+ENGAGEMENT_FLUSH_SECONDS = 0 (the default under `manage.py test`) starts no
+thread and no exit flush: counts stay in memory until flush() is called, so
+tests and the benchmark's rolled-back runs never write behind their back.
+
+The dashboard reads daily_series(), which sees counts once they are flushed.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, ProductEngagement
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("views", "cart_adds", "wishlist_adds")
+# pending product-days that force a flush before the interval is up
+MAX_PENDING = 5000
+# product-days per batch; keeps every statement well under SQL Server's 2100 parameters
+BATCH_SIZE = 500
+SERIES_DAYS = 14
+
+
+class Counters:
+    """
+    This process's unflushed counts, {(product id, day): [views, cart adds, wishlist adds]}.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        # held while writing, so a process never flushes twice at once
+        self.flushing = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, product_id, kind, n=1, day=None):
+        """
+        Count the hits; returns how many product-days are pending.
+        """
+        column = KINDS.index(kind)
+        key = (product_id, day or timezone.localdate())
+        with self._lock:
+            counts = self._pending.get(key)
+            if counts is None:
+                counts = self._pending[key] = [0] * len(KINDS)
+            counts[column] += n
+            return len(self._pending)
+
+    def merge(self, pending):
+        with self._lock:
+            for key, counts in pending.items():
+                mine = self._pending.setdefault(key, [0] * len(KINDS))
+                for column, n in enumerate(counts):
+                    mine[column] += n
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+counters = Counters()
+_flusher = None
+_flusher_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def record(product_id, kind, n=1):
+    """
+    Count ``n`` hits of ``kind`` (one of KINDS) on a product today.
+    """
+    if counters.add(product_id, kind, n) >= MAX_PENDING:
+        _wake.set()
+    if settings.ENGAGEMENT_FLUSH_SECONDS and (_flusher is None or not _flusher.is_alive()):
+        _start_flusher()
+
+
+def counts_views(view):
+    """
+    Decorator for views taking the product ``pk``: count a view for every
+    page served, including 304 revalidations answered by an outer
+    conditional-GET decorator (polling clients still looked at the product).
+    """
+    @wraps(view)
+    def wrapped(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        if response.status_code in (200, 304):
+            record(pk, "views")
+        return response
+    return wrapped
+
+
+def _start_flusher():
+    global _flusher
+    with _flusher_lock:
+        # threads do not survive a fork, so a preloaded worker starts its own
+        if _flusher is None or not _flusher.is_alive():
+            if _flusher is None:
+                atexit.register(_flush_on_exit)
+            _flusher = threading.Thread(target=_run_flusher, name="engagement-flusher", daemon=True)
+            _flusher.start()
+
+
+def _run_flusher():
+    while True:
+        _wake.wait(settings.ENGAGEMENT_FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except DatabaseError:
+            logger.warning("Engagement flush failed; %d product-days kept for the next one", len(counters), exc_info=True)
+        finally:
+            # this thread's connection; don't hold it open between flushes
+            connections.close_all()
+
+
+def _write_batch(batch):
+    product_ids = {product_id for product_id, _ in batch}
+    days = {day for _, day in batch}
+    rows = ProductEngagement.objects.filter(product_id__in=product_ids, day__in=days).only("pk", "product_id", "day")
+    updated = []
+    for row in rows:
+        counts = batch.get((row.product_id, row.day))
+        if counts is None:
+            continue
+        for kind, n in zip(KINDS, counts):
+            setattr(row, kind, F(kind) + n)
+        updated.append(row)
+    seen = {(row.product_id, row.day) for row in updated}
+    missing = [key for key in batch if key not in seen]
+    if missing:
+        # products deleted since they were counted take their counts with them
+        live = set(Product.objects.filter(pk__in={product_id for product_id, _ in missing}).values_list("pk", flat=True))
+        created = [
+            ProductEngagement(product_id=product_id, day=day, **dict(zip(KINDS, batch[product_id, day])))
+            for product_id, day in missing if product_id in live
+        ]
+        if created:
+            ProductEngagement.objects.bulk_create(created)
+    if updated:
+        ProductEngagement.objects.bulk_update(updated, KINDS)
+
+
+def write(pending):
+    """
+    Add ``pending`` counts ({(product id, day): [views, cart adds, wishlist adds]})
+    to ProductEngagement, one transaction per batch.
+    """
+    keys = list(pending)
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = {key: pending[key] for key in keys[start:start + BATCH_SIZE]}
+        try:
+            with transaction.atomic():
+                _write_batch(batch)
+        except IntegrityError:
+            # a concurrent flush inserted one of our rows: they all exist now
+            with transaction.atomic():
+                _write_batch(batch)
+
+
+def flush():
+    """
+    Write this process's pending counts now. Returns the product-days written.
+    """
+    with counters.flushing:
+        pending = counters.drain()
+        if not pending:
+            return 0
+        try:
+            write(pending)
+        except Exception:
+            counters.merge(pending)
+            raise
+        return len(pending)
+
+
+def _flush_on_exit():
+    if not len(counters):
+        return
+    try:
+        flush()
+    except Exception:
+        logger.warning("Engagement counts lost at exit: %d product-days", len(counters), exc_info=True)
+
+
+def daily_series(product_ids, days=SERIES_DAYS):
+    """
+    {product id: {"days": [{"day", "views", "cart_adds", "wishlist_adds"}, ...] oldest
+    first, one per day of the last ``days``, "totals": {kind: sum}, "peak": most views
+    in a day}}, in one query.
+    """
+    if not product_ids:
+        return {}
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    stored = defaultdict(dict)
+    rows = ProductEngagement.objects.filter(product_id__in=product_ids, day__gte=start).values_list(
+        "product_id", "day", *KINDS
+    )
+    for product_id, day, *counts in rows:
+        stored[product_id][day] = counts
+    calendar = [start + timedelta(days=offset) for offset in range(days)]
+    series = {}
+    for product_id in product_ids:
+        by_day = stored.get(product_id, {})
+        points = [{"day": day, **dict(zip(KINDS, by_day.get(day, (0, 0, 0))))} for day in calendar]
+        series[product_id] = {
+            "days": points,
+            "totals": {kind: sum(point[kind] for point in points) for kind in KINDS},
+            "peak": max(point["views"] for point in points),
+        }
+    return series
@@ -0,0 +1,111 @@
+# apps/marketplace/export.py
+"""
+Constant-memory catalog export.
+
+Rows are read with a chunked server-side iterator over ``values_list`` (no
+model instances, no reviews) and encoded one line at a time, so both the
+HTTP view and the management command can stream millions of products.
+"""
+import csv
+import json
+
+from .models import Product
+
+FORMATS = ("ndjson", "csv")
+
+CHUNK_SIZE = 2000
+
+BASE_FIELDS = ["id", "title", "price", "description", "created_at", "updated_at"]
+RATING_FIELDS = ["rating_avg", "rating_count"]
+OWNER_FIELDS = ["owner_id", "owner_username"]
+
+
+def export_fields(include_ratings=False, include_owner=False):
+    fields = list(BASE_FIELDS)
+    if include_ratings:
+        fields += RATING_FIELDS
+    if include_owner:
+        fields += OWNER_FIELDS
+    return fields
+
+
+def iter_products(include_ratings=False, include_owner=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield one plain dict per active product, in primary-key order.
+    """
+    columns = list(BASE_FIELDS)
+    if include_ratings:
+        columns += ["rating_sum", "rating_count"]
+    if include_owner:
+        columns += ["owner_id", "owner__username"]
+
+    qs = Product.objects.active().order_by("pk").values_list(*columns)
+    for values in qs.iterator(chunk_size=chunk_size):
+        row = dict(zip(columns, values))
+        item = {
+            "id": row["id"],
+            "title": row["title"],
+            "price": str(row["price"]),
+            "description": row["description"],
+            "created_at": row["created_at"].isoformat(),
+            "updated_at": row["updated_at"].isoformat(),
+        }
+        if include_ratings:
+            count = row["rating_count"]
+            item["rating_avg"] = round(row["rating_sum"] / count, 2) if count else 0
+            item["rating_count"] = count
+        if include_owner:
+            item["owner_id"] = row["owner_id"]
+            item["owner_username"] = row["owner__username"]
+        yield item
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+class _LineBuffer:
+    """
+    File-like object whose write() just hands the line back to csv.writer's caller.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[f] for f in fields])
+
+
+def buffered(lines, max_chars=64 * 1024):
+    """
+    Join small lines into ~64 KB pieces to cut per-chunk overhead; the first
+    line is passed through on its own so the client gets a byte right away.
+    """
+    buf, size = [], 0
+    for i, line in enumerate(lines):
+        if i == 0:
+            yield line
+            continue
+        buf.append(line)
+        size += len(line)
+        if size >= max_chars:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def export_lines(fmt, include_ratings=False, include_owner=False, chunk_size=CHUNK_SIZE):
+    """
+    Encoded export lines for ``fmt`` ("ndjson" or "csv").
+    """
+    rows = iter_products(include_ratings, include_owner, chunk_size)
+    if fmt == "ndjson":
+        return ndjson_lines(rows)
+    if fmt == "csv":
+        return csv_lines(rows, export_fields(include_ratings, include_owner))
+    raise ValueError(f"Unknown export format: {fmt!r}")
@@ -5,4 +5,16 @@ from .models import Product
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = ['title', 'price', 'description', 'image', 'active']
+        fields = ['title', 'price', 'description', 'image', 'active', 'crop']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["crop"].empty_label = "Detect from title"
+        if self.instance.pk and not self.instance.crop_confirmed:
+            # a detected crop is not the farmer's choice; keep the field on "detect"
+            self.initial["crop"] = None
+
+    def save(self, commit=True):
+        # an explicit pick is kept even if the title changes; "detect" re-runs matching
+        self.instance.crop_confirmed = self.cleaned_data.get("crop") is not None
+        return super().save(commit)
@@ -0,0 +1,146 @@
+# apps/marketplace/images.py
+"""
+Responsive image derivatives for Product.image and Profile.profile_picture.
+
+After an upload is committed, a small thread pool resizes the original into
+fixed widths, each saved as WebP plus a JPEG fallback next to it under
+``derivatives/``. When all variants exist the worker records the widths on
+the row (``image_widths`` / ``profile_picture_widths``) with a queryset
+update, and templates/serializers only emit srcset entries for recorded
+widths. Nothing here runs inside the request that uploaded the file.
+"""
+import atexit
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# target widths in px; originals narrower than a width are not upscaled
+WIDTHS = (320, 640, 1280)
+
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+
+QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-derivatives")
+            atexit.register(_executor.shutdown, wait=False)
+        return _executor
+
+
+def derivative_name(name, width, ext):
+    """
+    products/5/abc.png -> derivatives/products/5/abc_320.webp
+    """
+    stem = posixpath.splitext(name)[0]
+    return f"derivatives/{stem}_{width}.{ext}"
+
+
+def generate_derivatives(name, storage=default_storage):
+    """
+    Write every width/format variant of ``name``; return the widths produced.
+    """
+    from PIL import Image, ImageOps
+
+    with storage.open(name, "rb") as fh:
+        original = Image.open(fh)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in original.mode or "transparency" in original.info
+        original = original.convert("RGBA" if has_alpha else "RGB")
+
+    widths = []
+    for width in WIDTHS:
+        # never upscale: small originals get a single variant at their own width
+        target = min(width, original.width)
+        if target in widths:
+            break
+        height = max(1, round(original.height * target / original.width))
+        resized = original.resize((target, height), Image.LANCZOS)
+        for ext, (pil_format, _) in FORMATS.items():
+            image = resized
+            if pil_format == "JPEG" and image.mode != "RGB":
+                # flatten transparency onto white for the JPEG fallback
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            buf = BytesIO()
+            image.save(buf, pil_format, quality=QUALITY, optimize=pil_format == "JPEG")
+            path = derivative_name(name, target, ext)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buf.getvalue()))
+        widths.append(target)
+    return widths
+
+
+def build(model, pk, field_name, widths_field):
+    """
+    Generate the variants for one row and record their widths on it.
+    """
+    name = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+    if not name:
+        return []
+    widths = generate_derivatives(name)
+    # only mark the row if the image was not replaced in the meantime
+    if model.objects.filter(pk=pk, **{field_name: name}).update(**{widths_field: widths}):
+        # queryset updates send no signals; cached cards must pick up the new srcset
+        catalog_cache.bump()
+    return widths
+
+
+def _process(model, pk, field_name, widths_field):
+    # runs on a pool thread, which has its own database connection
+    close_old_connections()
+    try:
+        build(model, pk, field_name, widths_field)
+    except Exception:
+        logger.exception("Could not build image derivatives for %s #%s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance, field_name, widths_field):
+    """
+    Queue derivative generation for ``instance.<field_name>`` once the current
+    transaction commits.
+    """
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _get_executor().submit(_process, model, pk, field_name, widths_field))
+
+
+def variants(field_file, widths):
+    """
+    [{"width", "webp", "jpg"}] URLs for the recorded widths of ``field_file``.
+    """
+    if not field_file or not widths:
+        return []
+    storage = field_file.storage
+    return [
+        {"width": w, **{ext: storage.url(derivative_name(field_file.name, w, ext)) for ext in FORMATS}}
+        for w in widths
+    ]
+
+
+def srcset(field_file, widths, ext="webp"):
+    return ", ".join(f"{v[ext]} {v['width']}w" for v in variants(field_file, widths))
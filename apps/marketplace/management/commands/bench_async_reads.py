@@ -0,0 +1,105 @@
+# apps/marketplace/management/commands/bench_async_reads.py
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.marketplace.models import Product
+
+# (label, sync path, async path); {pk} is filled with a real product id
+ENDPOINTS = [
+    ("list", "/api/products/", "/api/async/products/"),
+    ("detail", "/api/products/{pk}/", "/api/async/products/{pk}/"),
+    ("home", "/api/home/", "/api/async/home/"),
+]
+
+
+async def _fetch(host, port, path, headers):
+    """
+    One GET over a fresh HTTP/1.1 connection; returns the status code.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n{headers}\r\n"
+        writer.write(request.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()  # drain the body until the server closes
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _load(base_url, path, concurrency, total, headers):
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip("/")
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def user():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await _fetch(host, port, prefix + path, headers)
+            except OSError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def _pct(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync (WSGI) and async (ASGI) product read endpoints at "
+        "increasing concurrency. Start both servers first, e.g. "
+        "`gunicorn config.wsgi -w 4 -b :8000` and "
+        "`uvicorn config.asgi:application --workers 4 --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--asgi-url", default="http://127.0.0.1:8001")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint/server/level.")
+        parser.add_argument("--endpoints", nargs="+", choices=[e[0] for e in ENDPOINTS],
+                            default=[e[0] for e in ENDPOINTS])
+        parser.add_argument("--sessionid", default="",
+                            help="Session cookie of a logged-in user (home requires authentication).")
+
+    def handle(self, *args, **options):
+        pk = Product.objects.active().order_by("-created_at").values_list("pk", flat=True).first()
+        if pk is None:
+            raise CommandError("No active products to read; seed some data first.")
+        headers = f"Cookie: sessionid={options['sessionid']}\r\n" if options["sessionid"] else ""
+
+        self.stdout.write(
+            f"{'endpoint':<8} {'server':<5} {'conc':>5} {'req/s':>9} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for label, sync_path, async_path in ENDPOINTS:
+            if label not in options["endpoints"]:
+                continue
+            for concurrency in options["concurrency"]:
+                for server, base_url, path in (
+                    ("wsgi", options["wsgi_url"], sync_path),
+                    ("asgi", options["asgi_url"], async_path),
+                ):
+                    elapsed, latencies, errors = asyncio.run(
+                        _load(base_url, path.format(pk=pk), concurrency, options["requests"], headers)
+                    )
+                    self.stdout.write(
+                        f"{label:<8} {server:<5} {concurrency:>5} {len(latencies) / elapsed:>9.1f} "
+                        f"{_pct(latencies, .50):>8.1f} {_pct(latencies, .95):>8.1f} "
+                        f"{_pct(latencies, .99):>8.1f} {errors:>7}"
+                    )
@@ -0,0 +1,61 @@
+# apps/marketplace/management/commands/bench_cart.py
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.marketplace.cart import Cart
+from apps.marketplace.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Cart.summary() for carts of increasing size, reporting query "
+        "count and time. Benchmark products are created inside a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes, repeat = options["sizes"], options["repeat"]
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+
+        try:
+            with transaction.atomic():
+                owner = User.objects.create_user("bench-cart-owner")
+                Product.objects.bulk_create(
+                    Product(owner=owner, title=f"Bench item {i}", price=f"{10 + i % 90}.25")
+                    for i in range(max(sizes))
+                )
+                products = list(Product.objects.filter(owner=owner).order_by("pk"))
+
+                self.stdout.write(f"{'lines':>6} {'queries':>8} {'ms':>8} {'total':>12}")
+                for size in sizes:
+                    session = store()
+                    cart = Cart(session)
+                    for i, product in enumerate(products[:size]):
+                        cart.add(product, 1 + i % 3)
+
+                    best = float("inf")
+                    for _ in range(repeat):
+                        with CaptureQueriesContext(connection) as ctx:
+                            started = time.perf_counter()
+                            summary = Cart(session).summary()
+                            best = min(best, time.perf_counter() - started)
+                    self.stdout.write(
+                        f"{size:>6} {len(ctx.captured_queries):>8} {best * 1000:>8.2f} {summary['total']:>12}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,122 @@
+# apps/marketplace/management/commands/bench_price_alerts.py
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.marketplace import alerts, crops
+from apps.marketplace.models import PriceAlert, Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _pct(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+
+def _scan(rows, product, slug, old_price, new_price):
+    """
+    The unindexed alternative: test every active alert against the move.
+    """
+    low, high = min(old_price, new_price), max(old_price, new_price)
+    direction = PriceAlert.BELOW if new_price < old_price else PriceAlert.ABOVE
+    hits = 0
+    for product_id, crop, alert_direction, threshold in rows:
+        if alert_direction != direction or (product_id != product.pk and crop != slug):
+            continue
+        if (low <= threshold < high) if direction == PriceAlert.BELOW else (low < threshold <= high):
+            hits += 1
+    return hits
+
+
+class Command(BaseCommand):
+    help = (
+        "Time price-alert matching on a synthetic alert table (default 1M rows) "
+        "against the existing products: indexed range matching per price change "
+        "versus a full scan. Everything is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alerts", type=int, default=1_000_000)
+        parser.add_argument("--changes", type=int, default=2000, help="Price changes to match.")
+        parser.add_argument("--scan-samples", type=int, default=5, help="Price changes to match by full scan.")
+        parser.add_argument("--crop-share", type=float, default=0.3, help="Fraction of alerts on a crop.")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.active().only("pk", "title", "price", "active", "crop_id")[:5000])
+        user_ids = list(User.objects.order_by("pk").values_list("pk", flat=True)[:500])
+        if not products or not user_ids:
+            raise CommandError("Need products and users; run `manage.py seed_marketplace` first.")
+        rng = random.Random(options["seed"])
+        slugs = sorted({crops.slug(p.crop_id) for p in products} - {None})
+        if not slugs:
+            raise CommandError("No classified products; run `manage.py classify_crops` first.")
+
+        try:
+            with transaction.atomic():
+                self._fill(products, slugs, user_ids, rng, options)
+                self._measure(products, rng, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _fill(self, products, slugs, user_ids, rng, options):
+        started = time.perf_counter()
+        total, batch = options["alerts"], []
+        for i in range(total):
+            product = rng.choice(products)
+            threshold = (product.price * Decimal(rng.uniform(0.5, 1.5))).quantize(Decimal("0.01"))
+            alert = PriceAlert(user_id=rng.choice(user_ids), threshold=max(threshold, Decimal("0.01")),
+                               direction=rng.choice((PriceAlert.BELOW, PriceAlert.ABOVE)))
+            if rng.random() < options["crop_share"]:
+                alert.crop = rng.choice(slugs)
+            else:
+                alert.product_id = product.pk
+            batch.append(alert)
+            if len(batch) >= options["batch_size"] or i == total - 1:
+                PriceAlert.objects.bulk_create(batch)
+                batch = []
+        self.stdout.write(f"Inserted {total} alerts in {time.perf_counter() - started:.1f}s "
+                          f"({len(products)} products, {len(slugs)} crops).")
+
+    def _moves(self, products, rng, count):
+        for _ in range(count):
+            product = rng.choice(products)
+            new_price = (product.price * Decimal(rng.uniform(0.9, 1.1))).quantize(Decimal("0.01"))
+            yield product, product.price, new_price
+
+    def _measure(self, products, rng, options):
+        sample = products[0]
+        plan = alerts.matching(sample, sample.price, sample.price - 1)
+        self.stdout.write(f"Query plan:\n{plan.explain()}\n")
+
+        latencies, matched = [], 0
+        for product, old_price, new_price in self._moves(products, rng, options["changes"]):
+            started = time.perf_counter()
+            matched += len(list(alerts.matching(product, old_price, new_price)))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        self.stdout.write(
+            f"indexed: {len(latencies)} changes, p50 {_pct(latencies, .50):.2f} ms, "
+            f"p95 {_pct(latencies, .95):.2f} ms, p99 {_pct(latencies, .99):.2f} ms, "
+            f"{matched / len(latencies):.1f} alerts matched per change"
+        )
+
+        if not options["scan_samples"]:
+            return
+        latencies = []
+        for product, old_price, new_price in self._moves(products, rng, options["scan_samples"]):
+            started = time.perf_counter()
+            rows = PriceAlert.objects.filter(active=True).values_list("product_id", "crop", "direction", "threshold")
+            _scan(rows.iterator(chunk_size=10_000), product, crops.slug(product.crop_id), old_price, new_price)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        self.stdout.write(f"full scan: {len(latencies)} changes, p50 {_pct(latencies, .50):.0f} ms, "
+                          f"max {latencies[-1] * 1000:.0f} ms")
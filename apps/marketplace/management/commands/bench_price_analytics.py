@@ -0,0 +1,75 @@
+# apps/marketplace/management/commands/bench_price_analytics.py
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.marketplace import analytics
+
+
+def _python_moving_average(rows, window):
+    # row-by-row reference implementation, what the vectorized path replaces
+    out = []
+    for row in rows:
+        series = []
+        for i in range(len(row)):
+            if i + 1 < window:
+                series.append(None)
+            else:
+                series.append(sum(row[i + 1 - window:i + 1]) / window)
+        out.append(series)
+    return out
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark analytics.compute() on synthetic price matrices, showing how it "
+        "scales with series count and series length (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--series", type=int, nargs="+", default=[1, 10, 100, 500])
+        parser.add_argument("--lengths", type=int, nargs="+", default=[30, 365, 1825])
+        parser.add_argument("--window", type=int, default=7)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--compare-python", action="store_true",
+                            help="Also time a pure-Python moving average for reference.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        window, repeat = options["window"], options["repeat"]
+
+        header = f"{'series':>7} {'length':>7} {'compute ms':>11} {'us/point':>9}"
+        if options["compare_python"]:
+            header += f" {'numpy MA ms':>12} {'python MA ms':>13} {'speedup':>8}"
+        self.stdout.write(header)
+
+        for n_series in options["series"]:
+            for length in options["lengths"]:
+                # random-walk prices with ~5% missing periods
+                steps = rng.normal(0, 0.02, size=(n_series, length))
+                matrix = 50.0 * np.exp(np.cumsum(steps, axis=1))
+                matrix[rng.random(matrix.shape) < 0.05] = np.nan
+
+                elapsed = _best_of(lambda: analytics.compute(matrix, window), repeat)
+                line = (f"{n_series:>7} {length:>7} {elapsed * 1000:>11.2f} "
+                        f"{elapsed * 1e6 / (n_series * length):>9.3f}")
+
+                if options["compare_python"]:
+                    filled = analytics.forward_fill(matrix)
+                    rows = filled.tolist()
+                    np_elapsed = _best_of(lambda: analytics.moving_average(filled, window), repeat)
+                    py_elapsed = _best_of(lambda: _python_moving_average(rows, window), 1)
+                    line += (f" {np_elapsed * 1000:>12.2f} {py_elapsed * 1000:>13.2f}"
+                             f" {py_elapsed / np_elapsed:>7.1f}x")
+                self.stdout.write(line)
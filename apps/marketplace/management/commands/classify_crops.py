@@ -0,0 +1,85 @@
+import time
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.marketplace import crops, price_board
+from apps.marketplace.models import Product
+
+# ids per UPDATE ... WHERE id IN (...), below SQL Server's 2100 parameter limit
+UPDATE_CHUNK = 1000
+# distinct titles remembered between batches (listings repeat titles a lot)
+MEMO_SIZE = 100_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign catalog crops to existing products from their titles. By default only "
+        "products without a crop; --all re-matches every product whose crop the farmer "
+        "did not pick (e.g. after adding aliases). Works in keyset batches, one "
+        "transaction each, then rebuilds the price board."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-match products that already have a detected crop.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+        parser.add_argument("--show-unmatched", type=int, default=10, metavar="N",
+                            help="List the N most common titles no crop matched.")
+
+    def handle(self, *args, **options):
+        index = crops.index()
+        products = Product.objects.filter(crop_confirmed=False)
+        if not options["all"]:
+            products = products.filter(crop__isnull=True)
+
+        memo, unmatched = {}, Counter()
+        seen = changed = 0
+        last_pk = 0
+        started = time.perf_counter()
+        while True:
+            batch = list(
+                products.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "title", "crop_id")[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            moves = defaultdict(list)
+            for pk, title, current in batch:
+                if title not in memo:
+                    if len(memo) >= MEMO_SIZE:
+                        memo.clear()
+                    memo[title] = index.classify(title)
+                crop_id = memo[title]
+                if crop_id is None:
+                    unmatched[title] += 1
+                if crop_id != current:
+                    moves[crop_id].append(pk)
+            seen += len(batch)
+            changed += sum(len(ids) for ids in moves.values())
+            if moves and not options["dry_run"]:
+                self._write(moves)
+        elapsed = time.perf_counter() - started
+
+        rate = seen / elapsed if elapsed else 0
+        verb = "Would change" if options["dry_run"] else "Changed"
+        self.stdout.write(
+            f"Matched {seen - sum(unmatched.values())} of {seen} products in {elapsed:.1f}s "
+            f"({rate:,.0f} products/s, {len(memo)} distinct titles); {verb.lower()} {changed}."
+        )
+        for title, count in unmatched.most_common(options["show_unmatched"]):
+            self.stdout.write(f"  unmatched x{count}: {title}")
+        if changed and not options["dry_run"]:
+            # the UPDATEs above bypass the signals that keep the board current
+            rows = price_board.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"{verb} {changed} products; price board has {rows} crops."))
+
+    def _write(self, moves):
+        now = timezone.now()
+        with transaction.atomic():
+            for crop_id, ids in moves.items():
+                for start in range(0, len(ids), UPDATE_CHUNK):
+                    # updated_at moves so API ETags and caches keyed on it see the new crop
+                    Product.objects.filter(pk__in=ids[start:start + UPDATE_CHUNK]).update(crop_id=crop_id, updated_at=now)
@@ -0,0 +1,37 @@
+# apps/marketplace/management/commands/export_catalog.py
+from django.core.management.base import BaseCommand
+
+from apps.marketplace import export
+
+
+class Command(BaseCommand):
+    help = "Stream active products to a file or stdout as NDJSON or CSV, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=export.FORMATS, default="ndjson")
+        parser.add_argument("--output", "-o", help="File path (default: stdout).")
+        parser.add_argument("--ratings", action="store_true", help="Include rating_avg / rating_count.")
+        parser.add_argument("--owner", action="store_true", help="Include owner id and username.")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export.export_lines(
+            options["format"], options["ratings"], options["owner"], chunk_size=options["chunk_size"]
+        )
+        if options["output"]:
+            # newline="" so csv's \r\n row endings are written untouched
+            with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                count = self._write(fh, lines)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {count} lines to {options['output']}."))
+        else:
+            # lines carry their own endings; self.stdout honours call_command(stdout=...)
+            self.stdout.ending = ""
+            self._write(self.stdout, lines)
+
+    @staticmethod
+    def _write(fh, lines):
+        count = 0
+        for line in lines:
+            fh.write(line)
+            count += 1
+        return count
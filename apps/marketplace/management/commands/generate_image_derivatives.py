@@ -0,0 +1,32 @@
+# apps/marketplace/management/commands/generate_image_derivatives.py
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import Profile
+from apps.marketplace import images
+from apps.marketplace.models import Product
+
+
+class Command(BaseCommand):
+    help = "Build thumbnail/WebP variants for product images and profile pictures that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild variants that already exist too.")
+
+    def handle(self, *args, **options):
+        targets = [
+            (Product, "image", "image_widths"),
+            (Profile, "profile_picture", "profile_picture_widths"),
+        ]
+        for model, field_name, widths_field in targets:
+            qs = model.objects.exclude(**{f"{field_name}__isnull": True}).exclude(**{field_name: ""})
+            if not options["all"]:
+                qs = qs.filter(**{widths_field: []})
+            done = failed = 0
+            for pk in qs.values_list("pk", flat=True).iterator():
+                try:
+                    images.build(model, pk, field_name, widths_field)
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} #{pk}: {exc}")
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {done} processed, {failed} failed."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.marketplace import price_board
+from apps.marketplace.models import Crop
+
+
+class Command(BaseCommand):
+    help = "Recount the market price board (CropPrice / CropPriceLevel) from the active products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--crop", action="append", dest="crops",
+                            help="Only rebuild this crop slug, e.g. tomato (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        crop_ids = None
+        if options["crops"]:
+            found = dict(Crop.objects.filter(slug__in=options["crops"]).values_list("slug", "pk"))
+            unknown = set(options["crops"]) - set(found)
+            if unknown:
+                raise CommandError(f"Unknown crop(s): {', '.join(sorted(unknown))}")
+            crop_ids = list(found.values())
+        written = price_board.rebuild(crop_ids, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} price board rows."))
@@ -0,0 +1,33 @@
+# apps/marketplace/management/commands/rebuild_price_rollups.py
+from django.core.management.base import BaseCommand
+
+from apps.marketplace import prices
+from apps.marketplace.models import PriceObservation, Product
+
+
+class Command(BaseCommand):
+    help = "Recompute daily/weekly/monthly PriceRollup rows from PriceObservation history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--product", type=int, action="append", dest="products",
+                            help="Only rebuild this product id (repeatable).")
+        parser.add_argument("--seed-missing", action="store_true",
+                            help="First record the current price of products that have no history yet.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["seed_missing"]:
+            missing = Product.objects.exclude(
+                pk__in=PriceObservation.objects.values("product_id")
+            ).only("pk", "price", "updated_at")
+            if options["products"]:
+                missing = missing.filter(pk__in=options["products"])
+            seeded = PriceObservation.objects.bulk_create(
+                (PriceObservation(product_id=p.pk, price=p.price, observed_at=p.updated_at)
+                 for p in missing.iterator(chunk_size=options["batch_size"])),
+                batch_size=options["batch_size"],
+            )
+            self.stdout.write(f"Seeded {len(seeded)} products without price history.")
+
+        written = prices.rebuild_rollups(options["products"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} price rollups."))
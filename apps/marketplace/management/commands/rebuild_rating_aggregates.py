@@ -0,0 +1,36 @@
+# apps/marketplace/management/commands/rebuild_rating_aggregates.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.marketplace import catalog_cache
+from apps.marketplace.models import RATING_STARS, Product, Review
+
+
+def _subquery(queryset):
+    return Coalesce(Subquery(queryset, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild Product.rating_sum / rating_count and the rating_1..rating_5 "
+        "star histogram from the Review table in one bulk UPDATE."
+    )
+
+    def handle(self, *args, **options):
+        per_product = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+        columns = {
+            "rating_sum": _subquery(per_product.annotate(s=Sum("rating")).values("s")),
+            "rating_count": _subquery(per_product.annotate(c=Count("id")).values("c")),
+        }
+        for stars in RATING_STARS:
+            columns[f"rating_{stars}"] = _subquery(
+                per_product.filter(rating=stars).annotate(c=Count("id")).values("c")
+            )
+
+        with transaction.atomic():
+            updated = Product.objects.update(**columns)
+            catalog_cache.bump()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} products."))
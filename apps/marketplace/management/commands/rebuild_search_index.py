@@ -0,0 +1,15 @@
+# apps/marketplace/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from apps.marketplace import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index (SearchDocument / SearchPosting) from active products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products."))
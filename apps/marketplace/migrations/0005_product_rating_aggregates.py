@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('marketplace', 'Product')
+    Review = apps.get_model('marketplace', 'Review')
+    rows = Review.objects.order_by().values('product').annotate(s=Sum('rating'), c=Count('id'))
+    for row in rows.iterator():
+        Product.objects.filter(pk=row['product']).update(rating_sum=row['s'], rating_count=row['c'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0004_wishlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.marketplace.search import _document_terms
+
+BATCH_SIZE = 1000
+
+
+def backfill_search_index(apps, schema_editor):
+    Product = apps.get_model('marketplace', 'Product')
+    SearchDocument = apps.get_model('marketplace', 'SearchDocument')
+    SearchPosting = apps.get_model('marketplace', 'SearchPosting')
+    products = Product.objects.filter(active=True).order_by().only('pk', 'title', 'description')
+    documents, postings = [], []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        counts = _document_terms(product)
+        documents.append(SearchDocument(product_id=product.pk, length=sum(counts.values())))
+        postings.extend(SearchPosting(document_id=product.pk, term=term, tf=tf) for term, tf in counts.items())
+        if len(documents) >= BATCH_SIZE:
+            SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE)
+            SearchPosting.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+            documents, postings = [], []
+    SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE)
+    SearchPosting.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='marketplace.product')),
+                ('length', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('tf', models.PositiveIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='marketplace.searchdocument')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'document'), name='unique_term_document')],
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
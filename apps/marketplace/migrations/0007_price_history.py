@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0006_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('observed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_observations', to='marketplace.product')),
+            ],
+            options={
+                'ordering': ['observed_at'],
+                'indexes': [models.Index(fields=['product', 'observed_at'], name='marketplace_product_f4a920_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('day', 'Daily'), ('week', 'Weekly'), ('month', 'Monthly')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('observations', models.PositiveIntegerField(default=0)),
+                ('opened_at', models.DateTimeField()),
+                ('closed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='marketplace.product')),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'resolution', 'period_start'), name='unique_price_rollup_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0007_price_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_widths',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # existing reviews were last touched when created, as far as we know
+    Review = apps.get_model("marketplace", "Review")
+    Review.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_image_derivative_widths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_review_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner', '-created_at'], name='marketplace_owner_i_28123d_idx'),
+        ),
+    ]
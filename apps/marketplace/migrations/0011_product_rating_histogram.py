@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_histogram(apps, schema_editor):
+    Product = apps.get_model('marketplace', 'Product')
+    Review = apps.get_model('marketplace', 'Review')
+    histograms = {}
+    for row in Review.objects.order_by().values('product', 'rating').annotate(c=Count('id')).iterator():
+        histograms.setdefault(row['product'], {})[f"rating_{row['rating']}"] = row['c']
+    for product_id, columns in histograms.items():
+        Product.objects.filter(pk=product_id).update(**columns)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_product_owner_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_histogram, migrations.RunPython.noop),
+    ]
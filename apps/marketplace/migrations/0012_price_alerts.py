@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0011_product_rating_histogram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop', models.CharField(blank=True, max_length=64)),
+                ('direction', models.CharField(choices=[('below', 'Drops to or below'), ('above', 'Rises to or above')], default='below', max_length=5)),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('triggered_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to='marketplace.product')),
+                ('triggered_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['product', 'direction', 'threshold'], name='price_alert_product_idx'), models.Index(condition=models.Q(('active', True)), fields=['crop', 'direction', 'threshold'], name='price_alert_crop_idx'), models.Index(fields=['user', '-created_at'], name='price_alert_user_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('product__isnull', False), ('crop', '')), models.Q(('product__isnull', True), models.Q(('crop', ''), _negated=True)), _connector='OR'), name='price_alert_product_xor_crop')],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+from apps.marketplace.search import tokenize
+
+UNIT_TERMS = frozenset("kg g gm gram kilo litre liter l ml dozen bundle sack bag piece pc pcs pack box".split())
+
+
+def backfill_price_board(apps, schema_editor):
+    Product = apps.get_model("marketplace", "Product")
+    CropPrice = apps.get_model("marketplace", "CropPrice")
+    CropPriceLevel = apps.get_model("marketplace", "CropPriceLevel")
+    levels = Counter()
+    for title, price in Product.objects.filter(active=True).values_list("title", "price").iterator(chunk_size=2000):
+        for crop in {t for t in tokenize(title) if t not in UNIT_TERMS and not t.isdigit()}:
+            levels[crop, price] += 1
+    by_crop = defaultdict(list)
+    for (crop, price), listings in sorted(levels.items()):
+        by_crop[crop].append((price, listings))
+    rows = []
+    for crop, crop_levels in by_crop.items():
+        prices = [price for price, listings in crop_levels for _ in range(listings)]
+        total = sum(prices)
+        median = (prices[(len(prices) - 1) // 2] + prices[len(prices) // 2]) / 2
+        rows.append(CropPrice(
+            crop=crop, listings=len(prices), price_sum=total, min_price=prices[0], max_price=prices[-1],
+            median_price=median.quantize(Decimal("0.01")), mean_price=(total / len(prices)).quantize(Decimal("0.01")),
+        ))
+    CropPriceLevel.objects.bulk_create(
+        (CropPriceLevel(crop=crop, price=price, listings=n) for (crop, price), n in levels.items()), batch_size=2000
+    )
+    CropPrice.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0012_price_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CropPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop', models.CharField(max_length=64, unique=True)),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mean_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['crop'],
+                'indexes': [models.Index(fields=['-listings', 'crop'], name='crop_price_listings_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CropPriceLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop', models.CharField(max_length=64)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('listings', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('crop', 'price'), name='unique_crop_price_level')],
+            },
+        ),
+        migrations.RunPython(backfill_price_board, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# starter catalog: (slug, name, Bengali name, aliases)
+CROPS = [
+    ("rice", "Rice", "চাল", ["paddy", "ধান", "chal", "dhan", "basmati", "chinigura"]),
+    ("wheat", "Wheat", "গম", ["gom"]),
+    ("maize", "Maize", "ভুট্টা", ["corn", "bhutta", "sweet corn"]),
+    ("lentil", "Lentil", "মসুর ডাল", ["masoor", "mosur", "dal", "daal", "ডাল", "মসুর"]),
+    ("mung-bean", "Mung bean", "মুগ ডাল", ["mung", "moong", "মুগ"]),
+    ("chickpea", "Chickpea", "ছোলা", ["chola", "chana"]),
+    ("potato", "Potato", "আলু", ["alu", "aloo"]),
+    ("sweet-potato", "Sweet potato", "মিষ্টি আলু", ["misti alu", "mishti alu"]),
+    ("onion", "Onion", "পেঁয়াজ", ["piyaj", "peyaj", "pyaj", "পিঁয়াজ"]),
+    ("garlic", "Garlic", "রসুন", ["roshun", "rosun"]),
+    ("ginger", "Ginger", "আদা", ["ada"]),
+    ("turmeric", "Turmeric", "হলুদ", ["holud", "haldi"]),
+    ("chili", "Chili", "মরিচ", ["chilli", "chile", "morich", "kacha morich", "কাঁচা মরিচ"]),
+    ("tomato", "Tomato", "টমেটো", ["tometo"]),
+    ("brinjal", "Brinjal", "বেগুন", ["eggplant", "aubergine", "begun"]),
+    ("okra", "Okra", "ঢেঁড়স", ["ladies finger", "lady finger", "bhindi", "dherosh"]),
+    ("cabbage", "Cabbage", "বাঁধাকপি", ["badhakopi"]),
+    ("cauliflower", "Cauliflower", "ফুলকপি", ["fulkopi", "phulkopi"]),
+    ("spinach", "Spinach", "পালং শাক", ["palong", "palak", "পালং"]),
+    ("red-amaranth", "Red amaranth", "লাল শাক", ["lal shak"]),
+    ("pumpkin", "Pumpkin", "মিষ্টি কুমড়া", ["kumra", "mishti kumra", "কুমড়া"]),
+    ("bottle-gourd", "Bottle gourd", "লাউ", ["lau", "lauki"]),
+    ("bitter-gourd", "Bitter gourd", "করলা", ["korola", "karela", "bitter melon"]),
+    ("cucumber", "Cucumber", "শসা", ["shosha", "sosha"]),
+    ("carrot", "Carrot", "গাজর", ["gajor"]),
+    ("radish", "Radish", "মুলা", ["mula", "mooli"]),
+    ("bean", "Bean", "শিম", ["shim", "flat bean"]),
+    ("pea", "Green pea", "মটরশুটি", ["peas", "motorshuti"]),
+    ("coriander", "Coriander", "ধনে পাতা", ["dhonia", "dhone pata", "cilantro", "ধনিয়া"]),
+    ("mustard", "Mustard", "সরিষা", ["shorisha", "sarisha"]),
+    ("jute", "Jute", "পাট", ["pat"]),
+    ("tea", "Tea", "চা", ["cha", "chai"]),
+    ("sugarcane", "Sugarcane", "আখ", ["akh", "ikkhu"]),
+    ("mango", "Mango", "আম", ["aam", "himsagar", "langra", "fazli"]),
+    ("jackfruit", "Jackfruit", "কাঁঠাল", ["kathal", "kanthal"]),
+    ("banana", "Banana", "কলা", ["kola", "kela"]),
+    ("papaya", "Papaya", "পেঁপে", ["pepe"]),
+    ("pineapple", "Pineapple", "আনারস", ["anaras", "anarosh"]),
+    ("guava", "Guava", "পেয়ারা", ["peyara"]),
+    ("lychee", "Lychee", "লিচু", ["litchi", "lichu", "lichi"]),
+    ("coconut", "Coconut", "নারকেল", ["narikel", "narkel", "ডাব", "daab", "নারিকেল"]),
+    ("lemon", "Lemon", "লেবু", ["lebu", "lime"]),
+    ("watermelon", "Watermelon", "তরমুজ", ["tormuj", "tarmuj"]),
+    ("orange", "Orange", "কমলা", ["komola", "malta"]),
+    ("date", "Date", "খেজুর", ["khejur", "dates"]),
+    ("betel-leaf", "Betel leaf", "পান", ["paan", "betel"]),
+    ("honey", "Honey", "মধু", ["modhu", "madhu"]),
+]
+
+
+def add_starter_catalog(apps, schema_editor):
+    Crop = apps.get_model("marketplace", "Crop")
+    Crop.objects.bulk_create(
+        [Crop(slug=slug, name=name, local_name=local_name, aliases=aliases) for slug, name, local_name, aliases in CROPS]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0013_price_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Crop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('slug', models.SlugField(max_length=64, unique=True)),
+                ('local_name', models.CharField(blank=True, max_length=64)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='crop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='marketplace.crop'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='crop_confirmed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        # the board moves from title words to catalog crops; it fills again as
+        # `manage.py classify_crops` assigns crops to the existing listings
+        migrations.DeleteModel(
+            name='CropPrice',
+        ),
+        migrations.DeleteModel(
+            name='CropPriceLevel',
+        ),
+        migrations.CreateModel(
+            name='CropPriceLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_levels', to='marketplace.crop')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('crop', 'price'), name='unique_crop_price_level')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CropPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mean_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('crop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='board', to='marketplace.crop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-listings', 'crop'], name='crop_price_listings_idx')],
+            },
+        ),
+        migrations.RunPython(add_starter_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0014_crop_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEngagement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('cart_adds', models.PositiveIntegerField(default=0)),
+                ('wishlist_adds', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engagement_days', to='marketplace.product')),
+            ],
+            options={
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_engagement_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_documents(apps, schema_editor):
+    SearchDocument = apps.get_model("marketplace", "SearchDocument")
+    SearchStats = apps.get_model("marketplace", "SearchStats")
+    stats = SearchDocument.objects.aggregate(documents=Count("pk"), total_length=Sum("length"))
+    SearchStats.objects.create(pk=1, documents=stats["documents"], total_length=stats["total_length"] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0015_product_engagement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count
+
+from apps.marketplace.crops import CropIndex
+from apps.marketplace.price_board import CENT, _stats
+
+BATCH_SIZE = 2000
+# ids per UPDATE ... WHERE id IN (...), below SQL Server's 2100 parameter limit
+UPDATE_CHUNK = 1000
+
+
+def _crop_index(Crop):
+    catalog = list(Crop.objects.all())
+    names = ((crop.pk, name) for crop in catalog for name in [crop.name, crop.local_name, *crop.aliases] if name)
+    return CropIndex(names, slugs={crop.pk: crop.slug for crop in catalog})
+
+
+def classify_listings(apps, schema_editor):
+    """
+    0014 emptied the board; assign crops to the listings that predate the
+    catalog and count them onto it, as classify_crops would.
+    """
+    Crop = apps.get_model("marketplace", "Crop")
+    Product = apps.get_model("marketplace", "Product")
+    CropPrice = apps.get_model("marketplace", "CropPrice")
+    CropPriceLevel = apps.get_model("marketplace", "CropPriceLevel")
+    index = _crop_index(Crop)
+
+    pending = Product.objects.filter(crop__isnull=True, crop_confirmed=False)
+    memo, last_pk = {}, 0
+    while True:
+        batch = list(pending.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "title")[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        moves = defaultdict(list)
+        for pk, title in batch:
+            if title not in memo:
+                memo[title] = index.classify(title)
+            if memo[title] is not None:
+                moves[memo[title]].append(pk)
+        for crop_id, ids in moves.items():
+            for start in range(0, len(ids), UPDATE_CHUNK):
+                Product.objects.filter(pk__in=ids[start:start + UPDATE_CHUNK]).update(crop_id=crop_id)
+
+    levels = defaultdict(list)
+    grouped = (
+        Product.objects.filter(active=True, crop__isnull=False)
+        .order_by("crop_id", "price").values_list("crop_id", "price").annotate(n=Count("id"))
+    )
+    for crop_id, price, n in grouped.iterator(chunk_size=BATCH_SIZE):
+        levels[crop_id].append((price, n))
+    rows = []
+    for crop_id, crop_levels in levels.items():
+        count = sum(n for _, n in crop_levels)
+        total = sum(price * n for price, n in crop_levels)
+        low, median, high = _stats(crop_levels, count)
+        rows.append(CropPrice(
+            crop_id=crop_id, listings=count, price_sum=total, min_price=low, median_price=median,
+            max_price=high, mean_price=(total / count).quantize(CENT),
+        ))
+    CropPriceLevel.objects.all().delete()
+    CropPrice.objects.all().delete()
+    CropPriceLevel.objects.bulk_create(
+        (CropPriceLevel(crop_id=crop_id, price=price, listings=n)
+         for crop_id, crop_levels in levels.items() for price, n in crop_levels),
+        batch_size=BATCH_SIZE,
+    )
+    CropPrice.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def key_alerts_on_crop_slugs(apps, schema_editor):
+    """
+    Crop alerts stored a search term ("tomato"); they now store the slug of
+    the catalog crop the term names. Terms naming no crop could never fire
+    again and are switched off.
+    """
+    Crop = apps.get_model("marketplace", "Crop")
+    PriceAlert = apps.get_model("marketplace", "PriceAlert")
+    index = _crop_index(Crop)
+    terms = PriceAlert.objects.exclude(crop="").order_by().values_list("crop", flat=True).distinct()
+    for term in list(terms):
+        slug = index.slugs.get(index.resolve(term))
+        alerts = PriceAlert.objects.filter(crop=term)
+        if slug is None:
+            alerts.update(active=False)
+        elif slug != term:
+            alerts.update(crop=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0016_search_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(classify_listings, migrations.RunPython.noop),
+        migrations.RunPython(key_alerts_on_crop_slugs, migrations.RunPython.noop),
+    ]
@@ -4,8 +4,9 @@ from uuid import uuid4
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models import Avg, Q
+from django.db.models import Q
 from django.urls import reverse
+from django.utils import timezone
 
 
 def product_image_upload_to(instance, filename: str) -> str:
@@ -18,6 +19,42 @@ def product_image_upload_to(instance, filename: str) -> str:
     return f"products/{owner}/{uuid4().hex}.{ext}" 
 
 
+RATING_STARS = (1, 2, 3, 4, 5)
+
+
+class Crop(models.Model):
+    """
+    Canonical crop catalog entry. Listing titles are matched against the
+    name, the local (Bengali) name and the aliases by apps.marketplace.crops.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    slug = models.SlugField(max_length=64, unique=True)
+    local_name = models.CharField(max_length=64, blank=True)
+    # other spellings and names titles use, e.g. ["eggplant", "aubergine", "begun"]
+    aliases = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.local_name})" if self.local_name else self.name
+
+    def names(self):
+        return [self.name, self.local_name, *self.aliases]
+
+
+class ProductQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(active=True)
+
+    def for_listing(self):
+        """
+        Everything a serialized product page needs, fetched up front:
+        owner via JOIN, reviews via one extra IN query, rating aggregates are columns.
+        """
+        return self.select_related("owner").prefetch_related("reviews").order_by("-created_at", "-id")
+
+
 class Product(models.Model):
     # nullable owner so existing rows won’t demand a default during migrations
     owner = models.ForeignKey(
@@ -31,15 +68,33 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to=product_image_upload_to, blank=True, null=True)
+    # widths of the resized variants of `image` that exist (filled in by images.py workers)
+    image_widths = models.JSONField(default=list, blank=True, editable=False)
     active = models.BooleanField(default=True)
+    # canonical crop, detected from the title (apps.marketplace.crops) unless the farmer picked it
+    crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, null=True, blank=True, related_name="products")
+    crop_confirmed = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)  # useful for sorting/invalidating caches
+    # denormalized review aggregates, maintained by the Review signals in signals.py
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    # star histogram: number of reviews giving 1..5 stars, maintained alongside the sum/count
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["-created_at"]),
             models.Index(fields=["active", "-created_at"]),
+            # farmer dashboard: one owner's products, newest first
+            models.Index(fields=["owner", "-created_at"]),
             models.Index(fields=["title"]),
         ]
 
@@ -48,17 +103,45 @@ class Product(models.Model):
 
     def get_absolute_url(self):
         return reverse("marketplace:product_detail", args=[self.pk])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the stored price/image/active/title/description/crop so signals can tell when they actually change
+        instance._stored_price = instance.__dict__.get("price")
+        instance._stored_title = instance.__dict__.get("title")
+        instance._stored_description = instance.__dict__.get("description")
+        instance._stored_image = instance.__dict__.get("image")
+        instance._stored_active = instance.__dict__.get("active")
+        if "crop_id" in instance.__dict__:
+            # None is a real value here (unclassified), so only set when the field was loaded
+            instance._stored_crop_id = instance.crop_id
+        return instance
+
     @property
     def farmer_name(self):
         return self.owner.username if self.owner else "Unknown" #Get the farmer's username (or "unknown" if no owner)
 
     @property
     def rating_avg(self):
-        return self.reviews.aggregate(avg=Avg("rating"))["avg"] or 0
+        # derived from the stored aggregates, so no extra query per product
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
 
     @property
-    def rating_count(self):
-        return self.reviews.count()
+    def rating_histogram(self):
+        """
+        [{"stars": 5, "count": n, "percent": p}, ... down to 1 star], from the stored columns.
+        """
+        return [
+            {
+                "stars": stars,
+                "count": getattr(self, f"rating_{stars}"),
+                "percent": round(100 * getattr(self, f"rating_{stars}") / self.rating_count) if self.rating_count else 0,
+            }
+            for stars in RATING_STARS[::-1]
+        ]
 
 
 class Review(models.Model):
@@ -71,6 +154,7 @@ class Review(models.Model):
     )
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # edits in place move the product page's ETag
 
     class Meta:
         ordering = ["-created_at"]
@@ -83,6 +167,14 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Review p#{self.product_id} by u#{self.user_id} — {self.rating}★"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember what is stored so edits can adjust the product aggregates by delta
+        instance._stored_rating = instance.__dict__.get("rating")
+        instance._stored_product_id = instance.__dict__.get("product_id")
+        return instance
     
 class Wishlist(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -96,3 +188,211 @@ class Wishlist(models.Model):
         return f"{self.user.username} - {self.product.title}"
 
 
+
+
+class PriceObservation(models.Model):
+    """
+    Append-only log of listing prices: one row per price change.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="price_observations")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    observed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["observed_at"]
+        indexes = [
+            models.Index(fields=["product", "observed_at"]),
+        ]
+
+    def __str__(self):
+        return f"p#{self.product_id} ৳{self.price} @ {self.observed_at:%Y-%m-%d %H:%M}"
+
+
+class PriceRollup(models.Model):
+    """
+    Open/high/low/close per product and period, updated incrementally as
+    observations arrive (see prices.record_price).
+    """
+    DAY, WEEK, MONTH = "day", "week", "month"
+    RESOLUTIONS = [(DAY, "Daily"), (WEEK, "Weekly"), (MONTH, "Monthly")]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="price_rollups")
+    resolution = models.CharField(max_length=5, choices=RESOLUTIONS)
+    period_start = models.DateField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    observations = models.PositiveIntegerField(default=0)
+    # timestamps of the observations currently held in open/close
+    opened_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["period_start"]
+        constraints = [
+            # also the index behind "one crop, one resolution, a date range" reads
+            models.UniqueConstraint(
+                fields=["product", "resolution", "period_start"], name="unique_price_rollup_period"
+            ),
+        ]
+
+    def __str__(self):
+        return f"p#{self.product_id} {self.resolution} {self.period_start}: {self.open}/{self.high}/{self.low}/{self.close}"
+
+
+class SearchDocument(models.Model):
+    """
+    One row per indexed (active) product; holds the weighted token count
+    used for BM25 length normalisation. Maintained by apps.marketplace.search.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"SearchDocument p#{self.product_id} ({self.length} tokens)"
+
+
+class SearchStats(models.Model):
+    """
+    Single row (pk 1) with the corpus statistics BM25 needs: how many
+    documents are indexed and their total length. Kept current by delta
+    updates in apps.marketplace.search, so a query reads one row instead of
+    aggregating SearchDocument.
+    """
+    documents = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.documents} documents, {self.total_length} tokens"
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index entry: normalized term -> document, with weighted term frequency.
+    """
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name="postings")
+    term = models.CharField(max_length=64)
+    tf = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["term", "document"], name="unique_term_document"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> p#{self.document_id} (tf={self.tf})"
+
+
+class PriceAlert(models.Model):
+    """
+    A buyer's request to hear when a product's price, or the price of any
+    listing of a crop, crosses a threshold. One-shot: a triggered alert is
+    deactivated and records what triggered it (see apps.marketplace.alerts).
+    """
+    BELOW, ABOVE = "below", "above"
+    DIRECTIONS = [(BELOW, "Drops to or below"), (ABOVE, "Rises to or above")]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="price_alerts")
+    # exactly one of product / crop; crop is a Crop slug (e.g. "tomato"), matched against Product.crop
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name="price_alerts")
+    crop = models.CharField(max_length=64, blank=True)
+    direction = models.CharField(max_length=5, choices=DIRECTIONS, default=BELOW)
+    threshold = models.DecimalField(max_digits=10, decimal_places=2)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    triggered_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    triggered_product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.CheckConstraint(
+                check=(Q(product__isnull=False) & Q(crop="")) | (Q(product__isnull=True) & ~Q(crop="")),
+                name="price_alert_product_xor_crop",
+            ),
+        ]
+        indexes = [
+            # sorted by threshold within (target, direction): a price move is one range scan
+            models.Index(fields=["product", "direction", "threshold"], condition=Q(active=True),
+                         name="price_alert_product_idx"),
+            models.Index(fields=["crop", "direction", "threshold"], condition=Q(active=True),
+                         name="price_alert_crop_idx"),
+            models.Index(fields=["user", "-created_at"], name="price_alert_user_idx"),
+        ]
+
+    def __str__(self):
+        target = f"p#{self.product_id}" if self.product_id else self.crop
+        return f"{target} {self.direction} ৳{self.threshold} for u#{self.user_id}"
+
+
+class CropPriceLevel(models.Model):
+    """
+    How many active listings of a crop are priced at exactly ``price``: the
+    crop's price distribution as a counted, price-sorted multiset. Kept in
+    step with listings by apps.marketplace.price_board.
+    """
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name="price_levels")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    listings = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # also the index that reads one crop's prices in order
+            models.UniqueConstraint(fields=["crop", "price"], name="unique_crop_price_level"),
+        ]
+
+    def __str__(self):
+        return f"crop#{self.crop_id} ৳{self.price} x{self.listings}"
+
+
+class CropPrice(models.Model):
+    """
+    One row of the market price board: the going rate of a crop across all
+    farmers' active listings. Maintained incrementally by
+    apps.marketplace.price_board.
+    """
+    crop = models.OneToOneField(Crop, on_delete=models.CASCADE, related_name="board")
+    listings = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    median_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # "most listed crops first" on the board page
+            models.Index(fields=["-listings", "crop"], name="crop_price_listings_idx"),
+        ]
+
+    def __str__(self):
+        return f"crop#{self.crop_id}: ৳{self.min_price}/{self.median_price}/{self.max_price} over {self.listings}"
+
+
+class ProductEngagement(models.Model):
+    """
+    Views, cart adds and wishlist adds per product and day, pre-aggregated
+    for the farmer dashboard. Written in batches by apps.marketplace.engagement.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="engagement_days")
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)
+    wishlist_adds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            # also the index behind "these products, the last N days" reads
+            models.UniqueConstraint(fields=["product", "day"], name="unique_product_engagement_day"),
+        ]
+
+    def __str__(self):
+        return f"p#{self.product_id} {self.day}: {self.views} views, {self.cart_adds} cart, {self.wishlist_adds} wishlist"
@@ -0,0 +1,160 @@
+# apps/marketplace/pagination.py
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# newest first; id breaks ties between products created in the same instant
+KEYSET_ORDERING = ("-created_at", "-id")
+
+
+class ProductPagination(PageNumberPagination):
+    """
+    Page-number pagination for product listings.
+    ?page=<n>&page_size=<k> (page_size capped at max_page_size).
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+
+
+def encode_cursor(product):
+    raw = f"{product.created_at.isoformat()}|{product.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    (created_at, id) from a cursor token; ValueError if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError(f"Invalid cursor: {token!r}") from exc
+
+
+def _seek(queryset, cursor):
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset
+
+
+def _split(items, page_size):
+    next_cursor = encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+    return items[:page_size], next_cursor
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of ``queryset`` in KEYSET_ORDERING, starting after ``cursor``.
+    Seeks on (created_at, id) instead of OFFSET, so every page costs the
+    same as the first. Returns (items, next_cursor); next_cursor is None on
+    the last page.
+    """
+    return _split(list(_seek(queryset, cursor)[:page_size + 1]), page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    keyset_page() for async views (async ORM iteration, prefetches included).
+    """
+    return _split([item async for item in _seek(queryset, cursor)[:page_size + 1]], page_size)
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination for product listings, newest first.
+    ?cursor=<token from "next">&page_size=<k> (page_size capped at max_page_size).
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = "cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page, self.next_cursor = keyset_page(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor.")
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page, self.next_cursor = await akeyset_page(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor.")
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "first": self.get_first_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "first": {"type": "string", "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+def paginate(view, request, queryset, serializer_class):
+    """
+    Paginate a product queryset from a plain APIView with keyset cursors,
+    the same way the generic list view does.
+    """
+    paginator = ProductCursorPagination()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    serializer = serializer_class(page, many=True, context={"request": request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+def paginate_ranked(view, request, ids, queryset, serializer_class):
+    """
+    Paginate an already ranked list of ids (e.g. search results) and only
+    fetch the products of the requested page, keeping the ranking order.
+    Relevance order has no keyset, so this stays page-number based.
+    """
+    from .search import ranked_products
+
+    paginator = ProductPagination()
+    page_ids = paginator.paginate_queryset(ids, request, view=view)
+    page = ranked_products(queryset, page_ids)
+    serializer = serializer_class(page, many=True, context={"request": request})
+    return paginator.get_paginated_response(serializer.data)
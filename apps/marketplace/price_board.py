@@ -0,0 +1,347 @@
+# apps/marketplace/price_board.py
+"""
+Market price board: the going rate of every crop (min / median / max / mean
+price and listing count) across all farmers' active listings.
+
+A listing counts towards its catalog crop (Product.crop, see crops.py);
+unclassified listings are left off. The board is never recomputed from
+Product; listings are moved in and out of it as they are created,
+repriced, reclassified, (de)activated or deleted (signals.product_saved /
+product_deleted, and add_products() on bulk_create paths):
+
+* CropPriceLevel keeps each crop's price distribution as (price, listings)
+  rows, so a repricing moves one listing from one level to another;
+* the CropPrice rows of the touched crops are locked (in crop order) while
+  they change, count and sum are adjusted by the delta, and min / median /
+  max are re-read from those crops' levels alone: an ordered range scan of
+  the (crop, price) index over distinct prices rather than listings.
+
+Readers get board() / board_rows(), cached per catalog version
+(catalog_cache), which every Product save and delete already bumps.
+Use the rebuild_price_board command after writes that bypass both
+(queryset.update(), raw SQL).
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from config.replicas import PRIMARY
+
+from . import catalog_cache, crops
+from .models import CropPrice, CropPriceLevel, Product
+
+_to_price = Product._meta.get_field("price").to_python
+
+CENT = Decimal("0.01")
+
+# Product fields that decide where a listing sits on the board
+BOARD_FIELDS = {"crop", "price", "active"}
+
+BOARD_TIMEOUT = 10 * 60
+
+# board_rows() sort keys
+ORDERINGS = {
+    "crop": lambda row: row["name"],
+    "listings": lambda row: (-row["listings"], row["name"]),
+    "price": lambda row: (row["median"], row["name"]),
+}
+
+
+def listing_state(crop_id, price, active):
+    """
+    (crop id, price) a listing contributes to the board, or None when it is not listed.
+    """
+    if not active or crop_id is None or price is None:
+        return None
+    return crop_id, _to_price(price)
+
+
+def _stored_state(product):
+    """
+    The listing as last saved, remembered by Product.from_db and by the
+    previous save. Returns (known, state); unknown for instances that were
+    never loaded, or loaded without these fields.
+    """
+    price, active = getattr(product, "_stored_price", None), getattr(product, "_stored_active", None)
+    if not hasattr(product, "_stored_crop_id") or price is None or active is None:
+        return False, None
+    return True, listing_state(product._stored_crop_id, price, active)
+
+
+def _deltas(old, new):
+    """
+    {crop id: {price: change in listings}} for a listing moving from ``old`` to ``new``.
+    """
+    moves = Counter()
+    if old:
+        moves[old] -= 1
+    if new:
+        moves[new] += 1
+    changes = defaultdict(dict)
+    for (crop_id, price), delta in moves.items():
+        if delta:
+            changes[crop_id][price] = delta
+    return changes
+
+
+def _lock(changes):
+    """
+    {crop id: CropPrice} for the crops in ``changes``, locked in crop order.
+    Rows for crops gaining listings are inserted first when missing (they
+    come back with no listings).
+    """
+    gaining = [crop_id for crop_id, deltas in changes.items() if any(delta > 0 for delta in deltas.values())]
+    if gaining:
+        # a concurrent writer may insert the same crop; then we queue behind its lock
+        new_rows = [
+            CropPrice(crop_id=crop_id, min_price=0, median_price=0, max_price=0, mean_price=0)
+            for crop_id in gaining
+        ]
+        if connection.features.supports_ignore_conflicts:
+            CropPrice.objects.bulk_create(new_rows, ignore_conflicts=True)
+        else:
+            present = set(CropPrice.objects.filter(crop_id__in=gaining).values_list("crop_id", flat=True))
+            for row in new_rows:
+                if row.crop_id not in present:
+                    try:
+                        with transaction.atomic():
+                            row.save()
+                    except IntegrityError:
+                        pass
+    locked = CropPrice.objects.select_for_update().filter(crop_id__in=list(changes)).order_by("crop_id")
+    return {row.crop_id: row for row in locked}
+
+
+def _stats(levels, count):
+    """
+    (min, median, max) of ``count`` listings given as price-sorted (price, listings) levels.
+    """
+    lower, upper = (count - 1) // 2, count // 2
+    low_value = high_value = None
+    seen = 0
+    for price, listings in levels:
+        if low_value is None and seen + listings > lower:
+            low_value = price
+        if seen + listings > upper:
+            high_value = price
+            break
+        seen += listings
+    median = ((low_value + high_value) / 2).quantize(CENT)
+    return levels[0][0], median, levels[-1][0]
+
+
+def _apply(changes):
+    """
+    Move listings between price levels ({crop id: {price: delta}}) and
+    refresh the board rows of those crops, with a fixed number of queries
+    however many crops are touched.
+    """
+    if not changes:
+        return
+    with transaction.atomic(savepoint=False):
+        rows = _lock(changes)
+        # a row without listings was just inserted, so its crop has no levels yet
+        known = [crop_id for crop_id, row in rows.items() if row.listings]
+        prices = {price for deltas in changes.values() for price in deltas}
+        existing = {
+            (level.crop_id, level.price): level
+            for level in CropPriceLevel.objects.filter(crop_id__in=known, price__in=list(prices))
+        } if known else {}
+        # the row locks serialize writers of these crops, so read-modify-write is safe
+        created, updated, emptied = [], [], []
+        for crop_id, row in rows.items():
+            for price, delta in changes[crop_id].items():
+                level = existing.get((crop_id, price))
+                if level is None:
+                    if delta > 0:
+                        created.append(CropPriceLevel(crop_id=crop_id, price=price, listings=delta))
+                elif level.listings + delta > 0:
+                    level.listings += delta
+                    updated.append(level)
+                else:
+                    emptied.append(level.pk)
+                row.listings = max(row.listings + delta, 0)
+                row.price_sum += price * delta
+        if created:
+            CropPriceLevel.objects.bulk_create(created)
+        if updated:
+            CropPriceLevel.objects.bulk_update(updated, ["listings"])
+        if emptied:
+            CropPriceLevel.objects.filter(pk__in=emptied).delete()
+
+        levels = defaultdict(list)
+        for level in sorted(created, key=lambda level: level.price):
+            if level.crop_id not in known:
+                levels[level.crop_id].append((level.price, level.listings))
+        if known:
+            stored = CropPriceLevel.objects.filter(crop_id__in=known).order_by("crop_id", "price")
+            for crop_id, price, listings in stored.values_list("crop_id", "price", "listings"):
+                levels[crop_id].append((price, listings))
+        _refresh(rows, levels)
+
+
+def _refresh(rows, levels):
+    """
+    Recompute min / median / max / mean of the locked ``rows`` from their
+    crops' price-sorted levels, dropping crops left without listings.
+    """
+    now, changed, gone = timezone.now(), [], []
+    for crop_id, row in rows.items():
+        if not levels[crop_id] or not row.listings:
+            gone.append(row.pk)
+            continue
+        row.min_price, row.median_price, row.max_price = _stats(levels[crop_id], sum(n for _, n in levels[crop_id]))
+        row.mean_price = (row.price_sum / row.listings).quantize(CENT)
+        row.updated_at = now
+        changed.append(row)
+    if changed:
+        CropPrice.objects.bulk_update(
+            changed, ["listings", "price_sum", "min_price", "median_price", "max_price", "mean_price", "updated_at"]
+        )
+    if gone:
+        CropPrice.objects.filter(pk__in=gone).delete()
+
+
+def move(old, new):
+    """
+    Apply a listing's move from state ``old`` to ``new`` (see listing_state).
+    """
+    _apply(_deltas(old, new))
+
+
+def product_saved(product, created, update_fields=None):
+    """
+    Move ``product`` on the board after a save (called by signals.product_saved).
+    """
+    def saved(field, attname):
+        if update_fields is None or field in update_fields:
+            return getattr(product, attname)
+        return getattr(product, f"_stored_{attname}", None)
+
+    crop_id = saved("crop", "crop_id")
+    new = listing_state(crop_id, saved("price", "price"), saved("active", "active"))
+    known, old = (True, None) if created else _stored_state(product)
+    if known:
+        move(old, new)
+    elif new:
+        # previous state unknown: recount the crop the listing is in now
+        rebuild([new[0]])
+    product._stored_crop_id = crop_id
+
+
+def product_deleted(product):
+    known, old = _stored_state(product)
+    if not known:
+        old = listing_state(product.crop_id, product.price, product.active)
+    move(old, None)
+
+
+def add_products(products):
+    """
+    Bulk version of product_saved for newly created products (bulk_create
+    sends no post_save); one batched update for all their crops.
+    """
+    changes = defaultdict(Counter)
+    for product in products:
+        state = listing_state(product.crop_id, product.price, product.active)
+        if state:
+            changes[state[0]][state[1]] += 1
+        product._stored_crop_id = product.crop_id
+    _apply(changes)
+    return len(changes)
+
+
+def rebuild(crop_ids=None, batch_size=2000):
+    """
+    Recount the board (or just ``crop_ids``) from the active listings, with
+    the grouping done by the database. Returns the number of board rows written.
+    """
+    listings = Product.objects.active().filter(crop__isnull=False)
+    old_levels, old_rows = CropPriceLevel.objects.all(), CropPrice.objects.all()
+    if crop_ids is not None:
+        listings = listings.filter(crop_id__in=crop_ids)
+        old_levels, old_rows = old_levels.filter(crop_id__in=crop_ids), old_rows.filter(crop_id__in=crop_ids)
+    grouped = listings.order_by("crop_id", "price").values_list("crop_id", "price").annotate(n=Count("id"))
+
+    by_crop = defaultdict(list)
+    for crop_id, price, n in grouped.iterator(chunk_size=batch_size):
+        by_crop[crop_id].append((_to_price(price), n))
+    board_rows = []
+    for crop_id, crop_levels in by_crop.items():
+        count = sum(n for _, n in crop_levels)
+        total = sum(price * n for price, n in crop_levels)
+        low, median, high = _stats(crop_levels, count)
+        board_rows.append(CropPrice(
+            crop_id=crop_id, listings=count, price_sum=total, min_price=low, median_price=median,
+            max_price=high, mean_price=(total / count).quantize(CENT),
+        ))
+
+    with transaction.atomic():
+        old_levels.delete()
+        old_rows.delete()
+        CropPriceLevel.objects.bulk_create(
+            (CropPriceLevel(crop_id=crop_id, price=price, listings=n)
+             for crop_id, crop_levels in by_crop.items() for price, n in crop_levels),
+            batch_size=batch_size,
+        )
+        CropPrice.objects.bulk_create(board_rows, batch_size=batch_size)
+        catalog_cache.bump()
+    return len(board_rows)
+
+
+def _as_dict(row):
+    return {
+        "crop_id": row.crop_id,
+        "crop": row.crop.slug,
+        "name": row.crop.name,
+        "local_name": row.crop.local_name,
+        "listings": row.listings,
+        "min": row.min_price,
+        "median": row.median_price,
+        "max": row.max_price,
+        "mean": row.mean_price,
+        "updated_at": row.updated_at,
+    }
+
+
+def board(catalog_version=None):
+    """
+    Every board row as a dict (alphabetical by crop name), cached per catalog version.
+    """
+    key = f"price_board:{catalog_version or catalog_cache.version()}"
+    rows = cache.get(key)
+    if rows is None:
+        # shared by every reader of this version, so never from a lagging replica
+        stored = CropPrice.objects.using(PRIMARY).select_related("crop").order_by("crop__name")
+        rows = [_as_dict(row) for row in stored]
+        cache.set(key, rows, BOARD_TIMEOUT)
+    return rows
+
+
+def board_rows(crop_names=(), order="crop", catalog_version=None):
+    """
+    board(), narrowed to the crops named in ``crop_names`` (free text, in any
+    spelling or language the catalog knows) and sorted by one of ORDERINGS.
+    """
+    if order not in ORDERINGS:
+        raise ValueError(f"order must be one of {', '.join(ORDERINGS)}")
+    rows = board(catalog_version)
+    if crop_names:
+        wanted = {crops.classify(text) for text in crop_names}
+        rows = [row for row in rows if row["crop_id"] in wanted]
+    if order != "crop":
+        rows = sorted(rows, key=ORDERINGS[order])
+    return rows
+
+
+def board_etag(request, *args, **kwargs):
+    # the board only changes with the catalog version, so clients revalidate for free
+    return f"board-{catalog_cache.version()}"
+
+
+board_condition = condition(etag_func=board_etag)
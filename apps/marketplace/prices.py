@@ -0,0 +1,183 @@
+# apps/marketplace/prices.py
+"""
+Crop price history.
+
+Every price change appends a PriceObservation and folds it into the
+daily / weekly / monthly PriceRollup rows of its product, so reading a
+year of history is one range scan over the (product, resolution,
+period_start) index instead of aggregating raw observations.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import PriceObservation, PriceRollup, Product
+
+_to_price = Product._meta.get_field("price").to_python
+
+
+def period_start(resolution, day):
+    """
+    First day of the rollup period containing ``day`` (weeks start on Monday).
+    """
+    if resolution == PriceRollup.DAY:
+        return day
+    if resolution == PriceRollup.WEEK:
+        return day - timedelta(days=day.weekday())
+    if resolution == PriceRollup.MONTH:
+        return day.replace(day=1)
+    raise ValueError(f"Unknown resolution: {resolution!r}")
+
+
+def _fold(rollup, price, observed_at):
+    rollup.high = max(rollup.high, price)
+    rollup.low = min(rollup.low, price)
+    rollup.observations += 1
+    if observed_at < rollup.opened_at:
+        rollup.open, rollup.opened_at = price, observed_at
+    if observed_at >= rollup.closed_at:
+        rollup.close, rollup.closed_at = price, observed_at
+
+
+def _new_rollup(product_id, resolution, start, price, observed_at):
+    return PriceRollup(
+        product_id=product_id,
+        resolution=resolution,
+        period_start=start,
+        open=price, high=price, low=price, close=price,
+        observations=1,
+        opened_at=observed_at,
+        closed_at=observed_at,
+    )
+
+
+def _apply_to_rollup(product_id, resolution, price, observed_at):
+    start = period_start(resolution, timezone.localdate(observed_at))
+    rollup = (
+        PriceRollup.objects.select_for_update()
+        .filter(product_id=product_id, resolution=resolution, period_start=start)
+        .first()
+    )
+    if rollup is None:
+        try:
+            with transaction.atomic():
+                _new_rollup(product_id, resolution, start, price, observed_at).save()
+            return
+        except IntegrityError:
+            # another writer created the period first; fold into theirs
+            rollup = PriceRollup.objects.select_for_update().get(
+                product_id=product_id, resolution=resolution, period_start=start
+            )
+    _fold(rollup, price, observed_at)
+    rollup.save(update_fields=["open", "high", "low", "close", "observations", "opened_at", "closed_at"])
+
+
+def record_price(product, price=None, observed_at=None):
+    """
+    Append an observation for ``product`` and update its rollups, atomically.
+    """
+    price = _to_price(product.price if price is None else price)
+    observed_at = observed_at or timezone.now()
+    with transaction.atomic():
+        observation = PriceObservation.objects.create(product_id=product.pk, price=price, observed_at=observed_at)
+        for resolution, _ in PriceRollup.RESOLUTIONS:
+            _apply_to_rollup(product.pk, resolution, price, observed_at)
+    return observation
+
+
+def record_initial_prices(products, observed_at=None, batch_size=1000):
+    """
+    Bulk version of record_price for products that have no history yet
+    (bulk_create bypasses the post_save signal).
+    """
+    observed_at = observed_at or timezone.now()
+    day = timezone.localdate(observed_at)
+    observations, rollups = [], []
+    for product in products:
+        price = _to_price(product.price)
+        observations.append(PriceObservation(product_id=product.pk, price=price, observed_at=observed_at))
+        rollups.extend(
+            _new_rollup(product.pk, resolution, period_start(resolution, day), price, observed_at)
+            for resolution, _ in PriceRollup.RESOLUTIONS
+        )
+    with transaction.atomic():
+        PriceObservation.objects.bulk_create(observations, batch_size=batch_size)
+        PriceRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(observations)
+
+
+def previous_price(product):
+    """
+    The last recorded price of ``product`` (None if it has none yet).
+    Uses the value remembered by Product.from_db when available.
+    """
+    if hasattr(product, "_stored_price"):
+        return product._stored_price
+    return (
+        PriceObservation.objects.filter(product_id=product.pk)
+        .order_by("-observed_at")
+        .values_list("price", flat=True)
+        .first()
+    )
+
+
+def price_changed(product, previous=None):
+    """
+    True when ``product.price`` differs from ``previous`` (default: the last
+    recorded price).
+    """
+    if previous is None:
+        previous = previous_price(product)
+    return previous is None or _to_price(product.price) != _to_price(previous)
+
+
+def price_history(product_id, resolution=PriceRollup.DAY, start=None, end=None):
+    """
+    Rollups for one product in [start, end] (dates), oldest first.
+    """
+    qs = PriceRollup.objects.filter(product_id=product_id, resolution=resolution)
+    if start:
+        qs = qs.filter(period_start__gte=period_start(resolution, start))
+    if end:
+        qs = qs.filter(period_start__lte=end)
+    return qs.order_by("period_start")
+
+
+def rebuild_rollups(product_ids=None, batch_size=1000):
+    """
+    Recompute all rollups from the raw observations (streamed in time order).
+    Returns the number of rollup rows written.
+    """
+    observations = PriceObservation.objects.order_by("product_id", "observed_at")
+    rollups = PriceRollup.objects.all()
+    if product_ids:
+        observations = observations.filter(product_id__in=product_ids)
+        rollups = rollups.filter(product_id__in=product_ids)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        current_product, open_rollups, pending = None, {}, []
+        for product_id, price, observed_at in observations.values_list(
+            "product_id", "price", "observed_at"
+        ).iterator(chunk_size=batch_size):
+            if product_id != current_product:
+                pending.extend(open_rollups.values())
+                current_product, open_rollups = product_id, {}
+            day = timezone.localdate(observed_at)
+            for resolution, _ in PriceRollup.RESOLUTIONS:
+                key = (resolution, period_start(resolution, day))
+                rollup = open_rollups.get(key)
+                if rollup is None:
+                    open_rollups[key] = _new_rollup(product_id, resolution, key[1], price, observed_at)
+                else:
+                    _fold(rollup, price, observed_at)
+            if len(pending) >= batch_size:
+                PriceRollup.objects.bulk_create(pending, batch_size=batch_size)
+                written += len(pending)
+                pending = []
+        pending.extend(open_rollups.values())
+        PriceRollup.objects.bulk_create(pending, batch_size=batch_size)
+        written += len(pending)
+    return written
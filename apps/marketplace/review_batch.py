@@ -0,0 +1,162 @@
+# apps/marketplace/review_batch.py
+"""
+Batch review upserts for feedback kiosks.
+
+A batch of (product, rating, comment) items from one user is validated up
+front and written in one transaction with a fixed number of queries however
+many items it has (up to MAX_ITEMS): products, existing reviews (locked),
+one bulk_create (and a read of the new keys where the database cannot
+return them, e.g. MySQL), one bulk_update and one UPDATE of the product
+rating aggregates built from per-product deltas. Bulk writes send no post_save, so
+the aggregate and cache bookkeeping of signals.py is done here.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import catalog_cache
+from .models import RATING_STARS, Product, Review
+
+MAX_ITEMS = 500
+
+CREATED, UPDATED, UNCHANGED, SUPERSEDED, INVALID = "created", "updated", "unchanged", "superseded", "invalid"
+
+
+class ReviewBatchError(ValueError):
+    """
+    The batch as a whole cannot be processed (not per-item validation).
+    """
+
+
+def _int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _clean(item):
+    """
+    (product_id, rating, comment, errors) for one raw item.
+    """
+    if not isinstance(item, dict):
+        return None, None, None, {"__all__": ["Item must be an object."]}
+    errors = {}
+    product_id = _int(item.get("product"))
+    if product_id is None:
+        errors["product"] = ["A product id is required."]
+    rating = _int(item.get("rating"))
+    if rating not in RATING_STARS:
+        errors["rating"] = ["Rating must be a whole number from 1 to 5."]
+    comment = item.get("comment")
+    comment = comment.strip() if isinstance(comment, str) else ""
+    if not comment:
+        errors["comment"] = ["A comment is required."]
+    return product_id, rating, comment, errors
+
+
+def _apply_aggregate_deltas(deltas):
+    """
+    One UPDATE for every touched product: column = column + CASE pk WHEN ... END.
+    ``deltas`` maps product_id -> {column: delta}.
+    """
+    columns = defaultdict(list)
+    for product_id, changes in deltas.items():
+        for column, delta in changes.items():
+            if delta:
+                columns[column].append(When(pk=product_id, then=Value(delta)))
+    if not columns:
+        return
+    Product.objects.filter(pk__in=deltas).update(**{
+        column: F(column) + Case(*whens, default=Value(0), output_field=IntegerField())
+        for column, whens in columns.items()
+    })
+
+
+def ingest(user, items):
+    """
+    Upsert ``user``'s reviews from ``items`` ([{"product", "rating", "comment"}]).
+    Returns {"results": [{"index", "product", "status", ...}], "created",
+    "updated", "unchanged", "invalid"}. When one batch reviews a product more
+    than once, the last item wins and the earlier ones are "superseded".
+    """
+    if not isinstance(items, list):
+        raise ReviewBatchError("Send a JSON list of reviews (or {\"reviews\": [...]}).")
+    if len(items) > MAX_ITEMS:
+        raise ReviewBatchError(f"At most {MAX_ITEMS} reviews per batch.")
+
+    results = []
+    wanted = {}  # product_id -> (index, rating, comment); last item wins
+    for index, item in enumerate(items):
+        product_id, rating, comment, errors = _clean(item)
+        result = {"index": index, "product": product_id}
+        if errors:
+            result.update(status=INVALID, errors=errors)
+        else:
+            if product_id in wanted:
+                results[wanted[product_id][0]]["status"] = SUPERSEDED
+            wanted[product_id] = (index, rating, comment)
+        results.append(result)
+
+    with transaction.atomic():
+        found = set(Product.objects.active().filter(pk__in=wanted).order_by().values_list("pk", flat=True))
+        for product_id in set(wanted) - found:
+            index = wanted.pop(product_id)[0]
+            results[index].update(status=INVALID, errors={"product": ["Product not found."]})
+
+        existing = {
+            r.product_id: r
+            for r in Review.objects.select_for_update().filter(user=user, product_id__in=wanted)
+        }
+        now = timezone.now()
+        deltas = defaultdict(lambda: defaultdict(int))
+        to_create, to_update = [], []
+        for product_id, (index, rating, comment) in wanted.items():
+            review = existing.get(product_id)
+            if review is None:
+                review = Review(product_id=product_id, user=user, rating=rating, comment=comment)
+                to_create.append((index, review))
+                deltas[product_id]["rating_sum"] += rating
+                deltas[product_id]["rating_count"] += 1
+                deltas[product_id][f"rating_{rating}"] += 1
+                continue
+            if (review.rating, review.comment) == (rating, comment):
+                results[index].update(status=UNCHANGED, review=review.pk)
+                continue
+            deltas[product_id]["rating_sum"] += rating - review.rating
+            deltas[product_id][f"rating_{review.rating}"] -= 1
+            deltas[product_id][f"rating_{rating}"] += 1
+            review.rating, review.comment, review.updated_at = rating, comment, now
+            to_update.append((index, review))
+
+        if to_create:
+            try:
+                with transaction.atomic():
+                    Review.objects.bulk_create([review for _, review in to_create])
+            except IntegrityError:
+                # a concurrent request created one of these reviews first
+                raise ReviewBatchError("Some of these reviews were just created by another request; retry the batch.")
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # e.g. MySQL leaves the keys unset; (user, product) is unique, so read them back
+                keys = dict(
+                    Review.objects.filter(user=user, product_id__in=[review.product_id for _, review in to_create])
+                    .values_list("product_id", "pk")
+                )
+                for _, review in to_create:
+                    review.pk = keys[review.product_id]
+        if to_update:
+            Review.objects.bulk_update([review for _, review in to_update], ["rating", "comment", "updated_at"])
+        _apply_aggregate_deltas(deltas)
+        if to_create or to_update:
+            catalog_cache.bump()
+
+    for status, written in ((CREATED, to_create), (UPDATED, to_update)):
+        for index, review in written:
+            results[index].update(status=status, review=review.pk)
+
+    summary = {s: sum(1 for r in results if r["status"] == s) for s in (CREATED, UPDATED, UNCHANGED, INVALID)}
+    return {"results": results, **summary}
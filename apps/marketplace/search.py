@@ -0,0 +1,258 @@
+# apps/marketplace/search.py
+"""
+Inverted-index product search with BM25 ranking.
+
+Products are tokenized (title + description) into SearchPosting rows when
+they are saved (see signals.py). A query only reads the postings of its
+own terms through the (term, document) index, so cost follows the number
+of matching postings rather than the size of the catalog. The corpus
+statistics (document count, total length) live in the SearchStats row,
+moved by delta wherever documents are added or removed.
+"""
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Product, SearchDocument, SearchPosting, SearchStats
+
+# BM25 parameters (standard defaults)
+K1 = 1.2
+B = 0.75
+
+# title words count this many times towards tf
+TITLE_WEIGHT = 2
+
+# cap on ranked ids returned for one query
+MAX_RESULTS = 1000
+
+# shortest trailing word that is also expanded as a prefix
+MIN_PREFIX_LENGTH = 3
+
+MAX_TERM_LENGTH = SearchPosting._meta.get_field("term").max_length
+
+STATS_PK = 1
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split()
+)
+
+
+def _is_token_char(ch):
+    # letters/digits plus combining marks, so Bengali vowel signs stay inside a word
+    return ch.isalnum() or unicodedata.category(ch).startswith("M")
+
+
+def _stem(token):
+    """
+    Very light English plural folding: tomatoes -> tomato, berries -> berry, apples -> apple.
+    Non-ASCII tokens are left alone.
+    """
+    if not token.isascii() or token.isdigit():
+        return token
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("oes", "ches", "shes", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Normalize (NFKC, case-fold) and split text into index terms.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).casefold()
+    tokens, current = [], []
+    for ch in text:
+        if _is_token_char(ch):
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return [
+        _stem(t)[:MAX_TERM_LENGTH]
+        for t in tokens
+        if t not in STOPWORDS
+    ]
+
+
+def _document_terms(product):
+    counts = Counter()
+    for term in tokenize(product.title):
+        counts[term] += TITLE_WEIGHT
+    for term in tokenize(product.description):
+        counts[term] += 1
+    return counts
+
+
+def _adjust_stats(documents, length):
+    if documents or length:
+        SearchStats.objects.filter(pk=STATS_PK).update(
+            documents=F("documents") + documents, total_length=F("total_length") + length
+        )
+
+
+def recount_stats():
+    """
+    Recompute the SearchStats row from SearchDocument (after a rebuild, or if it is missing).
+    """
+    stats = SearchDocument.objects.aggregate(documents=Count("pk"), total_length=Sum("length"))
+    stats["total_length"] = stats["total_length"] or 0
+    SearchStats.objects.update_or_create(pk=STATS_PK, defaults=stats)
+    return stats["documents"], stats["total_length"]
+
+
+def corpus_stats():
+    """
+    (documents, total length) of the index: one primary-key read.
+    """
+    row = SearchStats.objects.filter(pk=STATS_PK).values_list("documents", "total_length").first()
+    return row if row is not None else recount_stats()
+
+
+def _remove(product_id):
+    """
+    Delete a product's document (postings cascade); returns its length, or None if it was not indexed.
+    """
+    length = SearchDocument.objects.filter(pk=product_id).values_list("length", flat=True).first()
+    if length is not None:
+        SearchDocument.objects.filter(pk=product_id).delete()
+    return length
+
+
+def index_product(product):
+    """
+    (Re)index one product. Inactive products are removed from the index.
+    """
+    with transaction.atomic():
+        old_length = _remove(product.pk)
+        documents, length = -(old_length is not None), -(old_length or 0)
+        if product.active:
+            counts = _document_terms(product)
+            document = SearchDocument.objects.create(product_id=product.pk, length=sum(counts.values()))
+            SearchPosting.objects.bulk_create(
+                SearchPosting(document=document, term=term, tf=tf) for term, tf in counts.items()
+            )
+            documents, length = documents + 1, length + document.length
+        _adjust_stats(documents, length)
+
+
+def index_new_products(products, batch_size=1000):
+    """
+    Index freshly inserted products (e.g. from bulk_create, which sends no
+    signals) with two bulk INSERTs; they must not be in the index yet.
+    """
+    documents, postings = [], []
+    for product in products:
+        if not product.active:
+            continue
+        counts = _document_terms(product)
+        documents.append(SearchDocument(product_id=product.pk, length=sum(counts.values())))
+        postings.extend(
+            SearchPosting(document_id=product.pk, term=term, tf=tf) for term, tf in counts.items()
+        )
+    _adjust_stats(len(documents), sum(document.length for document in documents))
+    return _flush(documents, postings, batch_size)
+
+
+def remove_product(product_id):
+    """
+    Take a product out of the index (signals.product_deleting calls this
+    before the delete, so the statistics see the document go).
+    """
+    length = _remove(product_id)
+    if length is not None:
+        _adjust_stats(-1, -length)
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Drop and rebuild the whole index from active products, in batches.
+    Returns the number of indexed products.
+    """
+    indexed = 0
+    with transaction.atomic():
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+
+        products = Product.objects.active().order_by().only("pk", "title", "description")
+        documents, postings = [], []
+        for product in products.iterator(chunk_size=batch_size):
+            counts = _document_terms(product)
+            documents.append(SearchDocument(product_id=product.pk, length=sum(counts.values())))
+            postings.extend(
+                SearchPosting(document_id=product.pk, term=term, tf=tf) for term, tf in counts.items()
+            )
+            if len(documents) >= batch_size:
+                indexed += _flush(documents, postings, batch_size)
+                documents, postings = [], []
+        indexed += _flush(documents, postings, batch_size)
+        recount_stats()
+    return indexed
+
+
+def _flush(documents, postings, batch_size):
+    SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+    SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+    return len(documents)
+
+
+def search(query, limit=MAX_RESULTS):
+    """
+    Return product ids matching ``query``, best BM25 score first.
+    The last query word is also matched as a prefix ("tom" finds "tomato").
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    n_docs, total_length = corpus_stats()
+    if not n_docs:
+        return []
+    avgdl = total_length / n_docs or 1.0
+
+    condition = Q(term__in=terms)
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        condition |= Q(term__startswith=terms[-1])
+    rows = SearchPosting.objects.filter(condition).values_list(
+        "document_id", "term", "tf", "document__length"
+    )
+
+    postings = defaultdict(list)
+    for doc_id, term, tf, length in rows.iterator():
+        postings[term].append((doc_id, tf, length))
+
+    scores = defaultdict(float)
+    for term, docs in postings.items():
+        idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        for doc_id, tf, length in docs:
+            norm = K1 * (1 - B + B * length / avgdl)
+            scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return [doc_id for doc_id, _ in ranked[:limit]]
+
+
+def ranked_products(queryset, ids):
+    """
+    Fetch ``ids`` from ``queryset`` and return them in the given (ranked) order.
+    Ids filtered out by the queryset (e.g. deactivated products) are dropped.
+    """
+    by_pk = {p.pk: p for p in queryset.filter(pk__in=ids)}
+    return [by_pk[pk] for pk in ids if pk in by_pk]
+
+
+async def aranked_products(queryset, ids):
+    """
+    ranked_products() for async views.
+    """
+    by_pk = {p.pk: p async for p in queryset.filter(pk__in=ids)}
+    return [by_pk[pk] for pk in ids if pk in by_pk]
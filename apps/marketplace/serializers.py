@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Product, Review
+from . import alerts, images
+from .models import Crop, PriceAlert, PriceRollup, Product, Review
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,7 +11,108 @@ class ProductSerializer(serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     rating_avg = serializers.ReadOnlyField()
     rating_count = serializers.ReadOnlyField()
+    rating_histogram = serializers.ReadOnlyField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'title', 'price', 'description', 'image', 'active', 'created_at', 'updated_at', 'rating_avg', 'rating_count', 'reviews']
+        fields = ['id', 'title', 'price', 'description', 'image', 'image_srcset', 'active', 'crop', 'crop_confirmed', 'created_at', 'updated_at', 'rating_avg', 'rating_count', 'rating_histogram', 'reviews']
+        read_only_fields = ['crop_confirmed']
+
+    def save(self, **kwargs):
+        # a crop sent by the client is the farmer's pick; null hands it back to title matching
+        if "crop" in self.validated_data:
+            kwargs.setdefault("crop_confirmed", self.validated_data["crop"] is not None)
+        return super().save(**kwargs)
+
+    def get_image_srcset(self, obj):
+        found = images.variants(obj.image, obj.image_widths)
+        if not found:
+            return None
+        request = self.context.get("request")
+        absolute = request.build_absolute_uri if request else (lambda url: url)
+        return {
+            ext: ", ".join(f"{absolute(v[ext])} {v['width']}w" for v in found)
+            for ext in images.FORMATS
+        }
+
+
+class PriceRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceRollup
+        fields = ['period_start', 'open', 'high', 'low', 'close', 'observations']
+
+
+class CartLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField(source="product.pk")
+    title = serializers.CharField(source="product.title")
+    unit_price = serializers.DecimalField(source="product.price", max_digits=10, decimal_places=2)
+    qty = serializers.IntegerField()
+    line_total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CartSerializer(serializers.Serializer):
+    lines = CartLineSerializer(many=True)
+    count = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class PriceAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceAlert
+        fields = ['id', 'product', 'crop', 'direction', 'threshold', 'active', 'created_at',
+                  'triggered_at', 'triggered_price', 'triggered_product']
+        read_only_fields = ['created_at', 'triggered_at', 'triggered_price', 'triggered_product']
+        # without a default, a form post that omits "active" would create a disabled alert
+        extra_kwargs = {'active': {'default': True}}
+
+    def validate_crop(self, value):
+        if not value:
+            return ""
+        try:
+            return alerts.normalize_crop(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def validate_threshold(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Threshold must be positive.")
+        return value
+
+    def validate(self, attrs):
+        product = attrs.get("product", getattr(self.instance, "product", None))
+        crop = attrs.get("crop", getattr(self.instance, "crop", ""))
+        if bool(product) == bool(crop):
+            raise serializers.ValidationError("Give either a product or a crop.")
+        if attrs.get("active") and self.instance and not self.instance.active:
+            # re-arming clears the previous trigger
+            attrs.update(triggered_at=None, triggered_price=None, triggered_product=None)
+        return attrs
+
+    def save(self, **kwargs):
+        alert = super().save(**kwargs)
+        # an alert only fires on a crossing, so one that current prices already
+        # satisfy (new, re-armed or moved threshold) fires now
+        alerts.evaluate_alert(alert)
+        return alert
+
+
+class CropSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Crop
+        fields = ['id', 'slug', 'name', 'local_name']
+
+
+class PriceBoardRowSerializer(serializers.Serializer):
+    """
+    One crop of the market price board (rows come from price_board.board()).
+    """
+    crop = serializers.CharField()
+    name = serializers.CharField()
+    local_name = serializers.CharField()
+    listings = serializers.IntegerField()
+    min = serializers.DecimalField(max_digits=10, decimal_places=2)
+    median = serializers.DecimalField(max_digits=10, decimal_places=2)
+    max = serializers.DecimalField(max_digits=10, decimal_places=2)
+    mean = serializers.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = serializers.DateTimeField()
@@ -0,0 +1,186 @@
+# apps/marketplace/signals.py
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import alerts, catalog_cache, crops, images, price_board, prices, search, ticker
+from .models import RATING_STARS, Crop, Product, Review
+
+# Product fields that feed the search index
+SEARCH_FIELDS = {"title", "description", "active"}
+
+
+def _bump_rating(product_id, removed=None, added=None):
+    """
+    Move the stored aggregates (sum, count and star histogram) for a rating
+    leaving and/or joining a product, with a single UPDATE using F()
+    expressions, so concurrent reviews on the same product never overwrite
+    each other. It runs inside the review's save, so it commits with it.
+    """
+    if not product_id or removed == added:
+        return
+    changes = {
+        "rating_sum": F("rating_sum") + (added or 0) - (removed or 0),
+        "rating_count": F("rating_count") + int(added is not None) - int(removed is not None),
+    }
+    if removed is not None:
+        changes[f"rating_{removed}"] = F(f"rating_{removed}") - 1
+    if added is not None:
+        changes[f"rating_{added}"] = F(f"rating_{added}") + 1
+    Product.objects.filter(pk=product_id).update(**changes)
+
+
+def recompute_rating(product_id):
+    """
+    Recompute one product's aggregates from its reviews (used when the
+    previous rating of an updated review is unknown).
+    """
+    agg = Review.objects.filter(product_id=product_id).aggregate(
+        rating_sum=Coalesce(Sum("rating"), 0),
+        rating_count=Count("id"),
+        **{f"rating_{stars}": Count("id", filter=Q(rating=stars)) for stars in RATING_STARS},
+    )
+    Product.objects.filter(pk=product_id).update(**agg)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # fixtures carry their own aggregates; use rebuild_rating_aggregates afterwards
+        return
+
+    old_rating = getattr(instance, "_stored_rating", None)
+    old_product_id = getattr(instance, "_stored_product_id", None)
+
+    if created:
+        _bump_rating(instance.product_id, added=instance.rating)
+    elif old_rating is None:
+        # instance was not loaded from the database, so there is no delta to apply
+        recompute_rating(instance.product_id)
+    elif old_product_id != instance.product_id:
+        # review moved to another product (admin edit)
+        _bump_rating(old_product_id, removed=old_rating)
+        _bump_rating(instance.product_id, added=instance.rating)
+    else:
+        _bump_rating(instance.product_id, removed=old_rating, added=instance.rating)
+
+    instance._stored_rating = instance.rating
+    instance._stored_product_id = instance.product_id
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    rating = getattr(instance, "_stored_rating", None)
+    if rating is None:
+        rating = instance.rating
+    product_id = getattr(instance, "_stored_product_id", None) or instance.product_id
+    _bump_rating(product_id, removed=rating)
+
+
+@receiver(pre_save, sender=Product)
+def product_classify(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Detect the crop of a new or retitled listing, unless the farmer picked
+    it. Partial saves (update_fields) are left alone, since the crop column
+    would not be written.
+    """
+    if raw or update_fields is not None or instance.crop_confirmed:
+        return
+    if instance.crop_id is None or instance.title != getattr(instance, "_stored_title", None):
+        instance.crop_id = crops.classify(instance.title)
+
+
+@receiver(post_save, sender=Crop)
+@receiver(post_delete, sender=Crop)
+def crop_catalog_changed(sender, raw=False, **kwargs):
+    crops.invalidate()
+    # the price board shows crop names
+    catalog_cache.bump()
+
+
+_UNKNOWN = object()
+
+
+def _search_fields_changed(product, update_fields):
+    # unknown previous values (instance not loaded from the database) count as changed
+    fields = SEARCH_FIELDS if update_fields is None else SEARCH_FIELDS.intersection(update_fields)
+    return any(getattr(product, field) != getattr(product, f"_stored_{field}", _UNKNOWN) for field in fields)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # compared before the blocks below update the remembered values; a full
+    # save that only changed the price keeps its postings
+    reindex = created or _search_fields_changed(instance, update_fields)
+    # back on sale or moved to another crop: the listing meets alerts without a price move
+    reactivated = instance.active and getattr(instance, "_stored_active", None) is False
+    recropped = instance.crop_id != getattr(instance, "_stored_crop_id", instance.crop_id)
+    relisted = not created and (
+        (update_fields is None or "active" in update_fields) and reactivated
+        or (update_fields is None or "crop" in update_fields) and recropped
+    )
+    # before the price block below updates the remembered price
+    if update_fields is None or price_board.BOARD_FIELDS.intersection(update_fields):
+        price_board.product_saved(instance, created, update_fields)
+    price_moved = False
+    if update_fields is None or "price" in update_fields:
+        previous = None if created else prices.previous_price(instance)
+        if created or prices.price_changed(instance, previous):
+            prices.record_price(instance)
+            if not relisted:
+                alerts.evaluate(instance, previous)
+            price_moved = True
+        instance._stored_price = instance.price
+    if relisted:
+        # every alert the current price meets, not only the ones a move crossed
+        alerts.evaluate(instance, None)
+    if created or price_moved or instance.active != getattr(instance, "_stored_active", instance.active):
+        ticker.publish_product(instance)
+    instance._stored_active = instance.active
+    if update_fields is None or "title" in update_fields:
+        instance._stored_title = instance.title
+    if update_fields is None or "description" in update_fields:
+        instance._stored_description = instance.description
+    if reindex:
+        search.index_product(instance)
+    if update_fields is None or "image" in update_fields:
+        image_saved(instance, "image", "image_widths")
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    # ahead of the cascade, so the search statistics lose the document too
+    search.remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    price_board.product_deleted(instance)
+    ticker.publish_product(instance, kind="removed")
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def catalog_changed(sender, raw=False, **kwargs):
+    if not raw:
+        catalog_cache.bump()
+
+
+def image_saved(instance, field_name, widths_field):
+    """
+    When an image field changed, forget the old variants and queue new ones.
+    """
+    name = getattr(instance, field_name).name or None
+    if name == (getattr(instance, f"_stored_{field_name}", None) or None):
+        return
+    setattr(instance, f"_stored_{field_name}", name)
+    if getattr(instance, widths_field):
+        setattr(instance, widths_field, [])
+        type(instance).objects.filter(pk=instance.pk).update(**{widths_field: []})
+    if name:
+        images.schedule(instance, field_name, widths_field)
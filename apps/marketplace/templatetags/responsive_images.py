@@ -0,0 +1,37 @@
+# apps/marketplace/templatetags/responsive_images.py
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from apps.marketplace import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field_file, widths, alt="", sizes="100vw", default="", **attrs):
+    """
+    <picture> with a WebP srcset and a JPEG srcset fallback for the recorded
+    derivative widths; falls back to the original upload, then to the static
+    file ``default``. Renders nothing when there is neither, so the caller's
+    container shows its own placeholder rather than a broken image.
+
+        {% picture p.image p.image_widths alt=p.title sizes="(max-width: 600px) 50vw, 20vw" style="..." %}
+    """
+    if field_file:
+        src = field_file.url
+    elif default:
+        src = static(default)
+    else:
+        return ""
+    extra = format_html_join("", ' {}="{}"', ((k.replace("_", "-"), v) for k, v in attrs.items()))
+
+    found = images.variants(field_file, widths)
+    if not found:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', src, alt, extra)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        images.srcset(field_file, widths, "webp"), sizes,
+        found[0]["jpg"], images.srcset(field_file, widths, "jpg"), sizes, alt, extra,
+    )
@@ -1,3 +1,1258 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import Profile
+from apps.farmers import directory
+from config import replicas
+from config.replicas import ReplicaRouter, ReplicaRoutingMiddleware
+
+from . import alerts, analytics, bulk_import, cart, catalog_cache, crops, engagement, export, images, price_board, prices, review_batch, search, ticker
+from . import wishlist
+from .models import Crop, CropPrice, CropPriceLevel, PriceAlert, PriceObservation, PriceRollup, Product, Review, SearchDocument
+from .models import ProductEngagement, Wishlist
+from .serializers import ProductSerializer
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Tomato", price="40.00")
+
+    def test_create_update_delete_keep_aggregates(self):
+        review = Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (4, 1))
+
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 2
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (2, 1))
+
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (0, 0))
+        self.assertEqual(self.product.rating_avg, 0)
+
+    def test_add_review_view_edits_in_place(self):
+        self.client.force_login(self.buyer)
+        url = reverse("marketplace:add_review", args=[self.product.pk])
+        self.client.post(url, {"rating": 5, "comment": "great"})
+        self.client.post(url, {"rating": 3, "comment": "ok"})
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (3, 1))
+
+    def test_histogram_follows_create_edit_delete(self):
+        review = Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        Review.objects.create(product=self.product, user=self.farmer, rating=4)
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 1
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual([row["count"] for row in self.product.rating_histogram], [0, 1, 0, 0, 1])
+        self.assertEqual(self.product.rating_histogram[1]["percent"], 50)
+
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual([row["count"] for row in self.product.rating_histogram], [0, 1, 0, 0, 0])
+
+    def test_review_api_validates_rating_and_updates_histogram(self):
+        self.client.force_login(self.buyer)
+        url = reverse("marketplace:add_review_api", args=[self.product.pk])
+        self.assertEqual(self.client.post(url, {"rating": "six", "comment": "?"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"rating": "5", "comment": "great"}).status_code, 201)
+        data = self.client.get(reverse("marketplace:product_detail_api", args=[self.product.pk])).json()
+        self.assertEqual(data["rating_histogram"][0], {"stars": 5, "count": 1, "percent": 100})
+
+    def test_rebuild_command(self):
+        Review.objects.create(product=self.product, user=self.buyer, rating=5)
+        Review.objects.create(product=self.product, user=self.farmer, rating=2)
+        Product.objects.update(rating_sum=0, rating_count=0, rating_2=0, rating_5=0)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (7, 2))
+        self.assertEqual((self.product.rating_2, self.product.rating_5), (1, 1))
+        self.assertEqual(self.product.rating_avg, 3.5)
+
+
+class ReviewBatchTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.kiosk = User.objects.create_user("kiosk", password="pw")
+        self.products = [
+            Product.objects.create(owner=self.farmer, title=f"Crop {i}", price="10.00") for i in range(6)
+        ]
+        self.url = reverse("marketplace:review_batch_api")
+        self.client.force_login(self.kiosk)
+
+    def post(self, items):
+        return self.client.post(self.url, items, content_type="application/json")
+
+    def test_upserts_with_per_item_results(self):
+        first, second = self.products[:2]
+        Review.objects.create(product=first, user=self.kiosk, rating=2, comment="meh")
+        response = self.post({"reviews": [
+            {"product": first.pk, "rating": 4, "comment": "better now"},
+            {"product": second.pk, "rating": 1, "comment": "first try"},
+            {"product": second.pk, "rating": 5, "comment": "changed my mind"},
+            {"product": 999999, "rating": 5, "comment": "ghost"},
+            {"product": second.pk, "rating": 9},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r["status"] for r in data["results"]],
+                         ["updated", "superseded", "created", "invalid", "invalid"])
+        self.assertEqual((data["created"], data["updated"], data["invalid"]), (1, 1, 2))
+        self.assertEqual(set(data["results"][4]["errors"]), {"rating", "comment"})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.rating_sum, first.rating_count, first.rating_2, first.rating_4), (4, 1, 0, 1))
+        self.assertEqual((second.rating_sum, second.rating_count, second.rating_5), (5, 1, 1))
+
+        again = self.post([{"product": first.pk, "rating": 4, "comment": "better now"}]).json()
+        self.assertEqual(again["results"][0]["status"], "unchanged")
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        Review.objects.create(product=self.products[0], user=self.kiosk, rating=3, comment="ok")
+        with self.assertNumQueries(11) as small:  # session + user + 9 for the batch
+            self.post([{"product": p.pk, "rating": 5, "comment": "x"} for p in self.products[:2]])
+        Review.objects.filter(user=self.kiosk).delete()
+        Review.objects.create(product=self.products[0], user=self.kiosk, rating=3, comment="ok")
+        with self.assertNumQueries(len(small)):
+            self.post([{"product": p.pk, "rating": 5, "comment": "x"} for p in self.products])
+
+    def test_created_keys_are_read_back_where_bulk_insert_returns_none(self):
+        with patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            data = self.post([{"product": p.pk, "rating": 4, "comment": "x"} for p in self.products[:3]]).json()
+        reviews = dict(Review.objects.filter(user=self.kiosk).values_list("product_id", "pk"))
+        self.assertEqual([r["review"] for r in data["results"]], [reviews[p.pk] for p in self.products[:3]])
+
+    def test_rejects_oversized_or_malformed_batches(self):
+        self.assertEqual(self.post({"reviews": "nope"}).status_code, 400)
+        too_many = [{"product": 1, "rating": 5, "comment": "x"}] * (review_batch.MAX_ITEMS + 1)
+        self.assertEqual(self.post(too_many).status_code, 400)
+
+    def test_single_review_api_resubmission_edits(self):
+        url = reverse("marketplace:add_review_api", args=[self.products[0].pk])
+        self.assertEqual(self.client.post(url, {"rating": 5, "comment": "great"}).status_code, 201)
+        self.assertEqual(self.client.post(url, {"rating": 2, "comment": "worse"}).status_code, 200)
+        self.products[0].refresh_from_db()
+        self.assertEqual((self.products[0].rating_sum, self.products[0].rating_count), (2, 1))
+
+
+class ProductListQueryBudgetTests(TestCase):
+    # session + user lookups, COUNT(*), the product page, the prefetched reviews
+    QUERY_BUDGET = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user("farmer", password="pw")
+        buyers = [User.objects.create_user(f"buyer{i}", password="pw") for i in range(3)]
+        for i in range(60):
+            product = Product.objects.create(owner=cls.farmer, title=f"Crop {i}", price="10.00")
+            for buyer in buyers:
+                Review.objects.create(product=product, user=buyer, rating=4, comment="fine")
+
+    def setUp(self):
+        self.client.force_login(self.farmer)
+
+    def _count_queries(self, url_name, page_size):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f"marketplace:{url_name}"), {"page_size": page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), page_size)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant_in_page_size(self):
+        for url_name in ("product_list_api", "home_api", "product_search_api"):
+            with self.subTest(url_name=url_name):
+                small = self._count_queries(url_name, 5)
+                large = self._count_queries(url_name, 50)
+                self.assertEqual(small, large)
+                self.assertLessEqual(large, self.QUERY_BUDGET)
+
+    def test_paginated_payload(self):
+        data = self.client.get(reverse("marketplace:product_list_api")).json()
+        self.assertNotIn("count", data)
+        self.assertIsNotNone(data["next"])
+        self.assertEqual(data["results"][0]["rating_count"], 3)
+        self.assertEqual(len(data["results"][0]["reviews"]), 3)
+
+    def test_cursor_walk_and_deep_page_cost(self):
+        # half the products share one timestamp, so the id tie-break matters
+        Product.objects.filter(pk__in=Product.objects.order_by("pk").values("pk")[:30]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        url, seen, costs = reverse("marketplace:product_list_api") + "?page_size=7", [], []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url).json()
+            costs.append(len(ctx.captured_queries))
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        expected = list(Product.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(set(costs[1:])), 1)
+
+        response = self.client.get(reverse("marketplace:product_list_api"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_html_shelf_and_dashboard_pages(self):
+        Profile.objects.create(user=self.farmer, role="FARMER")
+        first = self.client.get(reverse("farmers:dashboard"))
+        second = self.client.get(reverse("farmers:dashboard"), {"after": first.context["next_cursor"]})
+        titles = [p.title for p in first.context["products"]] + [p.title for p in second.context["products"]]
+        self.assertEqual(len(set(titles)), 48)
+
+        home = self.client.get(reverse("marketplace:home"))
+        older = self.client.get(reverse("marketplace:home"), {"after": home.context["next_cursor"]})
+        self.assertEqual(older.context["products"][0].title, "Crop 47")
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.tomato = Product.objects.create(owner=self.farmer, title="Fresh Tomatoes", price="40.00")
+        self.sauce = Product.objects.create(
+            owner=self.farmer, title="Chili sauce", price="90.00", description="made with tomato and chili"
+        )
+        self.rice = Product.objects.create(owner=self.farmer, title="Miniket rice", price="70.00")
+
+    def test_tokenize_normalizes(self):
+        self.assertEqual(search.tokenize("Fresh TOMATOES, berries!"), ["fresh", "tomato", "berry"])
+        self.assertEqual(search.tokenize("টমেটো ১কেজি"), ["টমেটো", "১কেজি"])
+
+    def test_title_match_ranks_above_description_match(self):
+        self.assertEqual(search.search("tomato"), [self.tomato.pk, self.sauce.pk])
+        self.assertEqual(search.search("tom"), [self.tomato.pk, self.sauce.pk])
+        self.assertEqual(search.search("potato"), [])
+
+    def test_index_follows_saves(self):
+        self.rice.title = "Tomato rice"
+        self.rice.save()
+        self.assertIn(self.rice.pk, search.search("tomato"))
+
+        self.tomato.active = False
+        self.tomato.save()
+        self.assertNotIn(self.tomato.pk, search.search("tomato"))
+
+        self.sauce.delete()
+        self.assertEqual(search.search("chili"), [])
+
+    def test_stats_row_follows_the_index(self):
+        self.assertEqual(search.corpus_stats(), search.recount_stats())
+        self.rice.description = "long grain, parboiled"
+        self.rice.save()
+        self.tomato.active = False
+        self.tomato.save()
+        self.sauce.delete()
+        created = Product.objects.bulk_create([Product(owner=self.farmer, title="Red lentil", price="95.00")])
+        search.index_new_products(created)
+        expected = search.corpus_stats()
+        self.assertEqual(expected, search.recount_stats())
+        self.assertEqual(expected[0], 2)
+
+        # a query reads the stats row and its postings, however large the corpus
+        with self.assertNumQueries(2):
+            search.search("lentil")
+
+    def test_price_only_save_keeps_postings(self):
+        product = Product.objects.get(pk=self.tomato.pk)
+        product.price = "45.00"
+        with CaptureQueriesContext(connection) as ctx:
+            product.save()
+        self.assertFalse([q for q in ctx.captured_queries if "marketplace_search" in q["sql"]])
+
+        product.title = "Cherry tomatoes"
+        product.save()
+        self.assertEqual(search.search("cherry"), [product.pk])
+
+    def test_rebuild_command(self):
+        SearchDocument.objects.all().delete()
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(search.corpus_stats()[0], 3)
+        self.assertEqual(search.search("rice"), [self.rice.pk])
+
+    def test_entry_points_use_index(self):
+        self.client.force_login(self.farmer)
+        for url_name in ("home_api", "product_search_api"):
+            data = self.client.get(reverse(f"marketplace:{url_name}"), {"q": "tomatoes"}).json()
+            self.assertEqual([p["id"] for p in data["results"]], [self.tomato.pk, self.sauce.pk])
+        response = self.client.get(reverse("marketplace:home"), {"q": "tomatoes"})
+        self.assertEqual(list(response.context["products"]), [self.tomato, self.sauce])
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Potato", price="30.00")
+
+    def test_price_changes_are_recorded_and_rolled_up(self):
+        product = Product.objects.get(pk=self.product.pk)
+        for price in ("35.00", "35.00", "25.00", "28.00"):
+            product.price = Decimal(price)
+            product.save()
+
+        # unchanged saves do not append observations
+        self.assertEqual(
+            list(PriceObservation.objects.filter(product=product).values_list("price", flat=True)),
+            [Decimal("30.00"), Decimal("35.00"), Decimal("25.00"), Decimal("28.00")],
+        )
+        for resolution in ("day", "week", "month"):
+            rollup = PriceRollup.objects.get(product=product, resolution=resolution)
+            self.assertEqual(
+                (rollup.open, rollup.high, rollup.low, rollup.close, rollup.observations),
+                (Decimal("30.00"), Decimal("35.00"), Decimal("25.00"), Decimal("28.00"), 4),
+            )
+
+    def test_rollups_split_by_period_and_rebuild_matches(self):
+        start = timezone.now() - timedelta(days=40)
+        for offset, price in enumerate(("10.00", "12.00", "11.00")):
+            prices.record_price(self.product, price, observed_at=start + timedelta(days=offset * 20))
+        incremental = list(PriceRollup.objects.order_by("resolution", "period_start").values_list(
+            "resolution", "period_start", "open", "high", "low", "close", "observations"))
+
+        call_command("rebuild_price_rollups", stdout=StringIO())
+        rebuilt = list(PriceRollup.objects.order_by("resolution", "period_start").values_list(
+            "resolution", "period_start", "open", "high", "low", "close", "observations"))
+        self.assertEqual(incremental, rebuilt)
+        # creation price and the last observation share today's bucket
+        self.assertEqual(prices.price_history(self.product.pk, "day").count(), 3)
+
+    def test_history_api(self):
+        self.client.force_login(self.farmer)
+        url = reverse("marketplace:product_price_history_api", args=[self.product.pk])
+        data = self.client.get(url, {"resolution": "month"}).json()
+        self.assertEqual(data["series"][0]["close"], "30.00")
+        self.assertEqual(self.client.get(url, {"resolution": "hour"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "yesterday"}).status_code, 400)
+
+
+class PriceAnalyticsTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.a = Product.objects.create(owner=self.farmer, title="Red onion", price="10.00")
+        self.b = Product.objects.create(owner=self.farmer, title="White onion", price="20.00")
+        start = timezone.now() - timedelta(days=5)
+        for day, price in enumerate(("11.00", "12.00", "13.00", "14.00")):
+            prices.record_price(self.a, price, observed_at=start + timedelta(days=day))
+
+    def test_vectorized_stats(self):
+        matrix = np.array([[np.nan, 10.0, np.nan, 12.0], [4.0, 5.0, 6.0, 8.0]])
+        result = analytics.compute(matrix, window=2)
+        np.testing.assert_allclose(result["close"][0, 1:], [10.0, 10.0, 12.0])
+        np.testing.assert_allclose(result["moving_average"][1, 1:], [4.5, 5.5, 7.0])
+        np.testing.assert_allclose(result["pct_change"][1, 1:], [25.0, 20.0, 100.0 / 3])
+        np.testing.assert_allclose(
+            result["summary"]["percentiles"][1], np.percentile([4.0, 5.0, 6.0, 8.0], analytics.PERCENTILES)
+        )
+        self.assertEqual(result["summary"]["change_pct"][1], 100.0)
+
+    def test_analytics_api_many_series(self):
+        self.client.force_login(self.farmer)
+        data = self.client.get(reverse("marketplace:price_analytics_api"), {"q": "onion", "window": 2}).json()
+        self.assertEqual(len(data["periods"]), 5)
+        by_product = {s["product"]: s for s in data["series"]}
+        self.assertEqual(by_product[self.a.pk]["summary"]["last"], 10.0)
+        self.assertEqual(by_product[self.b.pk]["close"][:4], [None] * 4)
+        self.assertEqual(by_product[self.b.pk]["summary"]["last"], 20.0)
+        bad = self.client.get(reverse("marketplace:price_analytics_api"), {"products": "x"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_crop_query_selects_classified_listings(self):
+        # mentions onion but is a garlic listing
+        garlic = Product.objects.create(owner=self.farmer, title="Garlic", price="90.00", description="pairs with onion")
+        url = reverse("marketplace:price_analytics_api")
+        series = self.client.get(url, {"q": "Onions"}).json()["series"]
+        self.assertEqual({s["product"] for s in series}, {self.a.pk, self.b.pk})
+        # text naming no crop still searches the listings
+        series = self.client.get(url, {"q": "pairs"}).json()["series"]
+        self.assertEqual([s["product"] for s in series], [garlic.pk])
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.tomato = Product.objects.create(owner=self.farmer, title="Tomato", price="40.00", description="red, ripe")
+        Product.objects.create(owner=self.farmer, title="Hidden", price="1.00", active=False)
+        Review.objects.create(product=self.tomato, user=self.farmer, rating=4)
+
+    def test_ndjson_stream(self):
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse("marketplace:catalog_export_api"), {"ratings": "1", "owner": "1"})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["price"], "40.00")
+        self.assertEqual((rows[0]["rating_avg"], rows[0]["rating_count"]), (4.0, 1))
+        self.assertEqual(rows[0]["owner_username"], "farmer")
+
+    def test_csv_command(self):
+        out = StringIO()
+        call_command("export_catalog", "--format", "csv", stdout=out)
+        self.assertNotIn("\r\n\n", out.getvalue())
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0], export.BASE_FIELDS)
+        self.assertEqual(rows[1][1:4], ["Tomato", "40.00", "red, ripe"])
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        Profile.objects.create(user=self.farmer, role="FARMER")
+
+    def test_csv_rows_are_validated_and_batched(self):
+        data = "title,price,description,active\nTomato,40,red,yes\n,10,,\nRice,abc,,\nOnion,25.50,,0\n"
+        with CaptureQueriesContext(connection) as ctx:
+            result = bulk_import.import_products(BytesIO(data.encode()), self.farmer, "csv", batch_size=500)
+        self.assertEqual((result["rows"], result["created"], result["error_count"]), (4, 2, 2))
+        self.assertEqual([e["row"] for e in result["errors"]], [2, 3])
+        self.assertIn("title", result["errors"][0]["errors"])
+        self.assertIn("price", result["errors"][1]["errors"])
+        # one batch: products, search documents/postings, observations, rollups, price board, alerts (+ savepoints)
+        self.assertLess(len(ctx.captured_queries), 16)
+
+        onion = Product.objects.get(title="Onion")
+        self.assertFalse(onion.active)
+        self.assertEqual(onion.owner, self.farmer)
+        self.assertEqual(search.search("tomato"), [Product.objects.get(title="Tomato").pk])
+        self.assertEqual(PriceRollup.objects.filter(product=onion).count(), 3)
+
+    def test_json_array_spanning_read_buffer(self):
+        rows = [{"title": f"Crop {i}", "price": 10 + i, "description": "x" * 200} for i in range(1200)]
+        with patch.object(bulk_import, "_JSON_READ_SIZE", 1024):
+            result = bulk_import.import_products(BytesIO(json.dumps(rows).encode()), self.farmer, "json", 500)
+        self.assertEqual((result["created"], result["error_count"]), (1200, 0))
+
+    def test_batch_fans_out_like_post_save(self):
+        below = PriceAlert.objects.create(user=self.farmer, crop="tomato", threshold="45.00")
+        above = PriceAlert.objects.create(user=self.farmer, crop="tomato", threshold="90.00", direction=PriceAlert.ABOVE)
+        directory.letter_index()
+        data = b"title,price\nTomatoes,40\nCherry tomato,60\n"
+        with patch.object(ticker.LocalBroker, "publish") as publish, self.captureOnCommitCallbacks(execute=True):
+            bulk_import.import_products(BytesIO(data), self.farmer, "csv")
+        below.refresh_from_db()
+        above.refresh_from_db()
+        self.assertEqual((below.active, below.triggered_price), (False, Decimal("40.00")))
+        self.assertTrue(above.active)
+        self.assertEqual(sorted(call.args[0]["title"] for call in publish.call_args_list), ["Cherry tomato", "Tomatoes"])
+        self.assertEqual(directory.letter_index()["F"]["products"], 2)
+
+    def test_keys_are_read_back_where_bulk_insert_returns_none(self):
+        # e.g. MySQL; a listing the farmer adds meanwhile is not taken for an imported one
+        Product.objects.create(owner=self.farmer, title="Tomato", price="40.00", description="")
+        data = b"title,price\nTomato,40\nTomato,40\nOnion,25.5\n"
+        with patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            result = bulk_import.import_products(BytesIO(data), self.farmer, "csv")
+        self.assertEqual(result["created"], 3)
+        self.assertEqual(SearchDocument.objects.count(), 4)
+        self.assertEqual(PriceObservation.objects.filter(product__title="Tomato").count(), 3)
+        self.assertEqual(search.search("onion"), [Product.objects.get(title="Onion").pk])
+
+    def test_malformed_json_object_fails_fast(self):
+        data = b'[{"title": "Garlic", "price": "90"}, {"title": "Bad' + b"x" * 5000 + b"]"
+        with patch.object(bulk_import, "_JSON_READ_SIZE", 1024), patch.object(bulk_import, "MAX_JSON_OBJECT_SIZE", 2048):
+            result = bulk_import.import_products(BytesIO(data), self.farmer, "json")
+        self.assertEqual((result["created"], result["error_count"]), (1, 1))
+        self.assertIn("longer than 2048", result["errors"][0]["errors"]["__all__"][0])
+
+    def test_api_upload(self):
+        self.client.force_login(self.farmer)
+        upload = SimpleUploadedFile("crops.jsonl", b'{"title": "Garlic", "price": "90"}\n{"title": "Bad"}\n')
+        response = self.client.post(reverse("marketplace:product_import_api"), {"file": upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(response.json()["errors"][0]["row"], 2)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.farmer = User.objects.create_user("farmer", password="pw")
+
+    def _png(self, width, height):
+        buf = BytesIO()
+        Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(buf, "PNG")
+        return SimpleUploadedFile("crop.png", buf.getvalue(), content_type="image/png")
+
+    def test_upload_queues_work_after_commit_and_worker_records_widths(self):
+        with patch.object(images, "_get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(
+                    owner=self.farmer, title="Brinjal", price="30.00", image=self._png(900, 600)
+                )
+        executor.return_value.submit.assert_called_once_with(
+            images._process, Product, product.pk, "image", "image_widths"
+        )
+
+        self.assertEqual(images.build(Product, product.pk, "image", "image_widths"), [320, 640, 900])
+        product.refresh_from_db()
+        self.assertEqual(product.image_widths, [320, 640, 900])
+        for ext in images.FORMATS:
+            with Image.open(os.path.join(self.media.name, images.derivative_name(product.image.name, 640, ext))) as im:
+                self.assertEqual(im.size, (640, 427))
+
+        html = Template("{% load responsive_images %}{% picture p.image p.image_widths alt=p.title %}").render(
+            Context({"p": product})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("_900.webp 900w", html)
+        self.assertIn("_320.jpg 320w", html)
+
+    def test_no_image_renders_no_img(self):
+        product = Product.objects.create(owner=self.farmer, title="Okra", price="20.00")
+        html = Template("{% load responsive_images %}{% picture p.image p.image_widths alt=p.title %}").render(
+            Context({"p": product})
+        )
+        self.assertEqual(html, "")
+        self.assertNotIn("default-product", self.client.get(reverse("marketplace:home")).content.decode())
+
+    def test_replacing_image_clears_recorded_widths(self):
+        with patch.object(images, "_get_executor"):
+            product = Product.objects.create(owner=self.farmer, title="Gourd", price="20.00", image=self._png(100, 100))
+            images.build(Product, product.pk, "image", "image_widths")
+            product = Product.objects.get(pk=product.pk)
+            self.assertEqual(product.image_widths, [100])
+            product.image = self._png(50, 50)
+            product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).image_widths, [])
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.rice = Product.objects.create(owner=self.farmer, title="Rice", price="12.10")
+        self.dal = Product.objects.create(owner=self.farmer, title="Dal", price="0.10")
+        self.client.force_login(self.buyer)
+
+    def test_html_api_and_dashboard_share_decimal_totals(self):
+        self.client.post(reverse("marketplace:add_to_cart", args=[self.rice.pk]), {"qty": 3})
+        response = self.client.post(reverse("marketplace:add_to_cart_api", args=[self.dal.pk]), {"qty": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total"], "36.60")
+        self.assertEqual(response.json()["count"], 6)
+
+        self.assertEqual(self.client.get(reverse("marketplace:view_cart")).context["total"], Decimal("36.60"))
+        dashboard = self.client.get(reverse("accounts:customer_dashboard"))
+        self.assertEqual(dashboard.context["cart_total"], Decimal("36.60"))
+
+        response = self.client.put(
+            reverse("marketplace:cart_item_api", args=[self.rice.pk]), {"qty": 1}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["total"], "12.40")
+
+    def test_stale_and_inactive_lines_are_dropped(self):
+        session = self.client.session
+        session["cart"] = {str(self.rice.pk): 2, str(self.dal.pk): 1, "999": 1, "junk": "x"}
+        session.save()
+        Product.objects.filter(pk=self.dal.pk).update(active=False)
+
+        c = cart.Cart(self.client.session)
+        with self.assertNumQueries(1):
+            summary = c.summary()
+        self.assertEqual([line["product"] for line in summary["lines"]], [self.rice])
+        response = self.client.get(reverse("marketplace:cart_api"))
+        self.assertEqual(len(response.json()["lines"]), 1)
+        self.assertEqual(self.client.session["cart"], {str(self.rice.pk): 2})
+
+    def test_cart_in_an_old_format_is_replaced(self):
+        session = self.client.session
+        session["cart"] = [self.rice.pk]
+        c = cart.Cart(session)
+        self.assertEqual((len(c), session["cart"], session.modified), (0, {}, True))
+
+    def test_add_rejects_own_product(self):
+        self.client.force_login(self.farmer)
+        response = self.client.post(reverse("marketplace:add_to_cart_api", args=[self.rice.pk]))
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("cart", self.client.session)
+
+    def test_query_count_is_constant_in_cart_size(self):
+        products = [Product.objects.create(owner=self.farmer, title=f"P{i}", price="1.00") for i in range(50)]
+        session = self.client.session
+        for size in (1, 50):
+            c = cart.Cart(session)
+            c.clear()
+            for product in products[:size]:
+                c.add(product)
+            with self.assertNumQueries(1):
+                self.assertEqual(c.summary()["count"], size)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Mustard oil", price="220.00")
+
+    def test_home_shelf_served_from_cache_until_catalog_changes(self):
+        url = reverse("marketplace:home")
+        self.assertContains(self.client.get(url), "Mustard oil")
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), "Mustard oil")
+
+        self.product.title = "Cold-pressed mustard oil"
+        self.product.save()
+        self.assertContains(self.client.get(url), "Cold-pressed mustard oil")
+
+        before = catalog_cache.version()
+        Review.objects.create(product=self.product, user=self.farmer, rating=5)
+        self.assertGreater(catalog_cache.version(), before)
+
+    def test_lost_version_key_does_not_reuse_old_entries(self):
+        old = catalog_cache.version()
+        cache.delete(catalog_cache.VERSION_KEY)
+        self.assertGreater(catalog_cache.version(), old)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Honey", price="450.00")
+        self.client.force_login(self.buyer)
+        self.api_url = reverse("marketplace:product_detail_api", args=[self.product.pk])
+
+    def test_api_304_after_one_query_until_review_edit(self):
+        first = self.client.get(self.api_url)
+        etag, last_modified = first["ETag"], first["Last-Modified"]
+
+        self.client.get(self.api_url)  # session/user lookups are cached by now
+        with CaptureQueriesContext(connection) as ctx, patch.object(ProductSerializer, "to_representation") as ser:
+            response = self.client.get(self.api_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        ser.assert_not_called()
+        self.assertEqual(sum("marketplace_product" in q["sql"] for q in ctx.captured_queries), 1)
+        self.assertEqual(self.client.get(self.api_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        review = Review.objects.create(product=self.product, user=self.buyer, rating=4, comment="ok")
+        response = self.client.get(self.api_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        review.comment = "great"
+        review.save()
+        self.assertEqual(self.client.get(self.api_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_etag_varies_with_viewer_and_cart(self):
+        url = reverse("marketplace:product_detail", args=[self.product.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse("marketplace:add_to_cart", args=[self.product.pk]))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.force_login(self.farmer)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse("marketplace:product_detail", args=[999])).status_code, 404)
+
+
+class WishlistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.products = [
+            Product.objects.create(owner=self.farmer, title=f"Guava {i}", price="30.00") for i in range(5)
+        ]
+        self.client.force_login(self.buyer)
+
+    def test_add_is_idempotent_and_single_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(wishlist.add(self.buyer, self.products[0]))
+        self.assertEqual(sum(q["sql"].startswith("INSERT") for q in ctx.captured_queries), 1)
+        self.assertFalse(wishlist.add(self.buyer, self.products[0]))
+        self.assertEqual(Wishlist.objects.filter(user=self.buyer).count(), 1)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(wishlist.remove(self.buyer, self.products[0].pk))
+        self.assertFalse(wishlist.remove(self.buyer, self.products[0].pk))
+
+    def test_membership_is_one_cached_query(self):
+        wishlist.add(self.buyer, self.products[1])
+        with self.assertNumQueries(1):
+            self.assertEqual(wishlist.wishlisted(self.buyer, self.products), {self.products[1].pk})
+        with self.assertNumQueries(0):
+            wishlist.wishlisted(self.buyer, self.products)
+        self.client.post(reverse("marketplace:add_to_wishlist", args=[self.products[2].pk]))
+        self.assertEqual(
+            self.client.get(reverse("marketplace:home")).context["wishlisted"],
+            {self.products[1].pk, self.products[2].pk},
+        )
+
+    def test_wishlist_page_query_count_is_constant(self):
+        wishlist.add(self.buyer, self.products[0])
+        url = reverse("marketplace:wishlist_view")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for product in self.products[1:]:
+            wishlist.add(self.buyer, product)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertContains(response, "Guava 4")
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        for i in range(30):
+            product = Product.objects.create(owner=self.farmer, title=f"Lentil {i}", price="95.00")
+        Review.objects.create(product=product, user=self.buyer, rating=5, comment="good")
+        self.product = product
+        self.client.force_login(self.buyer)
+
+    def _same_payload(self, sync_url, async_url, params=None):
+        sync, async_ = self.client.get(sync_url, params), self.client.get(async_url, params)
+        self.assertEqual((sync.status_code, async_.status_code), (200, 200))
+        # identical apart from the pagination links pointing at their own path
+        self.assertEqual(sync.json(), json.loads(async_.content.decode().replace("/api/async/", "/api/")))
+        return sync, async_
+
+    def test_payloads_match_sync_endpoints(self):
+        next_url = self._same_payload("/api/products/", "/api/async/products/", {"page_size": 7})[1].json()["next"]
+        self.assertIn("/api/async/products/", next_url)
+        self._same_payload("/api/home/", "/api/async/home/", {"q": "lentil"})
+        self._same_payload("/api/products/search/", "/api/async/products/search/")
+
+        sync, async_ = self._same_payload(f"/api/products/{self.product.pk}/", f"/api/async/products/{self.product.pk}/")
+        self.assertEqual(sync["ETag"], async_["ETag"])
+        self.assertEqual(len(async_.json()["reviews"]), 1)
+
+    def test_detail_conditional_and_errors(self):
+        url = f"/api/async/products/{self.product.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get("/api/async/products/99999/").status_code, 404)
+        self.assertEqual(self.client.get("/api/async/products/", {"cursor": "bogus"}).status_code, 404)
+
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/async/home/").status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TestCase):
+    """
+    Routing decisions only; no replica alias is configured in the test database.
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def run_request(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen["before"] = self.router.db_for_read(Product)
+            if write:
+                self.router.db_for_write(Product)
+                seen["after"] = self.router.db_for_read(Product)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_methods_read_a_replica_and_writes_do_not(self):
+        self.assertEqual(self.run_request(self.factory.get("/"))[0]["before"], "replica1")
+        self.assertIsNone(self.run_request(self.factory.post("/"))[0]["before"])
+        self.assertIn(self.router.db_for_read(Product), (None, "default"))  # outside a request
+
+    def test_write_pins_the_client_to_the_primary(self):
+        seen, response = self.run_request(self.factory.get("/"), write=True)
+        self.assertEqual(seen["after"], "default")
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        request = self.factory.get("/")
+        request.COOKIES[replicas.PIN_COOKIE] = response.cookies[replicas.PIN_COOKIE].value
+        self.assertIsNone(self.run_request(request)[0]["before"])
+
+        request.COOKIES[replicas.PIN_COOKIE] = "0"  # expired
+        self.assertEqual(self.run_request(request)[0]["before"], "replica1")
+
+    def test_shared_caches_are_filled_from_the_primary(self):
+        # "replica1" is not a configured connection here, so a routed read would fail
+        cache.clear()
+        seen = {}
+
+        def view(request):
+            seen["alias"] = self.router.db_for_read(Product)
+            catalog_cache.latest_products()
+            price_board.board()
+            crops.invalidate()
+            crops.index()
+            directory.letter_index()
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get("/"))
+        self.assertEqual(seen["alias"], "replica1")
+
+    def test_async_stack_runs_without_a_thread_hop(self):
+        seen = {}
+
+        async def view(request):
+            seen["before"] = self.router.db_for_read(Product)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(self.factory.get("/"))
+        self.assertEqual(seen["before"], "replica1")
+        self.assertIsNone(replicas._read_alias.get())
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "marketplace"))
+        self.assertTrue(self.router.allow_migrate("default", "marketplace"))
+
+
+class PriceAlertTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        Profile.objects.create(user=self.farmer, role="FARMER")
+        self.product = Product.objects.create(owner=self.farmer, title="Fresh Tomatoes", price="60.00")
+
+    def alert(self, **kwargs):
+        return PriceAlert.objects.create(user=self.buyer, **kwargs)
+
+    def reprice(self, price):
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = price
+        product.save()
+
+    def test_only_crossed_thresholds_fire(self):
+        below_50 = self.alert(product=self.product, threshold="50.00")
+        below_40 = self.alert(product=self.product, threshold="40.00")
+        above_70 = self.alert(product=self.product, threshold="70.00", direction=PriceAlert.ABOVE)
+        crop = self.alert(crop="tomato", threshold="55.00")
+        other_crop = self.alert(crop="onion", threshold="100.00")
+
+        self.reprice("52.00")
+        crop.refresh_from_db()
+        self.assertEqual((crop.active, crop.triggered_price, crop.triggered_product), (False, Decimal("52.00"), self.product))
+        self.assertEqual(PriceAlert.objects.filter(active=True).count(), 4)
+
+        self.reprice("50.00")
+        below_50.refresh_from_db()
+        self.assertFalse(below_50.active)
+        self.assertEqual(set(PriceAlert.objects.filter(active=True)), {below_40, above_70, other_crop})
+
+        self.reprice("75.00")
+        self.assertEqual(set(PriceAlert.objects.filter(active=True)), {below_40, other_crop})
+
+    def test_new_listing_matches_crop_alerts(self):
+        alert = self.alert(crop="okra", threshold="30.00")
+        Product.objects.create(owner=self.farmer, title="Green okra", price="25.00")
+        alert.refresh_from_db()
+        self.assertFalse(alert.active)
+
+    def test_crop_alerts_match_the_catalog_crop(self):
+        alert = self.alert(crop=alerts.normalize_crop("টমেটো"), threshold="30.00")
+        self.assertEqual(alert.crop, "tomato")
+        # "Cherry" is not a crop; the listing is a tomato listing all the same
+        listing = Product.objects.create(owner=self.farmer, title="Cherry টমেটো", price="28.00")
+        alert.refresh_from_db()
+        self.assertEqual((alert.active, alert.triggered_product), (False, listing))
+
+    def test_relisting_at_the_same_price_meets_alerts(self):
+        Product.objects.filter(pk=self.product.pk).update(active=False)
+        alert = self.alert(product=self.product, threshold="65.00")
+        product = Product.objects.get(pk=self.product.pk)
+        product.active = True
+        product.save()
+        alert.refresh_from_db()
+        self.assertEqual((alert.active, alert.triggered_price), (False, Decimal("60.00")))
+
+    def test_reclassified_listing_meets_crop_alerts(self):
+        alert = self.alert(crop="onion", threshold="70.00")
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = "Red onions"
+        product.save()
+        alert.refresh_from_db()
+        self.assertEqual((alert.active, alert.triggered_product), (False, self.product))
+
+    def test_farmer_edit_form_triggers_alerts(self):
+        alert = self.alert(product=self.product, threshold="45.00")
+        self.client.force_login(self.farmer)
+        self.client.post(reverse("farmers:product_update", args=[self.product.pk]),
+                         {"title": "Fresh Tomatoes", "price": "44.00", "description": "", "active": "on"})
+        alert.refresh_from_db()
+        self.assertEqual(alert.triggered_price, Decimal("44.00"))
+
+    def test_matching_is_an_indexed_range_query(self):
+        with self.assertNumQueries(1):
+            list(alerts.matching(self.product, Decimal("60.00"), Decimal("50.00")))
+
+    def test_api_create_validate_and_rearm(self):
+        self.client.force_login(self.buyer)
+        url = reverse("marketplace:price_alert_list_api")
+        self.assertEqual(self.client.post(url, {"threshold": "10"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"crop": "red onion", "threshold": "10"}).status_code, 400)
+        response = self.client.post(url, {"crop": "Tomatoes", "threshold": "59.00"})
+        self.assertEqual((response.status_code, response.json()["crop"]), (201, "tomato"))
+
+        self.reprice("58.00")
+        data = self.client.get(url, {"triggered": "1"}).json()
+        self.assertEqual([(a["active"], a["triggered_price"]) for a in data], [(False, "58.00")])
+
+        # re-armed once the price is back above the threshold, so it stays armed
+        self.reprice("65.00")
+        detail = reverse("marketplace:price_alert_detail_api", args=[data[0]["id"]])
+        rearmed = self.client.patch(detail, {"active": True}, content_type="application/json").json()
+        self.assertEqual((rearmed["active"], rearmed["triggered_at"]), (True, None))
+
+    def test_alert_already_met_fires_when_saved(self):
+        cheaper = Product.objects.create(owner=self.farmer, title="Tomato", price="55.00")
+        self.client.force_login(self.buyer)
+        url = reverse("marketplace:price_alert_list_api")
+        created = self.client.post(url, {"crop": "tomato", "threshold": "58.00"}).json()
+        self.assertEqual((created["active"], created["triggered_price"], created["triggered_product"]),
+                         (False, "55.00", cheaper.pk))
+        # not met: stays armed until a price crosses it
+        above = self.client.post(url, {"product": self.product.pk, "direction": "above", "threshold": "61.00"}).json()
+        self.assertTrue(above["active"])
+
+        detail = reverse("marketplace:price_alert_detail_api", args=[above["id"]])
+        moved = self.client.patch(detail, {"threshold": "60.00"}, content_type="application/json").json()
+        self.assertEqual((moved["active"], moved["triggered_price"]), (False, "60.00"))
+        rearmed = self.client.patch(detail, {"active": True}, content_type="application/json").json()
+        self.assertEqual((rearmed["active"], rearmed["triggered_product"]), (False, self.product.pk))
+
+
+class PriceBoardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.listings = [
+            Product.objects.create(owner=self.farmer, title="Tomatoes", price=price)
+            for price in ("40.00", "50.00", "50.00", "80.00")
+        ]
+
+    def row(self, crop="tomato"):
+        return CropPrice.objects.filter(crop__slug=crop).values_list(
+            "listings", "min_price", "median_price", "max_price", "mean_price"
+        ).first()
+
+    def test_listings_move_the_board_incrementally(self):
+        self.assertEqual(self.row(), (4, Decimal("40.00"), Decimal("50.00"), Decimal("80.00"), Decimal("55.00")))
+
+        cheap = Product.objects.get(pk=self.listings[0].pk)
+        cheap.price = "90.00"
+        cheap.save()
+        self.assertEqual(self.row(), (4, Decimal("50.00"), Decimal("65.00"), Decimal("90.00"), Decimal("67.50")))
+
+        Product.objects.get(pk=self.listings[3].pk).delete()
+        hidden = Product.objects.get(pk=self.listings[1].pk)
+        hidden.active = False
+        hidden.save()
+        self.assertEqual(self.row(), (2, Decimal("50.00"), Decimal("70.00"), Decimal("90.00"), Decimal("70.00")))
+
+        renamed = Product.objects.get(pk=self.listings[2].pk)
+        renamed.title = "Red onion"
+        renamed.save()
+        self.assertEqual(self.row(), (1, Decimal("90.00"), Decimal("90.00"), Decimal("90.00"), Decimal("90.00")))
+        self.assertEqual(self.row("onion")[0], 1)
+
+        cheap.delete()
+        self.assertIsNone(self.row())
+        self.assertFalse(CropPriceLevel.objects.filter(crop__slug="tomato").exists())
+
+    def test_repricing_does_not_scan_products(self):
+        for i in range(30):
+            Product.objects.create(owner=self.farmer, title="Tomato", price=10 + i)
+        product = Product.objects.get(pk=self.listings[0].pk)
+        product.price = "45.00"
+        with CaptureQueriesContext(connection) as ctx:
+            price_board.product_saved(product, created=False)
+        self.assertFalse([q for q in ctx.captured_queries if "marketplace_product" in q["sql"]])
+
+    def test_rebuild_and_bulk_paths_agree(self):
+        expected = self.row()
+        CropPrice.objects.all().delete()
+        CropPriceLevel.objects.all().delete()
+        call_command("rebuild_price_board", stdout=StringIO())
+        self.assertEqual(self.row(), expected)
+
+        tomato = Product(owner=self.farmer, title="Tomato", price="20.00")
+        created = Product.objects.bulk_create(crops.classify_products([tomato]))
+        price_board.add_products(created)
+        self.assertEqual(self.row(), (5, Decimal("20.00"), Decimal("50.00"), Decimal("80.00"), Decimal("48.00")))
+
+    def test_api_and_page(self):
+        url = reverse("marketplace:price_board_api")
+        response = self.client.get(url, {"crop": "Tomatoes"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["crops"][0]["median"], "50.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(url, {"order": "nope"}).status_code, 400)
+
+        # served from the cache until the catalog changes
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Product.objects.create(owner=self.farmer, title="Tomato", price="10.00")
+        self.assertEqual(self.client.get(url, {"crop": "tomato"}).json()["crops"][0]["listings"], 5)
+
+        page = self.client.get(reverse("marketplace:market_prices"), {"q": "টমেটো"})
+        self.assertContains(page, "৳50.00")
+
+
+class CropCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        Profile.objects.create(user=self.farmer, role="FARMER")
+        self.tomato = Crop.objects.get(slug="tomato")
+
+    def test_titles_match_catalog_crops(self):
+        for title in ("Tomatoes fresh (5 kg)", "টমেটো", "tomatto", "Organic tometo 2kg"):
+            self.assertEqual(crops.classify(title), self.tomato.pk, title)
+        self.assertEqual(crops.classify("Sweet potato"), Crop.objects.get(slug="sweet-potato").pk)
+        self.assertEqual(crops.classify("কাঁচা মরিচ"), Crop.objects.get(slug="chili").pk)
+        self.assertIsNone(crops.classify("Handmade basket"))
+
+    def test_confirmed_crop_is_kept(self):
+        product = Product.objects.create(owner=self.farmer, title="Tomato", price="40.00")
+        self.assertEqual(product.crop, self.tomato)
+
+        onion = Crop.objects.get(slug="onion")
+        product.crop, product.crop_confirmed = onion, True
+        product.save()
+        product.title = "Tomato and onion mix"
+        product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).crop, onion)
+
+    def test_catalog_changes_reach_the_index(self):
+        self.assertIsNone(crops.classify("Dragon fruit"))
+        Crop.objects.create(name="Dragon fruit", slug="dragon-fruit", aliases=["pitaya"])
+        self.assertEqual(crops.classify("fresh pitaya"), Crop.objects.get(slug="dragon-fruit").pk)
+
+    def test_bulk_import_and_backlog_command(self):
+        bulk_import.import_products(BytesIO(b"title,price\nTomatoes,40\n"), self.farmer, "csv")
+        self.assertEqual(Product.objects.get(title="Tomatoes").crop, self.tomato)
+
+        Product.objects.bulk_create([Product(owner=self.farmer, title="Red onion", price="30.00")])
+        out = StringIO()
+        call_command("classify_crops", stdout=out)
+        self.assertEqual(Product.objects.get(title="Red onion").crop.slug, "onion")
+        self.assertIn("changed 1.", out.getvalue())
+        self.assertEqual(CropPrice.objects.get(crop__slug="onion").listings, 1)
+
+    def test_suggest_api(self):
+        url = reverse("marketplace:crop_suggest_api")
+        suggestions = self.client.get(url, {"q": "potatos"}).json()["suggestions"]
+        self.assertEqual(suggestions[0]["slug"], "potato")
+        self.assertEqual(suggestions[0]["matched"], "potato")
+        self.assertEqual(self.client.get(url).json()["suggestions"], [])
+        self.assertEqual(self.client.get(url, {"q": "x", "limit": "many"}).status_code, 400)
+
+
+
+class EngagementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        engagement.counters.drain()
+        self.addCleanup(engagement.counters.drain)
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        Profile.objects.create(user=self.farmer, role="FARMER")
+        self.customer = User.objects.create_user("customer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Tomato", price="40.00")
+
+    def counts(self):
+        return ProductEngagement.objects.filter(product=self.product).values_list(
+            "day", "views", "cart_adds", "wishlist_adds"
+        ).get()
+
+    def test_hits_are_counted_in_memory_and_flushed_in_batches(self):
+        self.client.force_login(self.customer)
+        page = reverse("marketplace:product_detail", args=[self.product.pk])
+        etag = self.client.get(page)["ETag"]
+        # a revalidating client is still viewing the product
+        self.assertEqual(self.client.get(page, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.get(page)
+        self.client.post(reverse("marketplace:add_to_cart", args=[self.product.pk]), {"qty": 2})
+        self.client.post(reverse("marketplace:add_to_wishlist", args=[self.product.pk]))
+        self.assertFalse(ProductEngagement.objects.exists())
+
+        self.assertEqual(engagement.flush(), 1)
+        today = timezone.localdate()
+        self.assertEqual(self.counts(), (today, 3, 1, 1))
+
+        # existing rows get increments, not overwrites
+        for _ in range(2):
+            engagement.record(self.product.pk, "views")
+        engagement.record(self.product.pk + 1000, "views")  # deleted product: dropped
+        engagement.flush()
+        self.assertEqual(self.counts(), (today, 5, 1, 1))
+        self.assertEqual(ProductEngagement.objects.count(), 1)
+
+    @override_settings(ENGAGEMENT_FLUSH_SECONDS=0)
+    def test_no_flusher_when_disabled(self):
+        engagement.record(self.product.pk, "views")
+        self.assertIsNone(engagement._flusher)
+        self.assertEqual(len(engagement.counters), 1)
+
+    def test_failed_flush_keeps_counts(self):
+        engagement.record(self.product.pk, "views")
+        with patch.object(engagement, "write", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                engagement.flush()
+        self.assertEqual(len(engagement.counters), 1)
+        engagement.flush()
+        self.assertEqual(self.counts()[1], 1)
+
+    def test_dashboard_shows_daily_series(self):
+        today = timezone.localdate()
+        ProductEngagement.objects.create(product=self.product, day=today, views=7, cart_adds=2)
+        ProductEngagement.objects.create(product=self.product, day=today - timedelta(days=30), views=100)
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse("farmers:dashboard"))
+        stats = response.context["products"][0].engagement
+        self.assertEqual(len(stats["days"]), engagement.SERIES_DAYS)
+        self.assertEqual(stats["days"][-1], {"day": today, "views": 7, "cart_adds": 2, "wishlist_adds": 0})
+        self.assertEqual(stats["totals"], {"views": 7, "cart_adds": 2, "wishlist_adds": 0})
+        self.assertContains(response, "7 views")
+
+class PriceTickerTests(TransactionTestCase):
+    # committed rows, so on_commit publishing runs like in production; the
+    # crop catalog seeded by migrations is restored after each test's flush
+    serialized_rollback = True
+
+    def setUp(self):
+        self.farmer = User.objects.create_user("farmer", password="pw")
+        self.product = Product.objects.create(owner=self.farmer, title="Aromatic rice", price="80.00")
+
+    def event(self, pk, price, title="Aromatic rice"):
+        product = Product(pk=pk, title=title, price=Decimal(price), owner=self.farmer, crop_id=crops.classify(title))
+        return ticker.product_event(product)
+
+    async def test_fan_out_reaches_each_subscriber_once_with_the_latest_price(self):
+        subscriptions = [ticker.hub.open({"crop:rice"}) for _ in range(3000)]
+        both = ticker.hub.open({"crop:rice", f"product:{self.product.pk}"})
+        # published from another thread, as signal handlers are
+        await asyncio.get_running_loop().run_in_executor(None, lambda: [
+            ticker.hub.deliver(self.event(self.product.pk, price)) for price in ("79.00", "78.00", "77.00")
+        ])
+        for subscription in subscriptions + [both]:
+            batch = await subscription.next_batch(timeout=5)
+            self.assertEqual([json.loads(f.json)["price"] for f in batch], ["77.00"])
+            subscription.close()
+        self.assertEqual(both.coalesced, 2)
+        self.assertEqual(ticker.hub.subscriber_count(), 0)
+
+    async def test_slow_subscriber_is_told_to_resync(self):
+        subscription = ticker.hub.open({f"farmer:{self.farmer.pk}"})
+        with patch.object(ticker, "MAX_PENDING", 3):
+            for pk in range(1, 6):
+                ticker.hub.deliver(self.event(pk, "10.00"))
+            await asyncio.sleep(0)
+        self.assertEqual(await subscription.next_batch(timeout=1), [ticker.RESYNC])
+        subscription.close()
+        self.assertIsNone(await subscription.next_batch(timeout=1))
+
+    async def test_sse_stream_snapshot_then_changes(self):
+        url = reverse("marketplace:price_stream")
+        response = await self.async_client.get(url, {"product": self.product.pk, "crop": "lentil"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content.__aiter__()
+        self.assertIn(b'"price":"80.00"', await asyncio.wait_for(stream.__anext__(), 5))
+
+        def reprice():
+            product = Product.objects.get(pk=self.product.pk)
+            product.price = "72.50"
+            product.save()
+
+        await sync_to_async(reprice)()
+        chunk = await asyncio.wait_for(stream.__anext__(), 5)
+        self.assertTrue(chunk.startswith(b"event: price\n"))
+        self.assertIn(b'"price":"72.50"', chunk)
+        # a client disconnect cancels the task streaming the response
+        waiting = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(ticker.hub.subscriber_count(), 0)
+
+    def test_crop_topics_follow_the_catalog(self):
+        self.assertEqual(ticker.parse_topic("crop:ধান"), "crop:rice")
+        self.assertEqual(ticker.product_topics(self.event(1, "10.00", "Chinigura 5 kg")) & {"crop:rice"}, {"crop:rice"})
+        # a title word that names no crop is not a topic
+        self.assertNotIn("crop:aromatic", ticker.product_topics(self.event(1, "10.00")))
+        with self.assertRaises(ValueError):
+            ticker.parse_topic("crop:aromatic")
+
+    def test_snapshot_loads_a_cold_crop_index_off_the_event_loop(self):
+        crops._index = None
+        cache.clear()
+        response = self.client.get(reverse("marketplace:price_stream"), {"product": self.product.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"crop":"rice"', response.content.decode())
+
+    def test_broker_outage_does_not_fail_the_write(self):
+        with patch.object(ticker.LocalBroker, "publish", side_effect=ConnectionError("broker down")) as publish, \
+                self.assertLogs("django.db.backends.base", "ERROR"):
+            product = Product.objects.get(pk=self.product.pk)
+            product.price = "75.00"
+            product.save()
+            result = bulk_import.import_products(BytesIO(b"title,price\nRed lentil,120\n"), self.farmer, "csv")
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).price, Decimal("75.00"))
+
+    def test_wsgi_falls_back_to_snapshot_polling(self):
+        response = self.client.get(reverse("marketplace:price_stream"), {"product": self.product.pk})
+        body = response.content.decode()
+        self.assertTrue(body.startswith(f"retry: {ticker.POLL_RETRY_MS}"))
+        self.assertIn('"price":"80.00"', body)
+        self.assertEqual(self.client.get(reverse("marketplace:price_stream"), {"crop": "two words"}).status_code, 400)
+
+    async def test_websocket_subscribe_and_receive(self):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {"type": "websocket", "path": ticker.WEBSOCKET_PATH, "query_string": b"crop=rice"}
+        app = asyncio.create_task(ticker.websocket_app(scope, inbox.get, outbox.put))
+        await inbox.put({"type": "websocket.connect"})
+        self.assertEqual((await outbox.get())["type"], "websocket.accept")
+
+        await inbox.put({"type": "websocket.receive", "text": json.dumps({"subscribe": ["farmer:7"]})})
+        self.assertEqual(json.loads((await outbox.get())["text"])["topics"], ["crop:rice", "farmer:7"])
+        ticker.hub.deliver(self.event(self.product.pk, "70.00"))
+        message = json.loads((await asyncio.wait_for(outbox.get(), 5))["text"])
+        self.assertEqual((message["type"], message["price"]), ("price", "70.00"))
+
+        await inbox.put({"type": "websocket.disconnect"})
+        await asyncio.wait_for(app, 5)
+        self.assertEqual(ticker.hub.subscriber_count(), 0)
@@ -0,0 +1,391 @@
+# apps/marketplace/ticker.py
+"""
+Live price ticker: product price / availability changes pushed to browsers
+over Server-Sent Events (views_async.price_stream) or a WebSocket
+(websocket_app, mounted by config/asgi.py). Both need the ASGI deployment.
+
+Flow: signals.product_saved -> publish_product() after commit -> broker ->
+hub.deliver() in every worker process -> subscriptions on that worker.
+
+* Topics are "product:<id>", "farmer:<id>" and "crop:<slug>" (the
+  listing's catalog crop, e.g. "crop:tomato"; see crops.py). Parsing a crop
+  topic may load the crop catalog, so async code parses off the event loop.
+* An event is serialized once, and the hub hands the same frames to every
+  subscriber, with one cross-thread hop per event loop (not per client).
+* Coalescing: a subscriber buffers at most one pending update per product;
+  a newer price replaces the unsent one, so a burst of edits reaches a slow
+  client as its latest state.
+* Backpressure: publishing never waits for clients. A subscriber holding
+  MAX_PENDING unsent products is too far behind; its buffer is dropped and
+  it gets a "resync" event (reload the prices you show) instead.
+* Publishing never fails a write: the commit hooks are robust, so a broker
+  outage (e.g. Redis down) is logged and the committed save still succeeds.
+
+LocalBroker delivers in-process (single worker, tests); RedisBroker relays
+through Redis pub/sub so every worker sees every change. Pick one with
+settings.PRICE_TICKER_BROKER ("local" or "redis").
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import crops
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+MAX_TOPICS = 200  # per connection
+MAX_PENDING = 500  # unsent products per subscriber before it must resync
+HEARTBEAT_SECONDS = 15
+FLUSH_SECONDS = 0.05  # collect updates this long before writing, so bursts share a write
+POLL_RETRY_MS = 10_000  # EventSource reconnect delay where streaming is unavailable (WSGI)
+
+TOPIC_KINDS = ("product", "farmer", "crop")
+REDIS_CHANNEL = "marketplace:ticker"
+
+WEBSOCKET_PATH = "/ws/prices/"
+
+
+class Frame:
+    """
+    One event, encoded once for every transport.
+    """
+    __slots__ = ("key", "json", "sse")
+
+    def __init__(self, key, kind, payload):
+        self.key = key
+        self.json = json.dumps({"type": kind, **payload}, separators=(",", ":"))
+        self.sse = f"event: {kind}\ndata: {self.json}\n\n"
+
+
+RESYNC = Frame(None, "resync", {})
+
+
+def parse_topic(text):
+    kind, _, value = str(text).partition(":")
+    if kind not in TOPIC_KINDS or not value:
+        raise ValueError(f"Unknown topic {text!r}; use product:<id>, farmer:<id> or crop:<name>.")
+    if kind == "crop":
+        slug = crops.resolve(value)
+        if slug is None:
+            raise ValueError(f"Name one catalog crop per topic, not {value!r}.")
+        return f"crop:{slug}"
+    if not value.isdigit():
+        raise ValueError(f"{kind} topics take a numeric id, not {value!r}.")
+    return f"{kind}:{int(value)}"
+
+
+def _parse_topics(texts):
+    return {parse_topic(text) for text in texts}
+
+
+def topics_from_query(params):
+    """
+    Topics from ?product=1&product=2&farmer=3&crop=tomato (repeat or comma-separate).
+    """
+    topics = set()
+    for kind in TOPIC_KINDS:
+        for raw in params.getlist(kind):
+            topics.update(parse_topic(f"{kind}:{value.strip()}") for value in raw.split(",") if value.strip())
+    if len(topics) > MAX_TOPICS:
+        raise ValueError(f"At most {MAX_TOPICS} topics per connection.")
+    return topics
+
+
+def product_topics(event):
+    topics = {f"product:{event['product']}", f"farmer:{event['farmer']}"}
+    if event["crop"]:
+        topics.add(f"crop:{event['crop']}")
+    return topics
+
+
+class Subscription:
+    """
+    One connected client. Created and consumed on an event loop; the hub
+    feeds it from any thread through that loop.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.loop = asyncio.get_running_loop()
+        self.topics = set()
+        self.pending = OrderedDict()  # product id -> latest unsent Frame
+        self.overflowed = False
+        self.closed = False
+        self.coalesced = 0
+        self._wakeup = asyncio.Event()
+
+    def subscribe(self, topics):
+        if len(self.topics | set(topics)) > MAX_TOPICS:
+            raise ValueError(f"At most {MAX_TOPICS} topics per connection.")
+        self.hub._add(self, set(topics) - self.topics)
+        self.topics |= set(topics)
+
+    def unsubscribe(self, topics):
+        self.hub._remove(self, self.topics & set(topics))
+        self.topics -= set(topics)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub._remove(self, self.topics)
+            self._wakeup.set()
+
+    def offer(self, frame):
+        # runs on self.loop
+        if self.overflowed or self.closed:
+            return
+        if frame.key in self.pending:
+            self.coalesced += 1
+            del self.pending[frame.key]
+        elif len(self.pending) >= MAX_PENDING:
+            self.pending.clear()
+            self.overflowed = True
+            self._wakeup.set()
+            return
+        self.pending[frame.key] = frame
+        self._wakeup.set()
+
+    async def next_batch(self, timeout=HEARTBEAT_SECONDS):
+        """
+        The frames to send next: [] after ``timeout`` with nothing new (send a
+        heartbeat), None once closed.
+        """
+        if not self.pending and not self.overflowed and not self.closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            if FLUSH_SECONDS:
+                await asyncio.sleep(FLUSH_SECONDS)
+        self._wakeup.clear()
+        if self.closed:
+            return None
+        if self.overflowed:
+            self.overflowed = False
+            self.pending.clear()
+            return [RESYNC]
+        batch = list(self.pending.values())
+        self.pending.clear()
+        return batch
+
+
+class Hub:
+    """
+    Topic -> subscriptions registry of this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}
+
+    def open(self, topics=()):
+        subscription = Subscription(self)
+        subscription.subscribe(topics)
+        return subscription
+
+    def _add(self, subscription, topics):
+        with self._lock:
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+
+    def _remove(self, subscription, topics):
+        with self._lock:
+            for topic in topics:
+                subscribers = self._topics.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._topics.values())) if self._topics else 0
+
+    def deliver(self, event, kind="price"):
+        """
+        Fan ``event`` out to every subscription of its topics (each at most once).
+        Safe to call from any thread.
+        """
+        frame = Frame(event["product"], kind, event)
+        with self._lock:
+            targets = set()
+            for topic in product_topics(event):
+                targets.update(self._topics.get(topic, ()))
+        by_loop = {}
+        for subscription in targets:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, frame)
+            except RuntimeError:
+                # loop already closed; those connections are gone
+                for subscription in subscriptions:
+                    self._remove(subscription, subscription.topics)
+        return len(targets)
+
+
+def _fan_out(subscriptions, frame):
+    for subscription in subscriptions:
+        subscription.offer(frame)
+
+
+hub = Hub()
+
+
+class LocalBroker:
+    """
+    In-process stand-in: delivers straight to this process's hub.
+    """
+
+    def publish(self, event, kind):
+        hub.deliver(event, kind)
+
+
+class RedisBroker:
+    """
+    Relays events through Redis pub/sub so every worker's hub receives them.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, event, kind):
+        self._ensure_listener()
+        self._redis.publish(REDIS_CHANNEL, json.dumps({"kind": kind, "event": event}))
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="ticker-redis", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REDIS_CHANNEL)
+        for message in pubsub.listen():
+            try:
+                data = json.loads(message["data"])
+                hub.deliver(data["event"], data["kind"])
+            except Exception:
+                logger.exception("Bad ticker message: %r", message)
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        if getattr(settings, "PRICE_TICKER_BROKER", "local") == "redis":
+            _broker = RedisBroker(settings.REDIS_URL)
+            # subscribers of this worker must hear other workers' changes too
+            _broker._ensure_listener()
+        else:
+            _broker = LocalBroker()
+    return _broker
+
+
+def product_event(product):
+    return {
+        "product": product.pk,
+        "title": product.title,
+        "price": str(product.price),
+        "active": product.active,
+        "farmer": product.owner_id,
+        "crop": crops.slug(product.crop_id),
+        "at": timezone.now().isoformat(),
+    }
+
+
+def snapshot(product_ids):
+    """
+    SSE frames with the current state of the active products in ``product_ids``.
+    Synchronous (product_event() may load the crop catalog): async callers use sync_to_async.
+    """
+    listings = Product.objects.filter(pk__in=product_ids, active=True).only(
+        "pk", "title", "price", "active", "owner_id", "crop_id"
+    )
+    return [Frame(product.pk, "price", product_event(product)).sse for product in listings]
+
+
+def publish_product(product, kind="price"):
+    """
+    Announce ``product``'s current state once the surrounding transaction
+    commits (kind "removed" for deletions).
+    """
+    event = product_event(product)
+    transaction.on_commit(lambda: broker().publish(event, kind), robust=True)
+
+
+def publish_products(products, kind="price"):
+    """
+    publish_product() for a batch (bulk_create paths), with one commit hook.
+    """
+    events = [product_event(product) for product in products]
+
+    def publish():
+        for event in events:
+            broker().publish(event, kind)
+
+    if events:
+        transaction.on_commit(publish, robust=True)
+
+
+async def websocket_app(scope, receive, send):
+    """
+    Raw ASGI WebSocket endpoint. Topics come from the query string like the
+    SSE stream and can be changed by sending {"subscribe": [...]} or
+    {"unsubscribe": [...]} with topics such as "product:12" or "crop:rice".
+    """
+    from django.http import QueryDict
+
+    if (await receive())["type"] != "websocket.connect":
+        return
+    try:
+        topics = await sync_to_async(topics_from_query)(QueryDict(scope.get("query_string", b"").decode()))
+    except ValueError:
+        await send({"type": "websocket.close", "code": 4400})
+        return
+    await send({"type": "websocket.accept"})
+    subscription = hub.open(topics)
+
+    async def read():
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                request = json.loads(message.get("text") or "{}")
+                subscribe = await sync_to_async(_parse_topics)(request.get("subscribe", []))
+                unsubscribe = await sync_to_async(_parse_topics)(request.get("unsubscribe", []))
+                subscription.subscribe(subscribe)
+                subscription.unsubscribe(unsubscribe)
+                reply = {"type": "subscribed", "topics": sorted(subscription.topics)}
+            except (ValueError, TypeError, AttributeError) as exc:
+                reply = {"type": "error", "detail": str(exc)}
+            await send({"type": "websocket.send", "text": json.dumps(reply)})
+
+    reader = asyncio.create_task(read())
+    reader.add_done_callback(lambda _: subscription.close())
+    try:
+        while True:
+            batch = await subscription.next_batch()
+            if batch is None:
+                break
+            for frame in batch:
+                await send({"type": "websocket.send", "text": frame.json})
+    finally:
+        subscription.close()
+        reader.cancel()
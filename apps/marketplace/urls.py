@@ -1,8 +1,10 @@
 from django.urls import path
-from . import views
+from . import views, views_async
 from .views_api import HomeApiView, ProductDetailApiView, AddToCartApiView, AddReviewApiView
 from .views import ProductSearchApiView  # Import your API view
-from .views_api import ProductListApiView
+from .views_api import ProductListApiView, ProductPriceHistoryApiView, PriceAnalyticsApiView, CatalogExportApiView
+from .views_api import ProductImportApiView, CartApiView, CartItemApiView, ReviewBatchApiView
+from .views_api import PriceAlertListApiView, PriceAlertDetailApiView, PriceBoardApiView, CropSuggestApiView
 app_name = "marketplace"
 
 # Traditional Views
@@ -10,6 +12,7 @@ urlpatterns = [
     path("", views.home, name="home"),
     
     path("product/<int:pk>/", views.product_detail, name="product_detail"),
+    path("prices/", views.market_prices, name="market_prices"),
     path("cart/", views.view_cart, name="view_cart"),
     path("cart/add/<int:pk>/", views.add_to_cart, name="add_to_cart"),
     path("cart/remove/<int:pk>/", views.remove_from_cart, name="remove_from_cart"),
@@ -26,9 +29,27 @@ urlpatterns = [
 urlpatterns += [
     path("api/home/", HomeApiView.as_view(), name="home_api"),
      path('api/products/<int:pk>/', ProductDetailApiView.as_view(), name='product_detail_api'),
+    path("api/cart/", CartApiView.as_view(), name="cart_api"),
     path("api/cart/add/<int:pk>/", AddToCartApiView.as_view(), name="add_to_cart_api"),
+    path("api/cart/items/<int:pk>/", CartItemApiView.as_view(), name="cart_item_api"),
     path("api/products/<int:pk>/review/", AddReviewApiView.as_view(), name="add_review_api"),
+    path("api/reviews/batch/", ReviewBatchApiView.as_view(), name="review_batch_api"),
      path('api/products/search/', ProductSearchApiView.as_view(), name='product_search_api'),  # Add your new search API endpoint here
 path('api/products/', ProductListApiView.as_view(), name='product_list_api'),
+    path("api/products/<int:pk>/prices/", ProductPriceHistoryApiView.as_view(), name="product_price_history_api"),
+    path("api/prices/analytics/", PriceAnalyticsApiView.as_view(), name="price_analytics_api"),
+    path("api/prices/board/", PriceBoardApiView.as_view(), name="price_board_api"),
+    path("api/crops/suggest/", CropSuggestApiView.as_view(), name="crop_suggest_api"),
+    path("api/alerts/", PriceAlertListApiView.as_view(), name="price_alert_list_api"),
+    path("api/alerts/<int:pk>/", PriceAlertDetailApiView.as_view(), name="price_alert_detail_api"),
+    path("api/products/export/", CatalogExportApiView.as_view(), name="catalog_export_api"),
+    path("api/products/import/", ProductImportApiView.as_view(), name="product_import_api"),
+
+    # async read path, served by config.asgi (same payloads as the views above)
+    path("api/async/home/", views_async.home_api, name="home_async_api"),
+    path("api/async/products/", views_async.product_list_api, name="product_list_async_api"),
+    path("api/async/products/search/", views_async.product_search_api, name="product_search_async_api"),
+    path("api/async/products/<int:pk>/", views_async.product_detail_api, name="product_detail_async_api"),
+    path("api/stream/prices/", views_async.price_stream, name="price_stream"),
 
 ]
@@ -1,10 +1,7 @@
 # apps/marketplace/views.py
-from decimal import Decimal
-
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render, resolve_url
 from django.views.decorators.http import require_http_methods
 from .models import Product, Review
@@ -14,31 +11,74 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from .models import Product
 from .serializers import ProductSerializer
 from .models import Product, Wishlist
+from . import catalog_cache, engagement, price_board, search, wishlist
+from .cart import Cart, CartError, parse_qty
+from .conditional import product_page_condition
+from .pagination import keyset_page, paginate, paginate_ranked
 
 
 # In views.py
 def home(request):
     q = (request.GET.get("q") or "").strip()
-    qs = Product.objects.filter(active=True)
+    after = request.GET.get("after", "")
+    catalog_version = catalog_cache.version()
+    next_cursor = None
     if q:
-        qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q))
-    products = qs.order_by("-created_at")[:12]  # Get the latest 12 products
+        # best 12 matches by relevance from the search index
+        qs = Product.objects.filter(active=True).select_related("owner")
+        products = search.ranked_products(qs, search.search(q, limit=12))
+    elif after:
+        # older shelf pages seek past the cursor on (created_at, id)
+        try:
+            products, next_cursor = keyset_page(catalog_cache.shelf_queryset(), after, catalog_cache.SHELF_SIZE)
+        except ValueError:
+            return redirect("marketplace:home")
+    else:
+        # latest 12, cached per catalog version
+        products, next_cursor = catalog_cache.latest_products(catalog_version)
 
     return render(
         request,
         "marketplace/home.html",
-        {"products": products},
+        {
+            "products": products,
+            "wishlisted": wishlist.wishlisted(request.user, products),
+            "next_cursor": next_cursor,
+            "catalog_version": catalog_version,
+            "card_timeout": catalog_cache.SHELF_TIMEOUT,
+        },
     )
 
 
+def market_prices(request):
+    """
+    The market price board: today's going rate of each crop.
+    """
+    q = (request.GET.get("q") or "").strip()
+    order = request.GET.get("order", "listings")
+    if order not in price_board.ORDERINGS:
+        order = "listings"
+    return render(
+        request,
+        "marketplace/price_board.html",
+        {
+            "rows": price_board.board_rows([q] if q else (), order),
+            "q": q,
+            "order": order,
+            "orderings": list(price_board.ORDERINGS),
+        },
+    )
+
 
+@engagement.counts_views
+@product_page_condition
 def product_detail(request, pk):
     """
     Product page with reviews list.
     """
     from .models import Product  # <-- Import Product inside the function to avoid circular import
 
-    product = get_object_or_404(Product, pk=pk, active=True)
+    product = get_object_or_404(Product.objects.select_related("owner"), pk=pk, active=True)
     reviews = (
         Review.objects.filter(product=product)
         .select_related("user")
@@ -56,23 +96,15 @@ def add_to_cart(request, pk):
     Add a product to the session cart.
     """
     product = get_object_or_404(Product, pk=pk, active=True)
-
-    # Check if the logged-in user is the owner (Farmer) of the product
-    if product.owner == request.user:
-        messages.error(request, "You cannot add your own product to the cart.")
-        return redirect("marketplace:home")
+    qty = max(1, parse_qty(request.POST.get("qty")))
 
     try:
-        qty = int(request.POST.get("qty", 1))
-    except (TypeError, ValueError):
-        qty = 1
-    qty = max(1, qty)
-
-    cart = request.session.get("cart", {})
-    cart[str(product.pk)] = cart.get(str(product.pk), 0) + qty
-    request.session["cart"] = cart
-    request.session.modified = True
+        Cart(request.session).add(product, qty, user=request.user)
+    except CartError as exc:
+        messages.error(request, str(exc))
+        return redirect("marketplace:home")
 
+    engagement.record(product.pk, "cart_adds")
     messages.success(request, f"Added {qty} × {product.title} to cart.")
 
     next_target = request.POST.get("next") or request.META.get("HTTP_REFERER") or "marketplace:view_cart"
@@ -84,38 +116,14 @@ def view_cart(request):
     """
     Show items currently in the session cart.
     """
-    cart = request.session.get("cart", {})
-    items = []
-    total = Decimal("0.00")
-
-    if cart:
-        ids = [int(pk) for pk in cart.keys()]
-        products = {p.pk: p for p in Product.objects.filter(pk__in=ids)}
-        for pk_str, qty in cart.items():
-            try:
-                pk = int(pk_str)
-                p = products.get(pk)
-                if not p:
-                    continue
-                qty = int(qty)
-                line = (p.price if isinstance(p.price, Decimal) else Decimal(str(p.price))) * qty
-                total += line
-                items.append({"product": p, "qty": qty, "line_total": line})
-            except Exception:
-                # Skip any malformed cart entry
-                continue
-
-    return render(request, "marketplace/cart.html", {"items": items, "total": total})
+    summary = Cart(request.session).summary()
+    return render(request, "marketplace/cart.html", {"items": summary["lines"], "total": summary["total"]})
 
 
 @login_required
 @require_http_methods(["POST"])
 def remove_from_cart(request, pk):
-    cart = request.session.get("cart", {})
-    if str(pk) in cart:
-        del cart[str(pk)]
-        request.session["cart"] = cart
-        request.session.modified = True
+    if Cart(request.session).remove(pk):
         messages.info(request, "Item removed.")
     next_target = request.POST.get("next") or "marketplace:view_cart"
     return redirect(resolve_url(next_target))
@@ -124,8 +132,7 @@ def remove_from_cart(request, pk):
 @login_required
 @require_http_methods(["POST"])
 def clear_cart(request):
-    request.session["cart"] = {}
-    request.session.modified = True
+    Cart(request.session).clear()
     messages.info(request, "Cart cleared.")
     next_target = request.POST.get("next") or "marketplace:view_cart"
     return redirect(resolve_url(next_target))
@@ -163,46 +170,46 @@ def add_review(request, pk):
 
 class ProductSearchApiView(APIView):
     """
-    API view to handle product search
+    API view to handle product search (paginated)
     """
     def get(self, request):
         query = request.GET.get('q', '').strip()
-        products = Product.objects.filter(active=True)
+        products = Product.objects.active().for_listing()
         
         if query:
-            products = products.filter(Q(title__icontains=query) | Q(description__icontains=query))
+            return paginate_ranked(self, request, search.search(query), products, ProductSerializer)
 
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        return paginate(self, request, products, ProductSerializer)
     
     
 
 @login_required
+@require_http_methods(["POST"])
 def add_to_wishlist(request, pk):
     product = get_object_or_404(Product, pk=pk, active=True)
-    # Check if the product is already in the wishlist
-    if Wishlist.objects.filter(user=request.user, product=product).exists():
-        messages.error(request, "Product already in your wishlist.")
-    else:
-        Wishlist.objects.create(user=request.user, product=product)
+    if wishlist.add(request.user, product):
+        engagement.record(product.pk, "wishlist_adds")
         messages.success(request, "Product added to your wishlist.")
-    return redirect("marketplace:home")
+    else:
+        messages.error(request, "Product already in your wishlist.")
+    next_target = request.POST.get("next") or request.META.get("HTTP_REFERER") or "marketplace:home"
+    return redirect(resolve_url(next_target))
+
 
 @login_required
+@require_http_methods(["POST"])
 def remove_from_wishlist(request, pk):
-    wishlist_item = get_object_or_404(Wishlist, user=request.user, product__pk=pk)
-    wishlist_item.delete()
-    messages.success(request, "Product removed from your wishlist.")
-    return redirect("marketplace:home")
+    if wishlist.remove(request.user, pk):
+        messages.success(request, "Product removed from your wishlist.")
+    next_target = request.POST.get("next") or request.META.get("HTTP_REFERER") or "marketplace:home"
+    return redirect(resolve_url(next_target))
 
 
 @login_required
 def wishlist_view(request):
-    # Get the current user's wishlist
-    wishlist_items = Wishlist.objects.filter(user=request.user)
-
+    # product and farmer are joined in, so the page is one query however long the list
     return render(
         request,
-        "marketplace/wishlist.html",  # Ensure this template exists
-        {"wishlist_items": wishlist_items},
+        "marketplace/wishlist.html",
+        {"wishlist_items": wishlist.items(request.user)},
     )
@@ -2,26 +2,36 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from .models import Product, Review
+from .models import RATING_STARS, Product, Review
+from .serializers import CartSerializer, CropSerializer, PriceAlertSerializer, PriceBoardRowSerializer, PriceRollupSerializer
 from .serializers import ProductSerializer, ReviewSerializer
 from .models import Product
+from . import analytics, bulk_import, crops, engagement, export, price_board, prices, review_batch, search
+from .cart import Cart, CartError, parse_qty
+from .conditional import product_api_condition
+from .models import PriceAlert, PriceRollup
+from .pagination import ProductCursorPagination, paginate, paginate_ranked
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
 from rest_framework import generics
+from rest_framework.parsers import MultiPartParser
 
 
 
 
 class HomeApiView(APIView):
     """
-    Home page with optional search
+    Home page with optional search (paginated)
     """
     def get(self, request):
         q = request.GET.get("q", "").strip()
-        products = Product.objects.filter(active=True)
+        products = Product.objects.active().for_listing()
         if q:
-            products = products.filter(title__icontains=q)
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+            return paginate_ranked(self, request, search.search(q), products, ProductSerializer)
+        return paginate(self, request, products, ProductSerializer)
 
 class ProductDetailApiView(APIView):
     """
@@ -29,6 +39,7 @@ class ProductDetailApiView(APIView):
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @method_decorator(product_api_condition)
     def get(self, request, pk):
         product = Product.objects.filter(pk=pk, active=True).first()
         if not product:
@@ -76,17 +87,62 @@ class ProductCreateApiView(APIView):
 
         
 class ProductListApiView(generics.ListCreateAPIView):
-    queryset = Product.objects.all()
+    queryset = Product.objects.for_listing()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = ProductCursorPagination
+
+class CartApiView(APIView):
+    """
+    The session cart with Decimal line and grand totals.
+    """
+    def get(self, request):
+        return Response(CartSerializer(Cart(request.session).summary()).data)
+
+    def delete(self, request):
+        cart = Cart(request.session)
+        cart.clear()
+        return Response(CartSerializer(cart.summary()).data)
+
 
 class AddToCartApiView(APIView):
     """
     Add a product to the cart.
     """
     def post(self, request, pk):
-        # Logic to add product to cart (just an example, actual cart logic needs to be handled)
-        return Response({"message": f"Product {pk} added to cart"}, status=status.HTTP_200_OK)
+        product = Product.objects.filter(pk=pk, active=True).first()
+        if not product:
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        cart = Cart(request.session)
+        try:
+            cart.add(product, parse_qty(request.data.get("qty"), 1), user=request.user)
+        except CartError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        engagement.record(product.pk, "cart_adds")
+        return Response(CartSerializer(cart.summary()).data, status=status.HTTP_200_OK)
+
+
+class CartItemApiView(APIView):
+    """
+    Change the quantity of one cart line (qty=0 removes it), or remove it.
+    """
+    def put(self, request, pk):
+        cart = Cart(request.session)
+        qty = parse_qty(request.data.get("qty"), None)
+        if qty is None:
+            return Response({"detail": "qty must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cart.set_quantity(pk, qty)
+        except CartError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(CartSerializer(cart.summary()).data)
+
+    def delete(self, request, pk):
+        cart = Cart(request.session)
+        if not cart.remove(pk):
+            return Response({"detail": "This product is not in your cart."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(CartSerializer(cart.summary()).data)
 
 class AddReviewApiView(APIView):
     """
@@ -103,11 +159,242 @@ class AddReviewApiView(APIView):
 
         if not rating or not comment:
             return Response({"detail": "Rating and comment are required"}, status=status.HTTP_400_BAD_REQUEST)
+        # the star histogram is keyed by the integer rating
+        try:
+            rating = int(rating)
+        except (TypeError, ValueError):
+            rating = None
+        if rating not in RATING_STARS:
+            return Response({"detail": "Rating must be a whole number from 1 to 5"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # review upsert and Product rating aggregates commit together; a
+        # re-submission edits the user's review, as the HTML form does
+        with transaction.atomic():
+            review, created = Review.objects.update_or_create(
+                product=product,
+                user=request.user,
+                defaults={"rating": rating, "comment": comment},
+            )
+        code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        return Response(ReviewSerializer(review).data, status=code)
+
+
+class ReviewBatchApiView(APIView):
+    """
+    Upsert many of the caller's reviews at once (feedback kiosks).
+    JSON body: [{"product": id, "rating": 1-5, "comment": "..."}, ...]
+    or {"reviews": [...]}; the response has a result per item.
+    """
+    def post(self, request):
+        items = request.data.get("reviews") if isinstance(request.data, dict) else request.data
+        try:
+            result = review_batch.ingest(request.user, items)
+        except review_batch.ReviewBatchError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+def _parse_date_param(request, name):
+    raw = request.GET.get(name)
+    if not raw:
+        return None
+    value = parse_date(raw)
+    if value is None:
+        raise ValueError(name)
+    return value
+
+
+class ProductPriceHistoryApiView(APIView):
+    """
+    OHLC price history for a product.
+    ?resolution=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, pk):
+        if not Product.objects.filter(pk=pk).exists():
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        resolution = request.GET.get("resolution", PriceRollup.DAY)
+        if resolution not in dict(PriceRollup.RESOLUTIONS):
+            return Response({"detail": "resolution must be day, week or month"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = (_parse_date_param(request, name) for name in ("start", "end"))
+        except ValueError:
+            return Response({"detail": "start/end must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = prices.price_history(pk, resolution, start, end)
+        return Response({
+            "product": pk,
+            "resolution": resolution,
+            "series": PriceRollupSerializer(rollups, many=True).data,
+        })
+
+
+class PriceAnalyticsApiView(APIView):
+    """
+    Moving averages, rolling volatility, percent change and percentiles
+    for many products at once.
+    ?products=1,2,3 and/or ?q=<crop name, or search text>, plus resolution/start/end/window.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_series = 500
+    max_window = 365
+
+    def get(self, request):
+        try:
+            product_ids = [int(x) for x in request.GET.get("products", "").split(",") if x.strip()]
+            window = int(request.GET.get("window", 7))
+        except ValueError:
+            return Response({"detail": "products and window must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= window <= self.max_window:
+            return Response({"detail": f"window must be between 1 and {self.max_window}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        q = request.GET.get("q", "").strip()
+        if q:
+            # a crop name selects the listings classified as that crop, as the
+            # price board and alerts do; other text falls back to full-text search
+            slug = crops.resolve(q)
+            if slug is not None:
+                listings = Product.objects.active().filter(crop__slug=slug).order_by("-pk")
+                product_ids += listings.values_list("pk", flat=True)[:self.max_series]
+            else:
+                product_ids += search.search(q, limit=self.max_series)
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return Response({"detail": "Pass products=<ids> or q=<crop>"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(product_ids) > self.max_series:
+            return Response({"detail": f"At most {self.max_series} series per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        review = Review.objects.create(
-            product=product,
-            user=request.user,
-            rating=rating,
-            comment=comment
-        )
-        return Response(ReviewSerializer(review).data, status=status.HTTP_201_CREATED)
+        resolution = request.GET.get("resolution", PriceRollup.DAY)
+        if resolution not in dict(PriceRollup.RESOLUTIONS):
+            return Response({"detail": "resolution must be day, week or month"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = (_parse_date_param(request, name) for name in ("start", "end"))
+        except ValueError:
+            return Response({"detail": "start/end must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(analytics.price_analytics(product_ids, resolution, start, end, window))
+
+
+class PriceBoardApiView(APIView):
+    """
+    The market price board: min/median/max/mean price and listing count per crop.
+    ?crop=tomato,potato (repeat or comma-separate)&order=crop|listings|price
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    @method_decorator(price_board.board_condition)
+    def get(self, request):
+        crops = [c for raw in request.GET.getlist("crop") for c in raw.split(",") if c.strip()]
+        try:
+            rows = price_board.board_rows(crops, request.GET.get("order", "crop"))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"crops": PriceBoardRowSerializer(rows, many=True).data})
+
+
+class CropSuggestApiView(APIView):
+    """
+    Catalog crops matching a listing title or crop name, best first, for the
+    farmer's crop picker. ?q=tomatos fresh&limit=5
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_limit = 20
+
+    def get(self, request):
+        q = request.GET.get("q", "").strip()
+        try:
+            limit = min(int(request.GET.get("limit", crops.MAX_SUGGESTIONS)), self.max_limit)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        suggestions = [
+            {**CropSerializer(crop).data, "score": score, "matched": name}
+            for crop, score, name in (crops.suggest(q, limit) if q else [])
+        ]
+        return Response({"query": q, "suggestions": suggestions})
+
+
+class CatalogExportApiView(APIView):
+    """
+    Stream all active products as NDJSON (default) or CSV.
+    ?output=ndjson|csv&ratings=1&owner=1
+    """
+    content_types = {
+        "ndjson": "application/x-ndjson; charset=utf-8",
+        "csv": "text/csv; charset=utf-8",
+    }
+
+    def get(self, request):
+        fmt = request.GET.get("output", "ndjson")
+        if fmt not in export.FORMATS:
+            return Response({"detail": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+        include_ratings = request.GET.get("ratings") in ("1", "true")
+        include_owner = request.GET.get("owner") in ("1", "true")
+
+        lines = export.export_lines(fmt, include_ratings, include_owner)
+        response = StreamingHttpResponse(export.buffered(lines), content_type=self.content_types[fmt])
+        response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+        return response
+
+
+class ProductImportApiView(APIView):
+    """
+    Bulk-create the caller's products from an uploaded CSV or JSON file.
+    multipart field "file"; ?input=csv|json overrides the file extension.
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        from apps.farmers.views import is_farmer
+
+        if not is_farmer(request.user):
+            return Response({"detail": "Farmer access required."}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"detail": "Upload a file in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.GET.get("input") or bulk_import.detect_format(upload.name)
+        if fmt not in bulk_import.FORMATS:
+            return Response({"detail": "input must be csv or json"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = bulk_import.import_products(upload.file, request.user, fmt)
+        code = status.HTTP_201_CREATED if result["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=code)
+
+
+class PriceAlertListApiView(APIView):
+    """
+    The caller's price alerts (newest first), or create one:
+    {"product": id} or {"crop": "tomato"}, "direction": below|above, "threshold".
+    """
+    def get(self, request):
+        alerts = PriceAlert.objects.filter(user=request.user)
+        if request.GET.get("triggered") == "1":
+            alerts = alerts.filter(triggered_at__isnull=False)
+        return Response(PriceAlertSerializer(alerts, many=True).data)
+
+    def post(self, request):
+        serializer = PriceAlertSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class PriceAlertDetailApiView(APIView):
+    """
+    Change (e.g. re-arm with {"active": true}) or delete one of the caller's alerts.
+    """
+    def patch(self, request, pk):
+        alert = get_object_or_404(PriceAlert, pk=pk, user=request.user)
+        serializer = PriceAlertSerializer(alert, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data)
+
+    def delete(self, request, pk):
+        get_object_or_404(PriceAlert, pk=pk, user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
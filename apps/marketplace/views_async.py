@@ -0,0 +1,180 @@
+# apps/marketplace/views_async.py
+"""
+Async versions of the read-heavy product APIs, for the ASGI deployment
+(config/asgi.py). While a query waits on the database, the event loop keeps
+serving other requests instead of parking a worker thread per request.
+
+Responses carry the same JSON as the sync endpoints in views_api.py: same
+serializers, same cursor / page-number pagination and the same ETag for the
+product detail. These are plain Django async views because DRF's APIView
+cannot dispatch to coroutines; _authorize() runs the same DRF authentication
+and permission classes the sync views get from settings.REST_FRAMEWORK.
+
+Queries go through Django's async ORM, one after another on the request's
+own connection, rather than on extra threads: with CONN_MAX_AGE = 0 every
+extra connection costs a TLS handshake and login to the database, more than
+overlapping two short reads saves.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from . import conditional, search, ticker
+from .models import Product, Review
+from .pagination import ProductCursorPagination, ProductPagination
+from .serializers import ProductSerializer, ReviewSerializer
+
+
+class _ProductWithoutReviewsSerializer(ProductSerializer):
+    # the detail view loads the reviews itself, to derive the ETag from them too
+    class Meta(ProductSerializer.Meta):
+        fields = [f for f in ProductSerializer.Meta.fields if f != "reviews"]
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def _authorize(request):
+    """
+    Authenticate and check permissions exactly as the sync APIView would,
+    with the default authentication and permission classes. Returns the
+    error response, or None (and sets request.user) when the request may proceed.
+    """
+    view = APIView()
+    drf_request = view.initialize_request(request)
+    try:
+        view.perform_authentication(drf_request)
+        view.check_permissions(drf_request)
+    except (AuthenticationFailed, NotAuthenticated) as exc:
+        # like APIView.handle_exception: 401 only with a WWW-Authenticate challenge
+        challenge = view.get_authenticate_header(drf_request)
+        response = _json({"detail": str(exc.detail)}, status=401 if challenge else 403)
+        if challenge:
+            response["WWW-Authenticate"] = challenge
+        return response
+    except PermissionDenied as exc:
+        return _json({"detail": str(exc.detail)}, status=403)
+    return None
+
+
+async def _cursor_page(request, queryset):
+    paginator = ProductCursorPagination()
+    try:
+        page = await paginator.apaginate_queryset(queryset, Request(request))
+    except NotFound as exc:
+        return _json({"detail": str(exc.detail)}, status=404)
+    data = ProductSerializer(page, many=True, context={"request": request}).data
+    return _json(paginator.get_paginated_response(data).data)
+
+
+async def _ranked_page(request, query, queryset):
+    ids = await sync_to_async(search.search)(query)
+    paginator = ProductPagination()
+    try:
+        page_ids = paginator.paginate_queryset(ids, Request(request))
+    except NotFound as exc:
+        return _json({"detail": str(exc.detail)}, status=404)
+    page = await search.aranked_products(queryset, page_ids)
+    data = ProductSerializer(page, many=True, context={"request": request}).data
+    return _json(paginator.get_paginated_response(data).data)
+
+
+async def home_api(request):
+    """
+    Async HomeApiView: latest products by cursor, or ranked search with ?q=.
+    """
+    denied = await sync_to_async(_authorize)(request)
+    if denied:
+        return denied
+    q = request.GET.get("q", "").strip()
+    products = Product.objects.active().for_listing()
+    if q:
+        return await _ranked_page(request, q, products)
+    return await _cursor_page(request, products)
+
+
+# same contract as the sync endpoint: ProductSearchApiView behaves like home
+product_search_api = home_api
+
+
+async def product_list_api(request):
+    """
+    Async ProductListApiView (GET only; reads are open like IsAuthenticatedOrReadOnly).
+    """
+    return await _cursor_page(request, Product.objects.for_listing())
+
+
+async def product_detail_api(request, pk):
+    """
+    Async ProductDetailApiView.get. The ETag / Last-Modified come from the
+    product row and its reviews, which the response is built from anyway,
+    so a 304 costs those two reads and no serialization.
+    """
+    product = await Product.objects.filter(pk=pk, active=True).afirst()
+    if not product:
+        return _json({"detail": "Product not found"}, status=404)
+    reviews = [review async for review in Review.objects.filter(product_id=pk)]
+
+    last_review_at = max((r.updated_at for r in reviews), default=None)
+    state = (product.updated_at, last_review_at, product.rating_sum, product.rating_count)
+    etag = f'"{conditional.etag_for(pk, state)}"'
+    last_modified = int(conditional.last_modified_for(state).timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = _ProductWithoutReviewsSerializer(product, context={"request": request}).data
+        data["reviews"] = ReviewSerializer(reviews, many=True).data
+        response = _json(data)
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified))
+    return response
+
+
+async def price_stream(request):
+    """
+    Server-Sent Events feed of price / availability changes for
+    ?product=..&farmer=..&crop=.. (see ticker.py). Opens with the current
+    state of the requested products. Under WSGI, where a worker cannot be
+    parked on an endless response, only that snapshot is sent and the
+    browser's EventSource reconnects after ``retry`` ms, i.e. it polls.
+    """
+    try:
+        topics = await sync_to_async(ticker.topics_from_query)(request.GET)
+    except ValueError as exc:
+        return _json({"detail": str(exc)}, status=400)
+    if not topics:
+        return _json({"detail": "Subscribe to at least one product, farmer or crop."}, status=400)
+
+    product_ids = [int(t.split(":")[1]) for t in topics if t.startswith("product:")]
+    # off the event loop: a cold crop index is loaded from the database
+    snapshot = await sync_to_async(ticker.snapshot)(product_ids)
+
+    if not isinstance(request, ASGIRequest):
+        response = HttpResponse(f"retry: {ticker.POLL_RETRY_MS}\n\n" + "".join(snapshot),
+                                content_type="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    async def events():
+        subscription = ticker.hub.open(topics)
+        try:
+            yield "retry: 3000\n\n" + "".join(snapshot)
+            while True:
+                batch = await subscription.next_batch()
+                if batch is None:
+                    return
+                yield "".join(frame.sse for frame in batch) if batch else ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # let nginx pass events through unbuffered
+    return response
@@ -0,0 +1,83 @@
+# apps/marketplace/wishlist.py
+"""
+Wishlist membership and page queries.
+
+The set of product ids a user has wishlisted is read once (one query) and
+cached per user, so a product grid can mark every card without a lookup per
+product. add()/remove() are single statements and drop the cached set.
+Rows removed by a Product delete cascade may linger in a cached set until it
+expires, which is harmless: the ids are only tested against live products.
+No Wishlist signal receivers are connected on purpose, so that
+QuerySet.delete() stays a single fast-path DELETE.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Wishlist
+
+IDS_TIMEOUT = 30 * 60
+
+
+def _ids_key(user_id):
+    return f"wishlist:ids:{user_id}"
+
+
+def product_ids(user):
+    """
+    frozenset of product ids on ``user``'s wishlist (empty for anonymous users).
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = _ids_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Wishlist.objects.filter(user=user).values_list("product_id", flat=True))
+        cache.set(key, ids, IDS_TIMEOUT)
+    return ids
+
+
+def wishlisted(user, products):
+    """
+    Ids of the given products that are on ``user``'s wishlist.
+    """
+    ids = product_ids(user)
+    return {p.pk for p in products if p.pk in ids}
+
+
+def invalidate(user_id):
+    cache.delete(_ids_key(user_id))
+
+
+def add(user, product):
+    """
+    Insert the row in one statement; the unique (user, product) constraint
+    decides races. Returns True if it was added, False if already there.
+    """
+    try:
+        with transaction.atomic():
+            Wishlist.objects.create(user=user, product=product)
+    except IntegrityError:
+        return False
+    finally:
+        invalidate(user.pk)
+    return True
+
+
+def remove(user, product_id):
+    """
+    Delete the row in one statement. Returns True if something was removed.
+    """
+    deleted, _ = Wishlist.objects.filter(user=user, product_id=product_id).delete()
+    invalidate(user.pk)
+    return bool(deleted)
+
+
+def items(user):
+    """
+    The wishlist page: rows with product and farmer joined, newest first.
+    """
+    return (
+        Wishlist.objects.filter(user=user, product__active=True)
+        .select_related("product__owner")
+        .order_by("-created_at", "-id")
+    )
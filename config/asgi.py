@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections to the live price ticker
+(apps.marketplace.ticker.WEBSOCKET_PATH) are served by the ticker itself.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up
+from apps.marketplace import ticker  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        if scope["path"] == ticker.WEBSOCKET_PATH:
+            return await ticker.websocket_app(scope, receive, send)
+        await receive()
+        return await send({"type": "websocket.close", "code": 4404})
+    return await django_application(scope, receive, send)
@@ -0,0 +1,138 @@
+# config/replicas.py
+"""
+Read-replica routing.
+
+ReplicaRoutingMiddleware decides per request whether ORM reads may go to a
+replica; ReplicaRouter (settings.DATABASE_ROUTERS) applies that decision.
+Reads use a replica when all of these hold:
+
+* settings.DATABASE_REPLICAS names at least one alias;
+* the request is a safe method (GET/HEAD/OPTIONS), which covers every
+  read-only page and API view, sync or async;
+* the client has not written recently: any request that writes sets a
+  short-lived cookie (REPLICA_PIN_SECONDS) that keeps that client on the
+  primary, so a user sees their own review or product edit on the page
+  they are redirected to, even while the replica lags;
+* nothing has been written earlier in the same request.
+
+Writes, and everything outside a request (management commands, workers,
+tests that do not go through the middleware), use "default". One replica is
+picked at random per request, so a page reads from a single snapshot.
+
+Results cached for every user under a version key (the home shelf, the
+price board, the farmer letter index, the crop index) are read from
+PRIMARY: the first reader after a bump would otherwise fill the new
+version from a lagging replica and serve that to everyone until it expires.
+
+To try it locally with two SQLite files, copy the database to act as a
+(permanently lagging) replica and point a settings override at both:
+
+    DATABASES = {
+        "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3"},
+        "replica1": {"ENGINE": "django.db.backends.sqlite3", "NAME": "replica.sqlite3",
+                     "TEST": {"MIRROR": "default"}},
+    }
+    DATABASE_REPLICAS = ["replica1"]
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PRIMARY = "default"
+
+PIN_COOKIE = "primary_until"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# alias this request reads from (None: primary), and whether it has written
+_read_alias = ContextVar("replica_read_alias", default=None)
+_wrote = ContextVar("replica_wrote", default=False)
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _wrote.get():
+            return PRIMARY
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # select_for_update and get_or_create also come here; later reads in
+        # this request then see the primary too
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Put first in MIDDLEWARE so session and auth reads are routed too. Runs
+    natively in both stacks, so async views are not pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self._route(request)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            self._reset(tokens)
+        return self._pin(response, wrote)
+
+    async def __acall__(self, request):
+        tokens = self._route(request)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            self._reset(tokens)
+        return self._pin(response, wrote)
+
+    def _route(self, request):
+        aliases = replicas()
+        alias = None
+        if aliases and request.method in SAFE_METHODS and not self._pinned(request):
+            alias = random.choice(aliases)
+        return _read_alias.set(alias), _wrote.set(False)
+
+    @staticmethod
+    def _reset(tokens):
+        alias_token, wrote_token = tokens
+        _read_alias.reset(alias_token)
+        _wrote.reset(wrote_token)
+
+    @staticmethod
+    def _pin(response, wrote):
+        if wrote and replicas():
+            seconds = getattr(settings, "REPLICA_PIN_SECONDS", 10)
+            response.set_cookie(PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds,
+                                httponly=True, samesite="Lax")
+        return response
+
+    @staticmethod
+    def _pinned(request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
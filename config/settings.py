@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +27,9 @@ SECRET_KEY = 'django-insecure-%(j-did^4aijj$m&mx-w&*yzjzw-pv=cvlq_7-6^ezq^p09h_o
 
 DEBUG = False #Turn of in production
 
+# `manage.py test`: background writers off, query profiling and budgets on
+TESTING = sys.argv[1:2] == ["test"]
+
 ALLOWED_HOSTS = ["*"]  #Allow all user
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -39,10 +43,12 @@ INSTALLED_APPS = [
     'apps.accounts.apps.AccountsConfig',
     'apps.marketplace.apps.MarketplaceConfig',  # Ensure only this line exists for the marketplace app
     'apps.farmers.apps.FarmersConfig',
+    'apps.diagnostics.apps.DiagnosticsConfig',
 ]
 
 
 MIDDLEWARE = [
+    'config.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'apps.diagnostics.middleware.QueryProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -92,6 +99,17 @@ DATABASES = {
     }
 }
 
+# Read replicas (config/replicas.py): DB_REPLICA_HOSTS=host1,host2 adds aliases
+# replica1, replica2 that copy "default" apart from HOST. Safe-method requests
+# read from one of them; a client that just wrote reads the primary for
+# REPLICA_PIN_SECONDS, which should exceed the usual replication lag.
+DATABASE_REPLICAS = []
+for _i, _host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica{_i}"] = {**DATABASES["default"], "HOST": _host.strip(), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica{_i}")
+DATABASE_ROUTERS = ["config.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -133,10 +151,68 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 
 
+STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# background threads that build thumbnail/WebP variants of uploads (apps.marketplace.images)
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", 2))
+
+# Shared cache (home shelf, farmer letter index). Set REDIS_URL in production so
+# every worker sees the same catalog version; the in-process fallback culls
+# itself at MAX_ENTRIES so memory stays bounded.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "TIMEOUT": 600,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "TIMEOUT": 600,
+            "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 4},
+        }
+    }
+
+# Live price ticker (apps.marketplace.ticker): "redis" relays changes between
+# workers over REDIS_URL; "local" only reaches clients of the same process.
+PRICE_TICKER_BROKER = os.environ.get("PRICE_TICKER_BROKER", "redis" if REDIS_URL else "local")
+
+# Engagement counters (apps.marketplace.engagement) are kept in memory and
+# written to the database by a background thread this often per worker; a
+# crashed worker loses up to this many seconds of its counts. 0 turns the
+# thread off (the default for `manage.py test`, whose tests flush() themselves).
+ENGAGEMENT_FLUSH_SECONDS = int(os.environ.get("ENGAGEMENT_FLUSH_SECONDS", 0 if TESTING else 30))
+
+# Per-request SQL profiling (apps.diagnostics), shown at /diagnostics/queries/ to staff.
+# It wraps every query, so it is on by default only with DEBUG and under
+# `manage.py test`; set QUERY_PROFILER_ENABLED=1 to profile a deployment.
+# Budgets are per URL name: an int caps the query count, a dict may also cap
+# DB time ({"queries": 6, "db_ms": 50}). "log" warns on overruns, "raise" makes
+# the request fail, so `QUERY_BUDGET_ACTION=raise python manage.py test` fails
+# any test that drives a view over budget.
+QUERY_PROFILER_ENABLED = os.environ.get("QUERY_PROFILER_ENABLED", "1" if DEBUG or TESTING else "0") == "1"
+QUERY_BUDGET_ACTION = os.environ.get("QUERY_BUDGET_ACTION", "log")
+QUERY_BUDGETS = {
+    "marketplace:home": 5,
+    "marketplace:product_detail": 6,
+    "marketplace:view_cart": 4,
+    "marketplace:wishlist_view": 4,
+    "marketplace:home_api": 6,
+    "marketplace:product_search_api": 6,
+    "marketplace:product_list_api": 4,
+    "marketplace:product_detail_api": 5,
+    "farmers:all_farmers": 3,
+    "farmers:dashboard": 5,
+    "accounts:customer_dashboard": 4,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
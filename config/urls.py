@@ -9,6 +9,7 @@ urlpatterns = [
     path("api/home/", include("apps.marketplace.urls")),
     path("accounts/", include("apps.accounts.urls")),
     path("farmers/", include("apps.farmers.urls")),
+    path("diagnostics/", include("apps.diagnostics.urls")),
     path("admin/", admin.site.urls),
 ]
 